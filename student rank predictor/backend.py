@@ -1,13 +1,41 @@
+import asyncio
+import hashlib
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import List, Dict, Optional
-import pandas as pd
+from pydantic import BaseModel, model_validator
+from typing import List, Dict, Optional, Tuple, Union
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import StandardScaler
-import joblib
 
-app = FastAPI()
+from batching import MicroBatcher
+from cohort_analytics import CohortReport
+from college_index import CollegeCutoffIndex
+from inference_pool import InferencePool
+from instrumentation import install, metrics_from_env
+from leaderboard import LiveLeaderboard
+from model_registry import ModelRegistry, DEFAULT_REGISTRY_DIR
+from module_loader import load_ml_components
+from prediction_cache import PredictionCache
+from rolling_stats import RollingStats, RollingStatsStore, slope
+from scoring import ARRAY_FIELDS
+from uncertainty import RANK_MC_DRAWS, RANK_SCORE_SIGMA, RankUncertainty
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Runs in each server worker after it forks
+    inference_pool.start()
+    snapshots = asyncio.create_task(snapshot_leaderboard()) if live_leaderboard.directory else None
+    yield
+    if snapshots is not None:
+        snapshots.cancel()
+        live_leaderboard.snapshot()
+    inference_pool.shutdown(wait=False)
+
+app = FastAPI(lifespan=lifespan)
+
+# Stage timers, /metrics and header-triggered profiling; no-ops unless METRICS_ENABLED=1
+metrics = metrics_from_env()
+install(app, metrics)
 
 # Data models
 class QuizResponse(BaseModel):
@@ -24,6 +52,29 @@ class QuizSubmission(BaseModel):
     total_score: float
     responses: List[QuizResponse]
 
+class CompactResponses(BaseModel):
+    # Parallel arrays, one entry per response; topic_code indexes topics (see scoring.py)
+    topics: List[str]
+    question_id: List[int]
+    selected_option_id: List[int]
+    correct_option_id: List[int]
+    topic_code: List[int]
+    time_taken: List[int]
+    
+    @model_validator(mode="after")
+    def check_arrays(self):
+        if len({len(getattr(self, field)) for field in ARRAY_FIELDS}) > 1:
+            raise ValueError("compact response arrays must all have the same length")
+        if self.topic_code and not 0 <= min(self.topic_code) <= max(self.topic_code) < len(self.topics):
+            raise ValueError("topic_code out of range for topics")
+        return self
+
+class CompactQuizSubmission(BaseModel):
+    user_id: int
+    quiz_id: int
+    total_score: float
+    responses: CompactResponses
+
 class HistoricalQuiz(BaseModel):
     quiz_id: int
     score: float
@@ -33,6 +84,15 @@ class UserHistory(BaseModel):
     user_id: int
     last_5_quizzes: List[HistoricalQuiz]
 
+class RankRequest(BaseModel):
+    quiz: QuizSubmission
+    history: Optional[UserHistory] = None
+
+class CollegeBatchRequest(BaseModel):
+    predicted_ranks: List[int]
+    category: str = "general"
+    year: Optional[int] = None
+
 # Helper functions
 def calculate_topic_performance(responses: List[QuizResponse]) -> Dict[str, float]:
     topic_correct = {}
@@ -48,10 +108,78 @@ def calculate_topic_performance(responses: List[QuizResponse]) -> Dict[str, floa
     return {topic: (correct / topic_total[topic]) * 100 
             for topic, correct in topic_correct.items()}
 
-def analyze_improvement_trends(history: List[HistoricalQuiz]) -> Dict:
-    scores = [quiz.score for quiz in history]
-    improvement = np.polyfit(range(len(scores)), scores, 1)[0]
+# Cohort statistics from cohort_analytics.py; weak areas fall back to a
+# fixed accuracy threshold until a report has been generated
+COHORT_REPORT_PATH = os.environ.get("COHORT_REPORT_PATH", "cohort_report.json")
+WEAK_AREA_PERCENTILE = float(os.environ.get("WEAK_AREA_PERCENTILE", 25))
+WEAK_AREA_DEFAULT_THRESHOLD = 60
+cohort_report = CohortReport.load(COHORT_REPORT_PATH) if os.path.exists(COHORT_REPORT_PATH) else None
+
+def weak_area_threshold(topic: str) -> float:
+    if cohort_report is not None:
+        threshold = cohort_report.weak_area_threshold(topic, WEAK_AREA_PERCENTILE)
+        if threshold is not None:
+            return threshold
+    return WEAK_AREA_DEFAULT_THRESHOLD
+
+# Server-side running aggregates per user, updated as submissions land
+rolling_stats_store = RollingStatsStore()
+
+def stored_stats(user_id: int) -> RollingStats:
+    stats = rolling_stats_store.get(user_id)
+    if stats is None:
+        raise HTTPException(status_code=404, detail=f"no quiz history recorded for user {user_id}")
+    return stats
+
+def recent_trend(user_id: int, history: Optional[UserHistory]) -> Tuple[List[float], float]:
+    # Clients may still send their history; otherwise read the stored window and its trend
+    if history is not None:
+        scores = [quiz.score for quiz in history.last_5_quizzes]
+        return scores, slope(scores)
+    
+    stats = stored_stats(user_id)
+    return stats.recent_scores, stats.recent_trend()
+
+def temporal_features(user_id: int, history: Optional[UserHistory]) -> Dict[str, float]:
+    if history is None or not history.last_5_quizzes:
+        return stored_stats(user_id).temporal_features()
     
+    # A client-sent history has scores but no times, so the time features are unknown
+    scores = np.array([quiz.score for quiz in history.last_5_quizzes], dtype=float)
+    return {
+        'avg_score': float(scores.mean()),
+        'score_trend': slope(scores.tolist()),
+        'score_std': float(scores.std()),
+        'avg_time': np.nan,
+        'time_trend': np.nan,
+        'time_efficiency': np.nan
+    }
+
+def history_digest(history: Optional[UserHistory]) -> str:
+    # Cache-key part: results from a client-sent history are cached per
+    # history; stored-history results are dropped by invalidate_user instead
+    if history is None:
+        return "stored"
+    return hashlib.sha1(history.model_dump_json().encode()).hexdigest()[:16]
+
+# Live standings among everyone who submitted the same quiz. Boards are per
+# process: serve live mock tests from a single worker
+LEADERBOARD_DIR = os.environ.get("LEADERBOARD_DIR")
+LEADERBOARD_SNAPSHOT_SECONDS = float(os.environ.get("LEADERBOARD_SNAPSHOT_SECONDS", 60))
+_leaderboard_bins = dict(
+    min_score=float(os.environ.get("LEADERBOARD_MIN_SCORE", -180)),
+    max_score=float(os.environ.get("LEADERBOARD_MAX_SCORE", 720)),
+    step=float(os.environ.get("LEADERBOARD_SCORE_STEP", 1))
+)
+live_leaderboard = (LiveLeaderboard.load(LEADERBOARD_DIR, **_leaderboard_bins) if LEADERBOARD_DIR
+                    else LiveLeaderboard(**_leaderboard_bins))
+
+async def snapshot_leaderboard():
+    while True:
+        await asyncio.sleep(LEADERBOARD_SNAPSHOT_SECONDS)
+        await asyncio.to_thread(live_leaderboard.snapshot)
+
+def analyze_improvement_trends(scores: List[float], improvement: float) -> Dict:
     return {
         "trend": "improving" if improvement > 0 else "declining",
         "rate": abs(improvement),
@@ -60,82 +188,302 @@ def analyze_improvement_trends(history: List[HistoricalQuiz]) -> Dict:
 
 class RankPredictor:
     def __init__(self):
-        # In production, these would be loaded from saved models
-        self.model = RandomForestRegressor()
-        self.scaler = StandardScaler()
+        # Empty until an artifact is loaded from the registry; sklearn and
+        # pandas are only imported when that artifact is loaded
+        self.model = None
+        self.scaler = None
+        self.feature_columns = None
+        self.feature_engineering = None
+        self.model_version = None
+        self.uncertainty = None
         
-    def prepare_features(self, current_quiz: QuizSubmission, history: UserHistory) -> np.array:
-        # Extract relevant features
-        recent_scores = [quiz.score for quiz in history.last_5_quizzes]
-        topic_performance = calculate_topic_performance(current_quiz.responses)
+    def load_artifact(self, artifact) -> None:
+        if not artifact.feature_columns:
+            raise ValueError(f"model {artifact.version} has no feature columns; save it with save_predictor")
+        # The training feature pipeline, laid out in the artifact's column order
+        feature_engineering = load_ml_components().FeatureEngineering()
+        feature_engineering.feature_columns = artifact.feature_columns
         
-        features = [
-            current_quiz.total_score,
-            np.mean(recent_scores),
-            np.std(recent_scores),
-            *topic_performance.values()
-        ]
+        self.model = artifact.model
+        self.scaler = artifact.scaler
+        self.feature_columns = artifact.feature_columns
+        self.feature_engineering = feature_engineering
+        self.model_version = artifact.version
+        # Monte Carlo noise on the score feature (RANK_SCORE_SIGMA marks) for rank intervals
+        self.uncertainty = RankUncertainty.from_feature_columns(
+            self.model, self.scaler, self.feature_columns, RANK_SCORE_SIGMA, n_draws=RANK_MC_DRAWS
+        )
+        
+    @staticmethod
+    def _submission(current_quiz: Union[QuizSubmission, CompactQuizSubmission]) -> Dict:
+        if isinstance(current_quiz, CompactQuizSubmission):
+            # The feature pipeline reads the parallel arrays as they are
+            return {'responses': current_quiz.responses.model_dump()}
+        return {'responses': [response.model_dump() for response in current_quiz.responses]}
+    
+    def prepare_features(self, current_quiz: Union[QuizSubmission, CompactQuizSubmission],
+                         temporal: Dict[str, float]) -> np.array:
+        return self.prepare_features_batch([current_quiz], [temporal])
+    
+    def prepare_features_batch(self, quizzes: List[Union[QuizSubmission, CompactQuizSubmission]],
+                               temporal: List[Dict[str, float]]) -> np.array:
+        """Scaled feature rows; ``temporal`` comes from ``temporal_features``.
         
-        return self.scaler.transform([features])
+        CPU-bound (pandas, the scaler): endpoints run it in ``inference_pool``
+        through ``predict_rank_rows``, never on the event loop.
+        """
+        if self.feature_engineering is None:
+            raise RuntimeError("no model loaded; train one into the registry and POST /model/reload")
+        with metrics.stage("features"):
+            # Same features as training, reindexed to the artifact's columns;
+            # topics a student did not attempt are NaN, as in training
+            frame = self.feature_engineering.extract_features_batch(
+                [self._submission(quiz) for quiz in quizzes], temporal=list(temporal)
+            )
+        with metrics.stage("scaler_transform"):
+            features = self.scaler.transform(frame)
+        metrics.annotate(rows=features.shape[0], feature_count=features.shape[1])
+        return features
     
     def predict_rank(self, features: np.array) -> Dict:
-        predicted_rank = self.model.predict(features)[0]
-        confidence = self.model.predict_proba(features)[0] if hasattr(self.model, 'predict_proba') else None
+        return self.predict_rank_batch(features[:1])[0]
+    
+    def predict_rank_batch(self, features: np.array) -> List[Dict]:
+        # One model call for the whole batch amortises the per-call overhead
+        metrics.inc("predicted_rows", len(features))
+        with metrics.stage("model_predict"):
+            predicted_ranks = self.model.predict(features)
+        if self.uncertainty is None:
+            return [{"predicted_rank": int(rank), "confidence": None} for rank in predicted_ranks]
         
-        return {
-            "predicted_rank": int(predicted_rank),
-            "confidence": float(confidence) if confidence is not None else None
-        }
+        with metrics.stage("uncertainty"):
+            interval = self.uncertainty.intervals(features)
+        return [
+            {
+                "predicted_rank": int(predicted_rank),
+                "confidence": None if np.isnan(interval['confidence'][i]) else float(interval['confidence'][i]),
+                "rank_interval": [int(interval['p5'][i]), int(interval['p95'][i])]
+            }
+            for i, predicted_rank in enumerate(predicted_ranks)
+        ]
 
 # Initialize predictor
+model_registry = ModelRegistry(os.environ.get("MODEL_REGISTRY_DIR", DEFAULT_REGISTRY_DIR))
 rank_predictor = RankPredictor()
+if model_registry.refresh():
+    rank_predictor.load_artifact(model_registry.current)
+
+# Results cache (local LRU + Redis); REDIS_URL=memory:// keeps it in-process
+prediction_cache = PredictionCache()
+
+def cached_result(key: str, user_id: Optional[int] = None) -> Optional[Dict]:
+    cached = prediction_cache.get(key, user_id)
+    metrics.inc("cache_hit" if cached is not None else "cache_miss")
+    return cached
+
+def predict_rank_rows(requests: List[Tuple[Union[QuizSubmission, CompactQuizSubmission], Dict[str, float]]]) -> List[Dict]:
+    # Module-level so process-pool workers run it against their inherited
+    # predictor. Feature preparation runs here too, off the event loop, in
+    # one columnar pass over every (quiz, temporal features) request
+    quizzes, temporal = zip(*requests)
+    features = rank_predictor.prepare_features_batch(list(quizzes), list(temporal))
+    return rank_predictor.predict_rank_batch(features)
+
+def request_temporal_features(quiz: Union[QuizSubmission, CompactQuizSubmission],
+                              history: Optional[UserHistory]) -> Dict[str, float]:
+    # The one per-request step left on the loop: a stats-store read (404 if none)
+    with metrics.stage("history"):
+        return temporal_features(quiz.user_id, history)
+
+# Model calls run off the event loop; RANK_EXECUTOR=process for a forked pool
+inference_pool = InferencePool(
+    kind=os.environ.get("RANK_EXECUTOR", "thread"),
+    workers=int(os.environ.get("RANK_EXECUTOR_WORKERS", 0)) or None
+)
+
+# Concurrent /predict/rank requests are coalesced into one feature pass and model call
+rank_batcher = MicroBatcher(
+    predict_rank_rows,
+    max_batch_size=int(os.environ.get("RANK_BATCH_MAX_ROWS", 256)),
+    max_wait_ms=float(os.environ.get("RANK_BATCH_WINDOW_MS", 5)),
+    executor=inference_pool
+)
 
 @app.post("/analyze/performance")
-async def analyze_performance(quiz: QuizSubmission, history: UserHistory):
+async def analyze_performance(quiz: QuizSubmission, history: Optional[UserHistory] = None):
+    cache_key = prediction_cache.key("performance", quiz.user_id, quiz.quiz_id, history_digest(history))
+    cached = cached_result(cache_key, quiz.user_id)
+    if cached is not None:
+        return cached
+    
     try:
         # Calculate topic-wise performance
-        topic_performance = calculate_topic_performance(quiz.responses)
+        with metrics.stage("topic_performance"):
+            topic_performance = calculate_topic_performance(quiz.responses)
         
         # Analyze improvement trends
-        improvement_trends = analyze_improvement_trends(history.last_5_quizzes)
+        with metrics.stage("history"):
+            scores, improvement = recent_trend(quiz.user_id, history)
+        with metrics.stage("trend_analysis"):
+            improvement_trends = analyze_improvement_trends(scores, improvement)
         
-        # Calculate weak areas (topics with < 60% accuracy)
-        weak_areas = [topic for topic, score in topic_performance.items() if score < 60]
+        # Calculate weak areas (topics in the cohort's bottom percentile)
+        weak_areas = [topic for topic, score in topic_performance.items()
+                      if score < weak_area_threshold(topic)]
         
-        return {
+        result = {
             "topic_performance": topic_performance,
             "improvement_trends": improvement_trends,
             "weak_areas": weak_areas
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    prediction_cache.set(cache_key, result, quiz.user_id)
+    return result
 
 @app.post("/predict/rank")
-async def predict_rank(quiz: QuizSubmission, history: UserHistory):
+async def predict_rank(quiz: QuizSubmission, history: Optional[UserHistory] = None):
+    return await _predict_rank(quiz, history)
+
+@app.post("/predict/rank/compact")
+async def predict_rank_compact(quiz: CompactQuizSubmission, history: Optional[UserHistory] = None):
+    # Same prediction from the parallel-array wire format: cheaper to validate,
+    # and its topic features come straight from the arrays
+    return await _predict_rank(quiz, history)
+
+async def _predict_rank(quiz: Union[QuizSubmission, CompactQuizSubmission], history: Optional[UserHistory]):
+    cache_key = prediction_cache.key("rank", quiz.user_id, quiz.quiz_id, rank_predictor.model_version,
+                                     history_digest(history))
+    cached = cached_result(cache_key, quiz.user_id)
+    if cached is not None:
+        return cached
+    
     try:
-        features = rank_predictor.prepare_features(quiz, history)
-        prediction = rank_predictor.predict_rank(features)
+        temporal = request_temporal_features(quiz, history)
+        prediction = await rank_batcher.submit((quiz, temporal))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    prediction_cache.set(cache_key, prediction, quiz.user_id)
+    return prediction
+
+@app.post("/predict/rank/batch")
+async def predict_rank_batch(requests: List[RankRequest]):
+    try:
+        rows = [(request.quiz, request_temporal_features(request.quiz, request.history)) for request in requests]
+        predictions = await asyncio.get_running_loop().run_in_executor(
+            inference_pool, predict_rank_rows, rows
+        )
         
-        return prediction
+        return {"predictions": predictions}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/predict/rank/live")
+async def predict_rank_live(quiz_id: int, user_id: Optional[int] = None, score: Optional[float] = None):
+    # Standing among everyone who has submitted this quiz so far; never cached
+    if (user_id is None) == (score is None):
+        raise HTTPException(status_code=422, detail="pass exactly one of user_id or score")
+    
+    try:
+        with metrics.stage("leaderboard"):
+            if user_id is not None:
+                standing = live_leaderboard.user_standing(quiz_id, user_id)
+            else:
+                standing = live_leaderboard.standing(quiz_id, score)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    
+    return {"quiz_id": quiz_id, **standing}
+
+@app.post("/submissions")
+async def record_submission(quiz: QuizSubmission):
+    # O(1) update of the user's running aggregates; cached results are stale now
+    total_time = sum(response.time_taken for response in quiz.responses)
+    stats = rolling_stats_store.update(quiz.user_id, quiz.total_score, total_time, quiz.quiz_id)
+    prediction_cache.invalidate_user(quiz.user_id)
+    # O(log n) insert into the quiz's live leaderboard (replacing a resubmission)
+    standing = live_leaderboard.submit(quiz.quiz_id, quiz.user_id, quiz.total_score)
+    
+    return {"user_id": quiz.user_id, "quizzes_recorded": stats.count, "live_standing": standing}
+
+@app.get("/model")
+async def model_info():
+    return {"version": rank_predictor.model_version}
+
+@app.post("/model/reload")
+async def reload_model():
+    # Hot-swap to the registry's LATEST version without restarting workers
+    try:
+        if model_registry.refresh():
+            rank_predictor.load_artifact(model_registry.current)
+            # Process workers hold the old model; in-flight calls finish on them
+            inference_pool.restart()
+            prediction_cache.invalidate_all()
+        return {"version": rank_predictor.model_version}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/cache/invalidate")
+async def invalidate_cache(user_id: int):
+    # Called when a new QuizSubmission lands for this user
+    prediction_cache.invalidate_user(user_id)
+    return {"invalidated": user_id}
+
 # Bonus: College prediction endpoint
+# Fallback cutoffs used when no college database is configured
+DEFAULT_COLLEGE_CUTOFFS = {
+    "AIIMS Delhi": 50,
+    "JIPMER": 500,
+    "Maulana Azad": 1000,
+    "Government Medical College": 2000
+}
+
+def load_college_index() -> CollegeCutoffIndex:
+    if "DATABASE_URL" not in os.environ:
+        return CollegeCutoffIndex.from_cutoff_map(DEFAULT_COLLEGE_CUTOFFS)
+    
+    from db import get_sessionmaker, models
+    with get_sessionmaker()() as session:
+        return CollegeCutoffIndex.from_session(session, models)
+
+college_index = load_college_index()
+
 @app.post("/predict/college")
-async def predict_college(predicted_rank: int):
-    # This would use a database of college cutoffs from previous years
-    # Simplified example:
-    college_cutoffs = {
-        "AIIMS Delhi": 50,
-        "JIPMER": 500,
-        "Maulana Azad": 1000,
-        "Government Medical College": 2000
-    }
+async def predict_college(predicted_rank: int, category: str = "general", year: Optional[int] = None):
+    cache_key = prediction_cache.key("college", predicted_rank, category, year)
+    cached = cached_result(cache_key)
+    if cached is not None:
+        return cached
+    
+    try:
+        with metrics.stage("college_lookup"):
+            eligible_colleges = college_index.eligible(predicted_rank, category, year)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
     
-    eligible_colleges = [
-        college for college, cutoff in college_cutoffs.items()
-        if predicted_rank <= cutoff
-    ]
+    result = {
+        "eligible_colleges": eligible_colleges
+    }
+    prediction_cache.set(cache_key, result)
+    return result
+
+@app.post("/predict/college/batch")
+async def predict_college_batch(request: CollegeBatchRequest):
+    try:
+        with metrics.stage("college_lookup"):
+            eligible_colleges = college_index.eligible_batch(
+                request.predicted_ranks, request.category, request.year
+            )
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
     
     return {
         "eligible_colleges": eligible_colleges
@@ -0,0 +1,74 @@
+# batching.py
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-row predictions into one model call.
+
+    Rows submitted within ``max_wait_ms`` of the first pending row (or until
+    ``max_batch_size`` rows are queued) are passed to ``predict_batch``
+    together as a list; each caller gets back its own result. A row is
+    whatever ``predict_batch`` takes, e.g. a feature vector or a request
+    whose features are prepared inside the batch call.
+    """
+
+    def __init__(self, predict_batch: Callable[[List[Any]], List[Dict]],
+                 max_batch_size: int = 256, max_wait_ms: float = 5.0,
+                 executor=None):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.executor = executor
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def submit(self, row: Any) -> Dict:
+        """Queue one row and wait for its prediction."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((row, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, []
+        asyncio.get_running_loop().create_task(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]):
+        loop = asyncio.get_running_loop()
+        rows = [row for row, _ in batch]
+        try:
+            results = await loop.run_in_executor(
+                self.executor, self.predict_batch, rows
+            )
+        except Exception:
+            # Isolate the failing row(s) instead of failing every caller
+            results = []
+            for row in rows:
+                try:
+                    results.append(await loop.run_in_executor(
+                        self.executor, self.predict_batch, [row]
+                    ))
+                except Exception as e:
+                    results.append(e)
+            results = [r if isinstance(r, Exception) else r[0] for r in results]
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,102 @@
+# benchmarks/bench_bulk_ingest.py
+"""Rows/sec of the bulk loader vs row-by-row ORM inserts on SQLite.
+
+Run from the ``student rank predictor`` directory:
+
+    python benchmarks/bench_bulk_ingest.py --submissions 2000 --questions 180
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from bulk_ingest import BulkLoader, iter_records, validate_record  # noqa: E402
+from db import get_engine, get_sessionmaker, models  # noqa: E402
+
+TOPICS = ['Physics', 'Chemistry', 'Botany', 'Zoology']
+DIFFICULTIES = ['Easy', 'Medium', 'Hard']
+
+
+def write_dump(path: str, n_submissions: int, n_questions: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    with open(path, 'w') as f:
+        for user_id in range(1, n_submissions + 1):
+            selected = rng.integers(1, 5, n_questions)
+            correct = rng.integers(1, 5, n_questions)
+            times = rng.integers(10, 180, n_questions)
+            topics = rng.integers(0, len(TOPICS), n_questions)
+            record = {
+                'user_id': user_id,
+                'total_score': float(4 * (selected == correct).sum() - (selected != correct).sum()),
+                'total_time': int(times.sum()),
+                'responses': [
+                    {
+                        'question_id': q + 1,
+                        'selected_option_id': int(selected[q]),
+                        'correct_option_id': int(correct[q]),
+                        'topic': TOPICS[topics[q]],
+                        'subtopic': f"{TOPICS[topics[q]]}-{q % 10}",
+                        'difficulty': DIFFICULTIES[q % 3],
+                        'time_taken': int(times[q])
+                    }
+                    for q in range(n_questions)
+                ]
+            }
+            f.write(json.dumps(record) + '\n')
+
+
+def orm_row_by_row(engine, records) -> float:
+    Session = get_sessionmaker(engine)
+    start = time.perf_counter()
+    rows = 0
+    with Session() as session:
+        for record in records:
+            submission = validate_record(record)
+            orm_submission = models.QuizSubmission(
+                user_id=submission['user_id'],
+                total_score=submission['total_score'],
+                total_time=submission['total_time']
+            )
+            session.add(orm_submission)
+            session.flush()
+            for response in submission['responses']:
+                session.add(models.QuizResponse(submission_id=orm_submission.id, **response))
+                session.flush()
+            rows += 1 + len(submission['responses'])
+        session.commit()
+    return rows / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--submissions", type=int, default=2000)
+    parser.add_argument("--questions", type=int, default=180)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--orm-submissions", type=int, default=50,
+                        help="row-by-row baseline is slow; time it on a prefix")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dump = os.path.join(tmp, 'dump.jsonl')
+        write_dump(dump, args.submissions, args.questions)
+
+        engine = get_engine(f"sqlite:///{os.path.join(tmp, 'bulk.db')}")
+        models.Base.metadata.create_all(engine)
+        stats = BulkLoader(engine, chunk_size=args.chunk_size).load(iter_records(dump))
+        print(f"   bulk loader: {stats['rows_per_sec']:10.0f} rows/sec "
+              f"({stats['submissions']} submissions, {stats['responses']} responses)")
+
+        engine = get_engine(f"sqlite:///{os.path.join(tmp, 'orm.db')}")
+        models.Base.metadata.create_all(engine)
+        records = list(iter_records(dump))[:args.orm_submissions]
+        print(f"ORM row-by-row: {orm_row_by_row(engine, records):10.0f} rows/sec")
+
+
+if __name__ == "__main__":
+    main()
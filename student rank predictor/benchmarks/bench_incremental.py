@@ -0,0 +1,79 @@
+# benchmarks/bench_incremental.py
+"""Daily warm-start updates (RankPredictor.update) vs refitting on all data.
+
+Run from the ``student rank predictor`` directory:
+
+    python benchmarks/bench_incremental.py --model rf --initial 5000 --batch 1000 --days 5
+
+Both paths start from the same model fitted on ``--initial`` students. Each
+day adds ``--batch`` students: the incremental path warm-starts on the batch
+plus the reservoir, the full path refits the same estimator on everything
+seen so far. Both are scored on one fixed test set.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import mean_absolute_error
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from conftest import QUESTIONS_PER_QUIZ, load_ml_components, make_submissions  # noqa: E402
+
+
+def synthetic_ranks(X, seed: int) -> np.ndarray:
+    # Learnable target: better scores and accuracy mean a better (lower) rank
+    rng = np.random.default_rng(seed)
+    accuracy = X.filter(like='_accuracy').mean(axis=1).to_numpy()
+    return 50000 - 40 * X['avg_score'].to_numpy() - 20000 * accuracy + rng.normal(0, 1000, len(X))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", choices=["rf", "gb"], default="rf")
+    parser.add_argument("--initial", type=int, default=5000, help="students in the initial training set")
+    parser.add_argument("--batch", type=int, default=1000, help="new students per day")
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--new-estimators", type=int, default=50)
+    args = parser.parse_args()
+
+    ml = load_ml_components()
+    fe = ml.FeatureEngineering()
+    total = args.initial + args.batch * args.days + args.batch
+    submissions, histories = make_submissions(total * QUESTIONS_PER_QUIZ)
+    X = fe.extract_features_batch(submissions, histories)
+    y = synthetic_ranks(X, seed=1)
+    X_test, y_test = X.iloc[-args.batch:], y[-args.batch:]
+
+    predictor = ml.RankPredictor()
+    predictor.feature_columns = list(X.columns)
+    predictor.feature_engineering.feature_columns = predictor.feature_columns
+    scaler = predictor.feature_engineering.scaler
+    initial = slice(0, args.initial)
+    predictor.best_model = clone(predictor.models[args.model]).fit(scaler.fit_transform(X.iloc[initial]), y[initial])
+    predictor.reservoir = ml.ReservoirSample()
+    predictor.reservoir.add(X.iloc[initial].to_numpy(), y[initial])
+    full_model = predictor.best_model
+
+    def test_mae(model):
+        return mean_absolute_error(y_test, model.predict(scaler.transform(X_test)))
+
+    print("day  rows    incremental s  MAE       promoted  trees   full refit s  MAE")
+    for day in range(1, args.days + 1):
+        end = args.initial + day * args.batch
+        batch = slice(end - args.batch, end)
+        report = predictor.update(X.iloc[batch], y[batch], new_estimators=args.new_estimators)
+
+        start = time.perf_counter()
+        full_model = clone(full_model).set_params(warm_start=False).fit(scaler.transform(X.iloc[:end]), y[:end])
+        full_seconds = time.perf_counter() - start
+
+        print(f"{day:>3}  {end:>6}  {report['total_wall_clock_s']:13.2f}  {test_mae(predictor.best_model):8.1f}  "
+              f"{str(report['promoted']):>8}  {report['estimators']:>5}   {full_seconds:12.2f}  {test_mae(full_model):8.1f}")
+
+
+if __name__ == "__main__":
+    main()
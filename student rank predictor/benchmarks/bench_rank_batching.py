@@ -0,0 +1,83 @@
+# benchmarks/bench_rank_batching.py
+"""Throughput and p99 latency of /predict/rank with and without micro-batching.
+
+Run from the ``student rank predictor`` directory:
+
+    python benchmarks/bench_rank_batching.py --requests 5000 --concurrency 256
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from batching import MicroBatcher  # noqa: E402
+from backend import RankPredictor  # noqa: E402
+from feature_schema import FEATURE_COLUMNS  # noqa: E402
+
+N_FEATURES = len(FEATURE_COLUMNS)
+
+
+def fitted_predictor(n_estimators: int) -> RankPredictor:
+    rng = np.random.default_rng(42)
+    X = rng.random((2000, N_FEATURES))
+    y = rng.integers(1, 100000, 2000)
+
+    predictor = RankPredictor()
+    predictor.model = RandomForestRegressor(n_estimators=n_estimators, n_jobs=1)
+    predictor.scaler = StandardScaler().fit(X)
+    predictor.model.fit(predictor.scaler.transform(X), y)
+    return predictor
+
+
+async def run(predict, rows: np.ndarray, concurrency: int):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(row):
+        async with semaphore:
+            start = time.perf_counter()
+            await predict(row)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(row) for row in rows))
+    elapsed = time.perf_counter() - start
+    return len(rows) / elapsed, np.percentile(latencies, 99) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--max-rows", type=int, default=256)
+    args = parser.parse_args()
+
+    predictor = fitted_predictor(args.n_estimators)
+    rows = predictor.scaler.transform(
+        np.random.default_rng(0).random((args.requests, N_FEATURES))
+    )
+
+    async def unbatched(row):
+        # What the endpoint did before: one model call per request, on the loop
+        return predictor.predict_rank(row[np.newaxis, :])
+
+    batcher = MicroBatcher(lambda batch: predictor.predict_rank_batch(np.vstack(batch)),
+                           max_batch_size=args.max_rows,
+                           max_wait_ms=args.window_ms)
+
+    for name, predict in [("per-request", unbatched), ("micro-batched", batcher.submit)]:
+        throughput, p99 = asyncio.run(run(predict, rows, args.concurrency))
+        print(f"{name:>14}: {throughput:10.1f} req/s   p99 {p99:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# benchmarks/conftest.py
+"""Shared fixtures and synthetic data for the pytest-benchmark suite.
+
+Run from the ``student rank predictor`` directory:
+
+    pytest benchmarks                                  # 1k / 100k responses
+    BENCH_FULL=1 pytest benchmarks                     # adds 1M responses + training
+    pytest benchmarks --benchmark-disable              # run each benchmark once, no timing
+    pytest benchmarks --benchmark-compare=0001 --benchmark-compare-fail=min:50%
+
+The last form compares against the committed baseline
+(.benchmarks/*/0001_baseline.json) and fails on a >50% regression in min
+time. The baseline's timings come from one machine, so the comparison is
+only meaningful on comparable hardware and is not part of a plain run.
+To refresh it, delete the old file and run with --benchmark-save=baseline.
+"""
+import os
+import sys
+import tracemalloc
+from typing import Optional
+
+import numpy as np
+import pytest
+
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, PACKAGE_DIR)
+
+from module_loader import load_ml_components  # noqa: E402
+
+BENCH_FULL = os.environ.get("BENCH_FULL") == "1"
+QUESTIONS_PER_QUIZ = 180
+HISTORY_LENGTH = 5
+TOPICS = ['Physics', 'Chemistry', 'Botany', 'Zoology']
+DIFFICULTIES = ['Easy', 'Medium', 'Hard']
+
+full_only = pytest.mark.skipif(not BENCH_FULL, reason="set BENCH_FULL=1")
+
+RESPONSE_SIZES = [
+    pytest.param(1_000, id="1k"),
+    pytest.param(100_000, id="100k"),
+    pytest.param(1_000_000, id="1M", marks=full_only),
+]
+
+
+def make_submissions(n_responses: int, seed: int = 0):
+    """Synthetic (submissions, histories) totalling ~n_responses quiz responses."""
+    rng = np.random.default_rng(seed)
+    n_students = max(1, n_responses // QUESTIONS_PER_QUIZ)
+    submissions, histories = [], []
+    for user_id in range(n_students):
+        selected = rng.integers(1, 5, QUESTIONS_PER_QUIZ)
+        correct = rng.integers(1, 5, QUESTIONS_PER_QUIZ)
+        times = rng.integers(10, 180, QUESTIONS_PER_QUIZ)
+        topics = rng.integers(0, len(TOPICS), QUESTIONS_PER_QUIZ)
+        submissions.append({
+            'user_id': user_id,
+            'quiz_id': 1,
+            'total_score': float(4 * (selected == correct).sum() - (selected != correct).sum()),
+            'total_time': int(times.sum()),
+            'responses': [
+                {
+                    'question_id': q + 1,
+                    'selected_option_id': int(selected[q]),
+                    'correct_option_id': int(correct[q]),
+                    'topic': TOPICS[topics[q]],
+                    'difficulty': DIFFICULTIES[q % 3],
+                    'time_taken': int(times[q])
+                }
+                for q in range(QUESTIONS_PER_QUIZ)
+            ]
+        })
+        histories.append([
+            {'total_score': float(score), 'total_time': int(time)}
+            for score, time in zip(rng.integers(100, 700, HISTORY_LENGTH),
+                                   rng.integers(5000, 12000, HISTORY_LENGTH))
+        ])
+    return submissions, histories
+
+
+def mean_seconds(benchmark) -> Optional[float]:
+    """Mean time of a finished benchmark; None under --benchmark-disable, which keeps no stats."""
+    stats = benchmark.stats
+    return stats.stats.mean if stats is not None else None
+
+
+def peak_memory_mb(fn, *args, **kwargs) -> float:
+    tracemalloc.start()
+    try:
+        fn(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.fixture(scope="session")
+def ml_components():
+    return load_ml_components()
@@ -0,0 +1,145 @@
+# benchmarks/load_test.py
+"""Throughput of the pre-forked server (serve.py) as workers are added.
+
+Run from the ``student rank predictor`` directory:
+
+    python benchmarks/load_test.py --workers 1 2 4 8 --requests 4000
+
+Each worker count gets a fresh server on a throwaway registry model. The
+load generator runs in ``--client-processes`` separate processes, so on a
+machine with N cores expect near-linear scaling up to roughly
+N - client processes workers.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Tuple
+
+import httpx
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import StandardScaler
+
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, PACKAGE_DIR)
+
+from conftest import load_ml_components, make_submissions  # noqa: E402
+
+
+def to_request(quiz, history):
+    return {
+        'quiz': quiz,
+        'history': {
+            'user_id': quiz['user_id'],
+            'last_5_quizzes': [
+                {'quiz_id': i, 'score': past['total_score'], 'response_map': {}}
+                for i, past in enumerate(history)
+            ]
+        }
+    }
+
+
+def build_registry(root: str, submissions, histories, n_estimators: int):
+    from model_registry import ModelRegistry
+
+    X = load_ml_components().FeatureEngineering().extract_features_batch(submissions, histories)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestRegressor(n_estimators=n_estimators, n_jobs=1)
+    model.fit(scaler.transform(X), np.random.default_rng(0).integers(1, 100000, len(X)))
+    ModelRegistry(root).save(model, scaler, list(X.columns), version='loadtest')
+
+
+def start_server(workers: int, port: int, registry: str) -> subprocess.Popen:
+    env = {**os.environ, 'MODEL_REGISTRY_DIR': registry, 'RANK_EXECUTOR': 'thread', 'REDIS_URL': 'memory://'}
+    server = subprocess.Popen(
+        # Every request carries its history, so per-worker in-memory state is fine here
+        [sys.executable, 'serve.py', '--workers', str(workers), '--bind', f'127.0.0.1:{port}',
+         '--allow-per-worker-state'],
+        cwd=PACKAGE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f'http://127.0.0.1:{port}/model').json()['version'] == 'loadtest':
+                return server
+        except (httpx.HTTPError, KeyError, ValueError):
+            pass
+        time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"server with {workers} workers did not start")
+
+
+def client_process(args):
+    url, payloads, offset, concurrency = args
+
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+            async def one(i, payload):
+                # A fresh quiz_id per call so the results cache is not what gets measured
+                payload = {**payload, 'quiz': {**payload['quiz'], 'quiz_id': offset + i}}
+                async with semaphore:
+                    try:
+                        response = await client.post('/predict/rank', json=payload)
+                        return response.status_code == 200
+                    except httpx.TransportError:
+                        return False
+
+            return await asyncio.gather(*(one(i, p) for i, p in enumerate(payloads)))
+
+    ok = asyncio.run(run())
+    return sum(ok), len(ok) - sum(ok)
+
+
+def measure(url: str, payloads, client_processes: int, concurrency: int) -> Tuple[float, int]:
+    """Successful requests per second and the number of failed requests."""
+    shares = [
+        (url, payloads[i::client_processes], i * len(payloads), concurrency)
+        for i in range(client_processes)
+    ]
+    with multiprocessing.get_context('spawn').Pool(client_processes) as pool:
+        # Warm up connections and worker imports off the clock
+        pool.map(client_process, [(url, payloads[:20], 10 ** 8 + i * 20, 4) for i in range(client_processes)])
+        start = time.perf_counter()
+        results = pool.map(client_process, shares)
+        elapsed = time.perf_counter() - start
+    return sum(ok for ok, _ in results) / elapsed, sum(failed for _, failed in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=32, help="in-flight requests per client process")
+    parser.add_argument("--client-processes", type=int, default=2)
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    submissions, histories = make_submissions(args.requests * 180)
+    payloads = [to_request(q, h) for q, h in zip(submissions, histories)]
+
+    with tempfile.TemporaryDirectory() as registry:
+        build_registry(registry, submissions[:2000], histories[:2000], args.n_estimators)
+
+        baseline = None
+        for workers in args.workers:
+            server = start_server(workers, args.port, registry)
+            try:
+                rps, failed = measure(f'http://127.0.0.1:{args.port}', payloads, args.client_processes, args.concurrency)
+            finally:
+                server.terminate()
+                server.wait()
+            baseline = baseline or rps / workers
+            print(f"{workers:>3} workers: {rps:10.1f} req/s   scaling efficiency "
+                  f"{rps / (baseline * workers):6.1%}   {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
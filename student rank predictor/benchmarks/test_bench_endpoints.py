@@ -0,0 +1,97 @@
+# benchmarks/test_bench_endpoints.py
+"""The HTTP endpoints end to end through TestClient: body parsing and
+validation, feature preparation, the batched model call and uncertainty.
+
+/predict/rank is measured with both wire formats, per-object JSON and the
+compact parallel arrays (scoring.py), on the same 180-question quiz.
+"""
+import itertools
+import time
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import StandardScaler
+
+from conftest import make_submissions, mean_seconds
+from model_registry import ModelArtifact
+from scoring import compact_responses
+
+pytest.importorskip("pytest_benchmark")
+pytest.importorskip("httpx")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import backend  # noqa: E402
+
+BATCH_SIZE = 100
+
+
+def to_request(quiz, history):
+    return {
+        'quiz': quiz,
+        'history': {
+            'user_id': quiz['user_id'],
+            'last_5_quizzes': [
+                {'quiz_id': i, 'score': past['total_score'], 'response_map': {}}
+                for i, past in enumerate(history)
+            ]
+        }
+    }
+
+
+@pytest.fixture(scope="module")
+def client(ml_components):
+    submissions, histories = make_submissions(BATCH_SIZE * 180)
+    requests = [to_request(q, h) for q, h in zip(submissions, histories)]
+
+    # Fit a throwaway model on the training features so the endpoints can run without a registry
+    X = ml_components.FeatureEngineering().extract_features_batch(submissions, histories)
+    scaler = StandardScaler().fit(X)
+    model = RandomForestRegressor()
+    model.fit(scaler.transform(X), np.random.default_rng(0).integers(1, 100000, len(X)))
+    backend.rank_predictor.load_artifact(ModelArtifact('bench', model, scaler, list(X.columns), time.time()))
+
+    with TestClient(backend.app) as test_client:
+        test_client.requests_payload = requests
+        yield test_client
+
+
+# Shared by every benchmark so no two requests for the same user share a cache key
+_quiz_ids = itertools.count()
+
+
+def _uncached(request):
+    # A fresh quiz_id per call so the results cache is not what gets measured
+    return {**request, 'quiz': {**request['quiz'], 'quiz_id': next(_quiz_ids)}}
+
+
+def _post_ok(client, path, request):
+    response = client.post(path, json=_uncached(request))
+    assert response.status_code == 200, response.text
+    return response
+
+
+@pytest.mark.parametrize("wire_format", ["json", "compact"])
+def test_predict_rank_endpoint(benchmark, client, wire_format):
+    request = client.requests_payload[0]
+    path = '/predict/rank'
+    if wire_format == "compact":
+        request = {**request, 'quiz': {**request['quiz'], 'responses': compact_responses(request['quiz']['responses'])}}
+        path = '/predict/rank/compact'
+    benchmark(_post_ok, client, path, request)
+
+
+def test_predict_rank_batch_endpoint(benchmark, client):
+    def post_batch():
+        response = client.post('/predict/rank/batch', json=client.requests_payload)
+        assert response.status_code == 200, response.text
+
+    benchmark(post_batch)
+    mean = mean_seconds(benchmark)
+    if mean is not None:
+        benchmark.extra_info["per_row_ms"] = mean / BATCH_SIZE * 1e3
+
+
+def test_analyze_performance_endpoint(benchmark, client):
+    benchmark(_post_ok, client, '/analyze/performance', client.requests_payload[0])
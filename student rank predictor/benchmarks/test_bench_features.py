@@ -0,0 +1,42 @@
+# benchmarks/test_bench_features.py
+import pandas as pd
+import pytest
+
+from conftest import RESPONSE_SIZES, make_submissions, peak_memory_mb
+
+pytest.importorskip("pytest_benchmark")
+
+# The per-student loop is only timed on a prefix; it scales linearly
+SINGLE_PATH_STUDENTS = 200
+
+
+@pytest.mark.parametrize("n_responses", RESPONSE_SIZES)
+def test_extract_features_batch(benchmark, ml_components, n_responses):
+    fe = ml_components.FeatureEngineering()
+    submissions, histories = make_submissions(n_responses)
+
+    benchmark.extra_info["students"] = len(submissions)
+    benchmark.extra_info["peak_memory_mb"] = peak_memory_mb(
+        fe.extract_features_batch, submissions, histories
+    )
+    benchmark(fe.extract_features_batch, submissions, histories)
+
+
+@pytest.mark.parametrize("n_responses", RESPONSE_SIZES)
+def test_extract_features_single(benchmark, ml_components, n_responses):
+    fe = ml_components.FeatureEngineering()
+    submissions, histories = make_submissions(n_responses)
+    submissions = submissions[:SINGLE_PATH_STUDENTS]
+    histories = histories[:SINGLE_PATH_STUDENTS]
+
+    def per_student():
+        # The per-student path: per-dict topic/temporal features, one frame row each
+        for quiz, history in zip(submissions, histories):
+            features = fe.extract_topic_features(quiz['responses'])
+            features.update(fe.extract_temporal_features(history))
+            features['consistency'] = 1 - features['score_std'] / features['avg_score']
+            features['improvement_rate'] = features['score_trend'] / features['avg_score']
+            pd.DataFrame([features])
+
+    benchmark.extra_info["students"] = len(submissions)
+    benchmark(per_student)
@@ -0,0 +1,51 @@
+# benchmarks/test_bench_model.py
+import numpy as np
+import pytest
+
+from conftest import full_only, make_submissions, mean_seconds
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.fixture(scope="module")
+def training_data(ml_components):
+    fe = ml_components.FeatureEngineering()
+    submissions, histories = make_submissions(500 * 180)
+    X = fe.extract_features_batch(submissions, histories)
+    y = np.random.default_rng(0).integers(1, 100000, len(X))
+    return X, y
+
+
+@pytest.fixture(scope="module")
+def fitted_predictor(ml_components, training_data):
+    X, y = training_data
+    predictor = ml_components.RankPredictor()
+    predictor.feature_columns = list(X.columns)
+    predictor.feature_engineering.feature_columns = predictor.feature_columns
+    X_scaled = predictor.feature_engineering.scaler.fit_transform(X)
+    predictor.best_model = predictor.models['rf'].fit(X_scaled, y)
+    return predictor
+
+
+@full_only
+def test_train_grid_search(benchmark, ml_components, training_data):
+    X, y = training_data
+    predictor = ml_components.RankPredictor()
+    benchmark.pedantic(predictor.train, args=(X, y), rounds=1, iterations=1)
+
+
+@pytest.mark.parametrize("batch_size", [1, 100, 10_000])
+def test_model_inference(benchmark, fitted_predictor, training_data, batch_size):
+    X, _ = training_data
+    X_scaled = fitted_predictor.feature_engineering.scaler.transform(X)
+    rows = X_scaled[np.arange(batch_size) % len(X_scaled)]
+
+    benchmark(fitted_predictor.best_model.predict, rows)
+    mean = mean_seconds(benchmark)
+    if mean is not None:
+        benchmark.extra_info["per_row_us"] = mean / batch_size * 1e6
+
+
+def test_predict_end_to_end(benchmark, fitted_predictor):
+    submissions, histories = make_submissions(180)
+    benchmark(fitted_predictor.predict, submissions[0], histories[0])
@@ -0,0 +1,171 @@
+# bulk_ingest.py
+"""Stream JSON/JSONL quiz dumps into quiz_submissions / quiz_responses.
+
+    python bulk_ingest.py dumps/*.jsonl --database-url sqlite:///rank_predictor.db
+"""
+import argparse
+import json
+import logging
+import time
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import insert
+
+from db import get_engine, models
+from feature_store import FeatureStore
+from prediction_cache import PredictionCache
+from rolling_stats import RollingStatsStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 500
+
+RESPONSE_FIELDS = (
+    'question_id', 'selected_option_id', 'correct_option_id',
+    'topic', 'subtopic', 'difficulty', 'time_taken'
+)
+
+
+def iter_records(path: str) -> Iterator[Dict]:
+    """Yield submission dicts from a .jsonl file (one per line) or a .json array."""
+    with open(path) as f:
+        if path.endswith('.jsonl'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            data = json.load(f)
+            yield from data if isinstance(data, list) else [data]
+
+
+def validate_record(record: Dict) -> Dict:
+    """Check a raw record against QuizSubmissionCreate and flatten it for insert."""
+    if 'user_id' not in record:
+        raise ValueError("record has no user_id")
+    submission = models.QuizSubmissionCreate(**record)
+    return {
+        'user_id': int(record['user_id']),
+        'total_score': submission.total_score,
+        'total_time': submission.total_time,
+        'responses': [
+            {field: getattr(response, field) for field in RESPONSE_FIELDS}
+            for response in submission.responses
+        ]
+    }
+
+
+def _chunks(iterable: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class BulkLoader:
+    """Chunked executemany loader for quiz submissions and their responses.
+
+    Each chunk is written in its own transaction: one multi-row INSERT ...
+    RETURNING for the submissions, then one executemany for all of their
+    responses. Listeners are called with the committed chunk (each record
+    carries its new ``id``) so derived stores can update incrementally.
+    """
+
+    def __init__(self, engine, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 listeners: Optional[List[Callable[[List[Dict]], None]]] = None):
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.listeners = listeners or []
+
+    def load(self, records: Iterable[Dict]) -> Dict:
+        stats = {'submissions': 0, 'responses': 0, 'rejected': 0}
+        start = time.perf_counter()
+
+        for chunk in _chunks(records, self.chunk_size):
+            valid = []
+            for record in chunk:
+                try:
+                    valid.append(validate_record(record))
+                except Exception as e:
+                    stats['rejected'] += 1
+                    logger.warning("Skipping invalid submission: %s", e)
+            if not valid:
+                continue
+
+            stats['responses'] += self._write_chunk(valid)
+            stats['submissions'] += len(valid)
+            for listener in self.listeners:
+                listener(valid)
+
+        stats['seconds'] = time.perf_counter() - start
+        rows = stats['submissions'] + stats['responses']
+        stats['rows_per_sec'] = rows / stats['seconds'] if stats['seconds'] else 0.0
+        return stats
+
+    def _write_chunk(self, submissions: List[Dict]) -> int:
+        submission_table = models.QuizSubmission.__table__
+        response_table = models.QuizResponse.__table__
+
+        with self.engine.begin() as conn:
+            ids = conn.execute(
+                insert(submission_table).returning(
+                    submission_table.c.id, sort_by_parameter_order=True
+                ),
+                [
+                    {
+                        'user_id': submission['user_id'],
+                        'total_score': submission['total_score'],
+                        'total_time': submission['total_time']
+                    }
+                    for submission in submissions
+                ]
+            ).scalars().all()
+
+            response_rows = []
+            for submission_id, submission in zip(ids, submissions):
+                submission['id'] = submission_id
+                for response in submission['responses']:
+                    response_rows.append({'submission_id': submission_id, **response})
+            if response_rows:
+                conn.execute(insert(response_table), response_rows)
+
+        return len(response_rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load quiz submission dumps")
+    parser.add_argument("paths", nargs="+", help=".json or .jsonl dump files")
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--create-tables", action="store_true")
+    parser.add_argument("--update-stats", action="store_true",
+                        help="fold submissions into the per-user rolling stats (REDIS_URL)")
+    parser.add_argument("--update-features", action="store_true",
+                        help="write each submission's features to the feature store (implies --update-stats)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    engine = get_engine(args.database_url)
+    if args.create_tables:
+        models.Base.metadata.create_all(engine)
+
+    # Cached analysis/rank results (REDIS_URL) of bulk-loaded users are stale
+    loader = BulkLoader(engine, chunk_size=args.chunk_size, listeners=[PredictionCache().listener])
+    if args.update_features:
+        # The feature store updates the rolling stats itself, before reading them
+        loader.listeners.append(FeatureStore(engine, RollingStatsStore()).listener)
+    elif args.update_stats:
+        loader.listeners.append(RollingStatsStore().listener)
+    records = (record for path in args.paths for record in iter_records(path))
+    stats = loader.load(records)
+    print(
+        f"Loaded {stats['submissions']} submissions / {stats['responses']} responses "
+        f"({stats['rejected']} rejected) in {stats['seconds']:.2f}s "
+        f"= {stats['rows_per_sec']:.0f} rows/sec"
+    )
+
+
+if __name__ == "__main__":
+    main()
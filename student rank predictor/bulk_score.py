@@ -0,0 +1,317 @@
+# bulk_score.py
+"""Score every student after a mock test: rank, confidence and eligible colleges.
+
+    python bulk_score.py --database-url sqlite:///rank_predictor.db --workers 4 \
+        --chunk-size 500 --output colleges.jsonl
+
+Users are paged out of quiz_submissions by user id (keyset, no OFFSET) and
+each chunk is scored in a forked process pool: history and latest-quiz
+features (ml-components FeatureEngineering), model prediction and spread
+with the registry artifact, college eligibility. Workers inherit the model,
+college index and feature pipeline the parent loaded, so nothing is
+pickled per chunk but the user id range and the scored rows.
+
+At most ``--max-in-flight`` chunks are queued; finished chunks are written
+to rank_predictions in submission order by the parent, the only writer.
+After each write the checkpoint (``--checkpoint``, by default next to
+``--output`` as ``<output>.checkpoint.json``) records the last scored
+user id and the length of ``--output``, and rerunning the same command
+resumes from there. A chunk written before a crash but after the last
+checkpoint is replaced rather than duplicated: every row of a run shares
+one prediction_date, so its database rows are deleted and rewritten, and
+the output file is truncated back to its checkpointed length.
+
+The model must be an artifact saved with ``ModelRegistry.save_predictor``
+(it needs named feature columns).
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, insert, select
+
+from college_index import CollegeCutoffIndex
+from db import DATABASE_URL, get_engine, get_sessionmaker, models
+from inference_pool import InferencePool
+from model_registry import DEFAULT_REGISTRY_DIR, ModelRegistry
+from module_loader import load_ml_components
+from uncertainty import RANK_MC_DRAWS, RANK_SCORE_SIGMA, RankUncertainty
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 500
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+
+# Loaded by the parent before the pool forks; workers read it from here
+_state: Dict = {}
+
+
+def user_chunks(engine, after_user_id: int, chunk_size: int):
+    """Yield (after, last) user id ranges of ``chunk_size`` users, in id order."""
+    user_id = models.QuizSubmission.__table__.c.user_id
+    with engine.connect() as conn:
+        while True:
+            ids = conn.execute(
+                select(user_id).distinct().where(user_id > after_user_id)
+                .order_by(user_id).limit(chunk_size)
+            ).scalars().all()
+            if not ids:
+                return
+            yield after_user_id, ids[-1]
+            after_user_id = ids[-1]
+
+
+def _fetch_chunk(engine, after_user_id: int, last_user_id: int) -> Tuple[List[int], List[Dict], List[List[Dict]]]:
+    """Each user's latest submission (with responses) and full score history."""
+    submissions = models.QuizSubmission.__table__
+    responses = models.QuizResponse.__table__
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(submissions.c.id, submissions.c.user_id, submissions.c.total_score, submissions.c.total_time)
+            .where(submissions.c.user_id > after_user_id, submissions.c.user_id <= last_user_id)
+            .order_by(submissions.c.user_id, submissions.c.id)
+        ).all()
+
+        histories, latest = {}, {}
+        for row in rows:
+            histories.setdefault(row.user_id, []).append(
+                {'total_score': row.total_score, 'total_time': row.total_time}
+            )
+            latest[row.user_id] = row
+
+        by_submission = {row.id: [] for row in latest.values()}
+        for response in conn.execute(
+            select(responses.c.submission_id, responses.c.topic, responses.c.selected_option_id,
+                   responses.c.correct_option_id, responses.c.time_taken)
+            .where(responses.c.submission_id.in_(list(by_submission)))
+        ):
+            by_submission[response.submission_id].append(response._asdict())
+
+    user_ids = list(latest)
+    quizzes = [
+        {'total_score': latest[u].total_score, 'total_time': latest[u].total_time,
+         'responses': by_submission[latest[u].id]}
+        for u in user_ids
+    ]
+    return user_ids, quizzes, [histories[u] for u in user_ids]
+
+
+def score_chunk(after_user_id: int, last_user_id: int) -> Tuple[int, List[Dict]]:
+    """Worker: score the users in (after_user_id, last_user_id]."""
+    engine = _state.get('engine')
+    if engine is None or _state.get('engine_pid') != os.getpid():
+        # Never reuse the parent's pooled connections after fork
+        engine = _state['engine'] = get_engine(_state['database_url'])
+        _state['engine_pid'] = os.getpid()
+
+    user_ids, quizzes, histories = _fetch_chunk(engine, after_user_id, last_user_id)
+    if not user_ids:
+        return last_user_id, []
+
+    frame = _state['feature_engineering'].extract_features_batch(quizzes, histories)
+    X = _state['scaler'].transform(frame)
+    ranks = _state['model'].predict(X).astype(int)
+    confidence = _state['uncertainty'].intervals(X)['confidence']
+
+    colleges = [None] * len(user_ids)
+    if _state['college_index'] is not None:
+        colleges = _state['college_index'].eligible_batch(ranks, _state['category'], _state['year'])
+
+    features = frame.to_numpy().tolist()
+    columns = list(frame.columns)
+    return last_user_id, [
+        {
+            'user_id': user_id,
+            'predicted_rank': int(rank),
+            'confidence_score': None if np.isnan(conf) else float(conf),
+            # NaN is not valid JSON; unattempted topics are stored as null
+            'features_used': {name: (None if value != value else value) for name, value in zip(columns, row)},
+            'eligible_colleges': eligible
+        }
+        for user_id, rank, conf, row, eligible in zip(user_ids, ranks, confidence, features, colleges)
+    ]
+
+
+def _write_chunk(engine, rows: List[Dict], run_date: datetime):
+    table = models.RankPrediction.__table__
+    with engine.begin() as conn:
+        # A chunk may already be written if the run crashed before checkpointing it
+        conn.execute(delete(table).where(
+            table.c.user_id.in_([row['user_id'] for row in rows]),
+            table.c.prediction_date == run_date
+        ))
+        conn.execute(insert(table), [
+            {
+                'user_id': row['user_id'],
+                'predicted_rank': row['predicted_rank'],
+                'confidence_score': row['confidence_score'],
+                'prediction_date': run_date,
+                'features_used': row['features_used']
+            }
+            for row in rows
+        ])
+
+
+def load_checkpoint(path: str) -> Optional[Dict]:
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return None
+    return None if checkpoint.get('finished') else checkpoint
+
+
+def save_checkpoint(path: str, checkpoint: Dict):
+    with open(path + ".tmp", "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(path + ".tmp", path)
+
+
+def _load_college_index(engine) -> Optional[CollegeCutoffIndex]:
+    with get_sessionmaker(engine)() as session:
+        index = CollegeCutoffIndex.from_session(session, models)
+    # An empty college table gives an index with no categories
+    return index if index.categories else None
+
+
+def run(database_url: str, artifact, checkpoint_path: str, workers: Optional[int] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE, max_in_flight: Optional[int] = None, category: str = 'general',
+        year: Optional[int] = None, output: Optional[str] = None) -> Dict:
+    if not artifact.feature_columns:
+        raise ValueError(f"model {artifact.version} has no feature columns; save it with save_predictor")
+
+    engine = get_engine(database_url)
+    checkpoint = load_checkpoint(checkpoint_path)
+    if checkpoint is not None and checkpoint['model_version'] != artifact.version:
+        raise ValueError(f"checkpoint {checkpoint_path} is for model {checkpoint['model_version']}, "
+                         f"not {artifact.version}; delete it to start over")
+    if checkpoint is None:
+        checkpoint = {
+            'model_version': artifact.version,
+            'run_date': datetime.utcnow().isoformat(),
+            'after_user_id': -1,
+            'users': 0
+        }
+    else:
+        logger.info("Resuming after user %s (%s users already scored)",
+                    checkpoint['after_user_id'], checkpoint['users'])
+    run_date = datetime.fromisoformat(checkpoint['run_date'])
+
+    feature_engineering = load_ml_components().FeatureEngineering()
+    feature_engineering.feature_columns = artifact.feature_columns
+    college_index = _load_college_index(engine)
+    if college_index is None:
+        logger.warning("No college cutoffs in the database; skipping college eligibility")
+    _state.update(
+        database_url=database_url,
+        model=artifact.model,
+        scaler=artifact.scaler,
+        # The same forest spread plus score noise as /predict/rank
+        uncertainty=RankUncertainty.from_feature_columns(
+            artifact.model, artifact.scaler, artifact.feature_columns, RANK_SCORE_SIGMA, n_draws=RANK_MC_DRAWS
+        ),
+        feature_engineering=feature_engineering,
+        college_index=college_index,
+        category=category,
+        year=year
+    )
+
+    pool = InferencePool('process', workers)
+    max_in_flight = max_in_flight or 2 * pool.workers
+    pending = deque()
+    scored = 0
+    start = time.perf_counter()
+    out = None
+    if output:
+        out = open(output, 'a')
+        if checkpoint.get('output_bytes') is None:
+            checkpoint['output_bytes'] = out.tell()
+        else:
+            # Drop lines of chunks written after the last checkpoint
+            out.truncate(checkpoint['output_bytes'])
+    try:
+        pool.start()
+
+        def drain_one():
+            nonlocal scored
+            last_user_id, rows = pending.popleft().result()
+            if rows:
+                _write_chunk(engine, rows, run_date)
+                if out is not None:
+                    for row in rows:
+                        out.write(json.dumps({key: row[key] for key in
+                                              ('user_id', 'predicted_rank', 'eligible_colleges')}) + "\n")
+                    out.flush()
+                    checkpoint['output_bytes'] = out.tell()
+            scored += len(rows)
+            checkpoint['after_user_id'] = last_user_id
+            checkpoint['users'] += len(rows)
+            save_checkpoint(checkpoint_path, checkpoint)
+
+        # Chunks are written in the order they were queued, so the checkpoint
+        # never moves past a user whose chunk is still being scored
+        for after_user_id, last_user_id in user_chunks(engine, checkpoint['after_user_id'], chunk_size):
+            if len(pending) >= max_in_flight:
+                drain_one()
+            pending.append(pool.submit(score_chunk, after_user_id, last_user_id))
+        while pending:
+            drain_one()
+    finally:
+        pool.shutdown()
+        if out is not None:
+            out.close()
+
+    checkpoint['finished'] = True
+    save_checkpoint(checkpoint_path, checkpoint)
+
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux
+    return {
+        'users': scored,
+        'seconds': elapsed,
+        'users_per_sec': scored / elapsed if elapsed else 0.0,
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'worker_max_rss_mb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score every student's latest quiz in bulk")
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--registry", default=DEFAULT_REGISTRY_DIR)
+    parser.add_argument("--version", default=None, help="model version (default: the registry's LATEST)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="users per chunk")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="queued chunks (default: 2 per worker)")
+    parser.add_argument("--checkpoint", default=None,
+                        help=f"resume state (default: <output>{CHECKPOINT_SUFFIX}; required without --output)")
+    parser.add_argument("--category", default="general")
+    parser.add_argument("--year", type=int, default=None)
+    parser.add_argument("--output", default=None, help="append user_id/rank/colleges as JSON lines")
+    args = parser.parse_args()
+    checkpoint = args.checkpoint or (args.output + CHECKPOINT_SUFFIX if args.output else None)
+    if checkpoint is None:
+        parser.error("pass --checkpoint, or --output to keep the checkpoint next to it")
+
+    logging.basicConfig(level=logging.INFO)
+    artifact = ModelRegistry(args.registry).load(args.version)
+    stats = run(
+        args.database_url or DATABASE_URL,
+        artifact, checkpoint, args.workers, args.chunk_size, args.max_in_flight,
+        args.category, args.year, args.output
+    )
+    print(
+        f"Scored {stats['users']} users in {stats['seconds']:.2f}s = {stats['users_per_sec']:.0f} users/sec; "
+        f"max RSS {stats['max_rss_mb']:.0f} MB (parent), {stats['worker_max_rss_mb']:.0f} MB (largest worker)"
+    )
+
+
+if __name__ == "__main__":
+    main()
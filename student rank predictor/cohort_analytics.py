@@ -0,0 +1,211 @@
+# cohort_analytics.py
+"""Cohort-wide topic / difficulty / question statistics over quiz_responses.
+
+Streams the table in fixed-size chunks so memory stays bounded no matter
+how many responses there are:
+
+    python cohort_analytics.py --output cohort_report.json --chunk-size 50000
+"""
+import argparse
+import json
+from typing import TYPE_CHECKING, Dict, Iterator, Optional
+
+import numpy as np
+from sqlalchemy import select
+
+if TYPE_CHECKING:  # pandas is only needed to build a report, not to serve one
+    import pandas as pd
+
+MAX_TIME = 3600          # seconds; slower answers share the last histogram bin
+ACCURACY_BINS = 101      # whole-percent bins for per-student topic accuracy
+DEFAULT_CHUNK_SIZE = 50_000
+COLUMNS = ['submission_id', 'question_id', 'topic', 'subtopic', 'difficulty',
+           'selected_option_id', 'correct_option_id', 'time_taken']
+
+
+def iter_response_chunks(engine, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator['pd.DataFrame']:
+    """Yield quiz_responses as DataFrames of at most ``chunk_size`` rows, by submission."""
+    import pandas as pd
+    from db import models
+
+    table = models.QuizResponse.__table__
+    query = select(*(table.c[name] for name in COLUMNS)).order_by(table.c.submission_id, table.c.id)
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(query)
+        for rows in result.partitions():
+            yield pd.DataFrame(rows, columns=COLUMNS)
+
+
+def _percentile(histogram: np.ndarray, q: float) -> Optional[float]:
+    total = histogram.sum()
+    if not total:
+        return None
+    return float(np.searchsorted(np.cumsum(histogram), q / 100 * total, side='left'))
+
+
+class _GroupStats:
+    def __init__(self):
+        self.attempts = 0
+        self.correct = 0
+        self.time_histogram = np.zeros(MAX_TIME + 1, dtype=np.int64)
+
+    def summary(self) -> Dict:
+        return {
+            'attempts': int(self.attempts),
+            'accuracy': self.correct / self.attempts if self.attempts else None,
+            'time_p50': _percentile(self.time_histogram, 50),
+            'time_p90': _percentile(self.time_histogram, 90)
+        }
+
+
+class CohortAnalytics:
+    """Accumulates cohort statistics one chunk at a time.
+
+    Chunks must arrive ordered by submission so per-student topic accuracy
+    can be finalised as each submission ends; a submission split across
+    chunks is carried over to the next one.
+    """
+
+    DIMENSIONS = ('topic', 'subtopic', 'difficulty')
+
+    def __init__(self):
+        self.groups = {dimension: {} for dimension in self.DIMENSIONS}
+        self.questions = {}
+        self.topic_accuracy_histograms = {}
+        self._carry = None
+
+    def add_chunk(self, chunk: 'pd.DataFrame'):
+        import pandas as pd
+
+        if self._carry is not None:
+            chunk = pd.concat([self._carry, chunk], ignore_index=True)
+        if chunk.empty:
+            return
+
+        # Hold back the last submission: its rows may continue in the next chunk
+        last = chunk['submission_id'].iat[-1]
+        tail = chunk['submission_id'].to_numpy() == last
+        self._carry = chunk[tail]
+        self._accumulate(chunk[~tail])
+
+    def finish(self) -> 'CohortReport':
+        if self._carry is not None:
+            self._accumulate(self._carry)
+            self._carry = None
+        return CohortReport.from_analytics(self)
+
+    def _accumulate(self, chunk: 'pd.DataFrame'):
+        import pandas as pd
+
+        if chunk.empty:
+            return
+        chunk = chunk.assign(
+            correct=(chunk['selected_option_id'] == chunk['correct_option_id']).astype(np.int64),
+            time_bin=np.clip(chunk['time_taken'].fillna(0).to_numpy(dtype=np.int64), 0, MAX_TIME)
+        )
+
+        for dimension in self.DIMENSIONS:
+            groups = self.groups[dimension]
+            for name, rows in chunk.groupby(dimension, sort=False):
+                stats = groups.get(name)
+                if stats is None:
+                    stats = groups[name] = _GroupStats()
+                stats.attempts += len(rows)
+                stats.correct += int(rows['correct'].sum())
+                stats.time_histogram += np.bincount(rows['time_bin'], minlength=MAX_TIME + 1)
+
+        per_question = chunk.groupby('question_id', sort=False)['correct'].agg(['size', 'sum'])
+        for question_id, (attempts, correct) in zip(per_question.index, per_question.to_numpy()):
+            totals = self.questions.setdefault(int(question_id), [0, 0])
+            totals[0] += int(attempts)
+            totals[1] += int(correct)
+
+        per_student = chunk.groupby(['submission_id', 'topic'], sort=False)['correct'].mean()
+        accuracy_bins = np.rint(per_student.to_numpy() * 100).astype(np.int64)
+        topics = per_student.index.get_level_values('topic')
+        for topic, bins in pd.Series(accuracy_bins, index=topics).groupby(level=0):
+            histogram = self.topic_accuracy_histograms.get(topic)
+            if histogram is None:
+                histogram = self.topic_accuracy_histograms[topic] = np.zeros(ACCURACY_BINS, dtype=np.int64)
+            histogram += np.bincount(bins.to_numpy(), minlength=ACCURACY_BINS)
+
+
+class CohortReport:
+    """Finished cohort statistics; JSON round-trippable for serving."""
+
+    def __init__(self, groups: Dict, questions: Dict, topic_accuracy_histograms: Dict):
+        self.groups = groups
+        self.questions = questions
+        self.topic_accuracy_histograms = {
+            topic: np.asarray(histogram, dtype=np.int64)
+            for topic, histogram in topic_accuracy_histograms.items()
+        }
+
+    @classmethod
+    def from_analytics(cls, analytics: CohortAnalytics) -> 'CohortReport':
+        groups = {
+            dimension: {str(name): stats.summary() for name, stats in named.items()}
+            for dimension, named in analytics.groups.items()
+        }
+        # Classical item difficulty index: share of attempts answered correctly
+        questions = {
+            question_id: {'attempts': attempts, 'difficulty_index': correct / attempts}
+            for question_id, (attempts, correct) in analytics.questions.items()
+        }
+        return cls(groups, questions, analytics.topic_accuracy_histograms)
+
+    def weak_area_threshold(self, topic: str, percentile: float) -> Optional[float]:
+        """Topic accuracy (in %) below which a student is in the cohort's bottom ``percentile``."""
+        histogram = self.topic_accuracy_histograms.get(topic)
+        return _percentile(histogram, percentile) if histogram is not None else None
+
+    def to_dict(self) -> Dict:
+        return {
+            'groups': self.groups,
+            'questions': {str(q): stats for q, stats in self.questions.items()},
+            'topic_accuracy_histograms': {
+                topic: histogram.tolist() for topic, histogram in self.topic_accuracy_histograms.items()
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'CohortReport':
+        return cls(
+            data['groups'],
+            {int(q): stats for q, stats in data['questions'].items()},
+            data['topic_accuracy_histograms']
+        )
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path: str) -> 'CohortReport':
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def run(chunks) -> CohortReport:
+    analytics = CohortAnalytics()
+    for chunk in chunks:
+        analytics.add_chunk(chunk)
+    return analytics.finish()
+
+
+def main():
+    from db import get_engine
+
+    parser = argparse.ArgumentParser(description="Compute cohort-wide quiz analytics")
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--output", default="cohort_report.json")
+    args = parser.parse_args()
+
+    report = run(iter_response_chunks(get_engine(args.database_url), args.chunk_size))
+    report.save(args.output)
+    print(f"Wrote cohort report for {len(report.questions)} questions to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# college_index.py
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+CATEGORIES = ('general', 'sc', 'st', 'obc')
+
+
+class CollegeCutoffIndex:
+    """In-memory closing-rank index for college eligibility.
+
+    Cutoffs are grouped per (category, year) and sorted ascending, so the
+    colleges a rank is eligible for (cutoff >= rank) are the suffix found
+    with one binary search. Results are ordered most selective first.
+    """
+
+    def __init__(self, records: Iterable[Tuple[str, Optional[int], Dict[str, Optional[int]]]]):
+        grouped = {}
+        for name, year, cutoffs in records:
+            for category, cutoff in cutoffs.items():
+                if cutoff is None:
+                    continue
+                grouped.setdefault((category, year), []).append((cutoff, name))
+
+        self._tables = {}
+        self._latest_year = {}
+        for (category, year), rows in grouped.items():
+            rows.sort(key=lambda row: row[0])
+            self._tables[(category, year)] = (
+                np.array([cutoff for cutoff, _ in rows], dtype=np.int64),
+                np.array([name for _, name in rows], dtype=object)
+            )
+            latest = self._latest_year.get(category, year)
+            if year is not None and (latest is None or year > latest):
+                latest = year
+            self._latest_year[category] = latest
+
+    @classmethod
+    def from_cutoff_map(cls, cutoffs: Dict[str, int], category: str = 'general',
+                        year: Optional[int] = None) -> 'CollegeCutoffIndex':
+        return cls((name, year, {category: cutoff}) for name, cutoff in cutoffs.items())
+
+    @classmethod
+    def from_session(cls, session, models) -> 'CollegeCutoffIndex':
+        """Load every ``CollegeCutoff`` row joined to its ``College``."""
+        cutoff = models.CollegeCutoff
+        query = (
+            select(models.College.name, cutoff.year, cutoff.general_cutoff,
+                   cutoff.sc_cutoff, cutoff.st_cutoff, cutoff.obc_cutoff)
+            .join(cutoff, cutoff.college_id == models.College.id)
+        )
+        return cls(
+            (name, year, dict(zip(CATEGORIES, category_cutoffs)))
+            for name, year, *category_cutoffs in session.execute(query)
+        )
+
+    @property
+    def categories(self) -> Tuple[str, ...]:
+        return tuple(self._latest_year)
+
+    def _table(self, category: str, year: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+        if category not in self._latest_year:
+            raise KeyError(f"no cutoffs for category {category!r}")
+        if year is None:
+            year = self._latest_year[category]
+        try:
+            return self._tables[(category, year)]
+        except KeyError:
+            raise KeyError(f"no {category} cutoffs for year {year}") from None
+
+    def eligible(self, rank: int, category: str = 'general', year: Optional[int] = None) -> List[str]:
+        cutoffs, names = self._table(category, year)
+        return names[np.searchsorted(cutoffs, rank, side='left'):].tolist()
+
+    def eligible_batch(self, ranks: Iterable[int], category: str = 'general',
+                       year: Optional[int] = None) -> List[List[str]]:
+        """Eligible colleges for many ranks with one vectorized search."""
+        cutoffs, names = self._table(category, year)
+        starts = np.searchsorted(cutoffs, np.asarray(ranks, dtype=np.int64), side='left')
+        return [names[start:].tolist() for start in starts]
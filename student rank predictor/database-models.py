@@ -1,7 +1,7 @@
 # models.py
 from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, JSON
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, configure_mappers
 from datetime import datetime
 
 Base = declarative_base()
@@ -72,6 +72,10 @@ class CollegeCutoff(Base):
     obc_cutoff = Column(Integer)
     college = relationship("College", back_populates="cutoff_history")
 
+# Resolve relationship targets now: the schema ``User`` below rebinds the
+# module name, and the mapped class must not be looked up by name later
+configure_mappers()
+
 # schemas.py
 from pydantic import BaseModel, EmailStr
 from typing import List, Optional
@@ -0,0 +1,19 @@
+# db.py
+import os
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from module_loader import load_database_models
+
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///rank_predictor.db")
+
+models = load_database_models()
+
+
+def get_engine(url: str = None):
+    return create_engine(url or DATABASE_URL)
+
+
+def get_sessionmaker(engine=None):
+    return sessionmaker(bind=engine or get_engine())
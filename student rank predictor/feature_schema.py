@@ -0,0 +1,33 @@
+# feature_schema.py
+"""Names and order of the rank model's features.
+
+Shared by ml-components.py (training), feature_store.py (storage) and the
+backend (serving) so the three cannot drift apart. Kept free of pandas
+and scikit-learn so the serving path can import it cheaply.
+
+``FEATURE_TOPICS`` is the topic registry: topics that get their own
+columns. Set ``FEATURE_TOPICS`` (comma-separated) to change it; the
+default covers both the three-subject (Biology) and the four-subject
+(Botany/Zoology) NEET papers.
+"""
+import os
+
+DEFAULT_FEATURE_TOPICS = ('Biology', 'Botany', 'Chemistry', 'Physics', 'Zoology')
+FEATURE_TOPICS = tuple(sorted(
+    topic.strip() for topic in os.environ.get("FEATURE_TOPICS", ",".join(DEFAULT_FEATURE_TOPICS)).split(",")
+    if topic.strip()
+))
+
+TOPIC_STATS = ('accuracy', 'avg_time', 'time_std')
+TEMPORAL_FEATURES = (
+    'avg_score', 'score_trend', 'score_std',
+    'avg_time', 'time_trend', 'time_efficiency'
+)
+DERIVED_FEATURES = ('consistency', 'improvement_rate')
+# Laid out the way extract_features_batch does: sorted topics, then
+# temporal, then derived features
+FEATURE_COLUMNS = [
+    *(f"{topic}_{stat}" for topic in FEATURE_TOPICS for stat in TOPIC_STATS),
+    *TEMPORAL_FEATURES,
+    *DERIVED_FEATURES
+]
@@ -0,0 +1,207 @@
+# feature_store.py
+"""Precomputed prediction features in a typed wide table, one row per submission.
+
+``FEATURE_COLUMNS`` (feature_schema.py) is the column registry: a fixed
+order shared by the table, training matrices and inference rows, so
+nothing depends on the key order of a feature dict. Topics outside
+``FEATURE_TOPICS`` have no columns; they are counted in
+``FeatureStore.unknown_topics`` and logged the first time they are seen.
+Topics a student did not attempt are stored as NULL (NaN).
+
+Rows are written at ingest time by the ``BulkLoader`` listener, using the
+user's rolling stats up to and including the submission for the temporal
+features. Training reads the whole matrix in one scan (``load_frame``) and
+inference fetches one row by key (``get`` / ``latest``).
+
+    python feature_store.py --database-url sqlite:///rank_predictor.db   # backfill
+"""
+import argparse
+import logging
+from collections import Counter, defaultdict
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+from sqlalchemy import Column, Float, ForeignKey, Integer, Table, delete, insert, select
+
+from db import models
+from feature_schema import FEATURE_COLUMNS, FEATURE_TOPICS
+from module_loader import load_ml_components
+from prediction_cache import InMemoryRedis
+from rolling_stats import RollingStatsStore
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+
+submission_features = Table(
+    "submission_features",
+    models.Base.metadata,
+    Column("user_id", Integer, ForeignKey("users.id"), primary_key=True),
+    Column("submission_id", Integer, ForeignKey("quiz_submissions.id"), primary_key=True),
+    *(Column(name, Float) for name in FEATURE_COLUMNS)
+)
+
+
+class FeatureStore:
+    """Reads and writes ``submission_features``.
+
+    ``stats`` supplies the temporal features; the listener folds every
+    submission into it, so do not also register the stats store's own
+    listener on the same loader. A ``feature_engineering`` passed in is
+    switched to ``FEATURE_COLUMNS`` once, here.
+    """
+
+    def __init__(self, engine, stats: Optional[RollingStatsStore] = None, feature_engineering=None):
+        self.engine = engine
+        self.stats = stats if stats is not None else RollingStatsStore()
+        self.unknown_topics = Counter()
+        self._feature_engineering = feature_engineering
+        if feature_engineering is not None:
+            feature_engineering.feature_columns = FEATURE_COLUMNS
+
+    @property
+    def feature_engineering(self):
+        # Only writers need the feature pipeline (pandas, sklearn); readers stay light
+        if self._feature_engineering is None:
+            self._feature_engineering = load_ml_components().FeatureEngineering()
+            self._feature_engineering.feature_columns = FEATURE_COLUMNS
+        return self._feature_engineering
+
+    def _count_unknown_topics(self, submissions: List[Dict]):
+        topics = Counter(
+            response['topic'] for submission in submissions for response in submission['responses']
+        )
+        for topic, count in topics.items():
+            if topic in FEATURE_TOPICS:
+                continue
+            if topic not in self.unknown_topics:
+                logger.warning("Topic %r is not in FEATURE_TOPICS; its responses are left out of the stored features",
+                               topic)
+            self.unknown_topics[topic] += count
+
+    def write(self, submissions: List[Dict], temporal: List[Dict[str, float]]) -> int:
+        """Compute and insert features for ingested submissions (each with its ``id``)."""
+        if not submissions:
+            return 0
+        self._count_unknown_topics(submissions)
+        matrix = self.feature_engineering.extract_features_batch(submissions, temporal=temporal).to_numpy()
+        rows = []
+        for submission, values in zip(submissions, matrix.tolist()):
+            row = {'user_id': submission['user_id'], 'submission_id': submission['id']}
+            # NaN (e.g. an unattempted topic) is stored as NULL
+            row.update((name, None if value != value else value) for name, value in zip(FEATURE_COLUMNS, values))
+            rows.append(row)
+        with self.engine.begin() as conn:
+            conn.execute(insert(submission_features), rows)
+        return len(rows)
+
+    def listener(self, submissions: List[Dict]):
+        """``BulkLoader`` listener: update each user's stats, then store the chunk's features."""
+        temporal = [
+            self.stats.update(submission['user_id'], submission['total_score'],
+                              submission['total_time'], submission.get('quiz_id')).temporal_features()
+            for submission in submissions
+        ]
+        self.write(submissions, temporal)
+
+    def _row(self, query) -> Optional[Dict[str, float]]:
+        with self.engine.connect() as conn:
+            row = conn.execute(query).first()
+        if row is None:
+            return None
+        return {name: np.nan if value is None else value for name, value in zip(FEATURE_COLUMNS, row)}
+
+    def _feature_select(self):
+        return select(*(submission_features.c[name] for name in FEATURE_COLUMNS))
+
+    def get(self, user_id: int, submission_id: int) -> Optional[Dict[str, float]]:
+        """Stored features of one submission, keyed by ``FEATURE_COLUMNS``."""
+        table = submission_features
+        return self._row(self._feature_select().where(
+            table.c.user_id == user_id, table.c.submission_id == submission_id
+        ))
+
+    def latest(self, user_id: int) -> Optional[Dict[str, float]]:
+        """Features of the user's most recent submission."""
+        table = submission_features
+        return self._row(self._feature_select().where(table.c.user_id == user_id)
+                         .order_by(table.c.submission_id.desc()).limit(1))
+
+    def load_matrix(self, user_ids: Optional[Iterable[int]] = None):
+        """(submission ids, float feature matrix) for every stored row, in one scan."""
+        table = submission_features
+        query = select(table.c.submission_id, *(table.c[name] for name in FEATURE_COLUMNS))
+        if user_ids is not None:
+            query = query.where(table.c.user_id.in_(list(user_ids)))
+        with self.engine.connect() as conn:
+            rows = conn.execute(query.order_by(table.c.submission_id)).all()
+        # NULLs become NaN in the float conversion
+        data = np.array(rows, dtype=float).reshape(len(rows), len(FEATURE_COLUMNS) + 1)
+        return data[:, 0].astype(np.int64), data[:, 1:]
+
+    def load_frame(self, user_ids: Optional[Iterable[int]] = None) -> 'pd.DataFrame':
+        """Training frame indexed by submission id, columns in ``FEATURE_COLUMNS`` order."""
+        import pandas as pd
+
+        submission_ids, matrix = self.load_matrix(user_ids)
+        return pd.DataFrame(matrix, index=pd.Index(submission_ids, name='submission_id'),
+                            columns=FEATURE_COLUMNS)
+
+
+def iter_submissions(engine, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[Dict]]:
+    """Stored submissions with their responses, chunked, in (user, submission) order."""
+    submissions = models.QuizSubmission.__table__
+    responses = models.QuizResponse.__table__
+    query = select(submissions.c.id, submissions.c.user_id, submissions.c.total_score,
+                   submissions.c.total_time).order_by(submissions.c.user_id, submissions.c.id)
+
+    with engine.connect() as conn, engine.connect() as response_conn:
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(query)
+        for rows in result.partitions():
+            by_submission = defaultdict(list)
+            response_rows = response_conn.execute(
+                select(responses.c.submission_id, responses.c.topic, responses.c.selected_option_id,
+                       responses.c.correct_option_id, responses.c.time_taken)
+                .where(responses.c.submission_id.in_([row.id for row in rows]))
+            )
+            for response in response_rows:
+                by_submission[response.submission_id].append(response._asdict())
+            yield [
+                {'id': row.id, 'user_id': row.user_id, 'total_score': row.total_score,
+                 'total_time': row.total_time, 'responses': by_submission[row.id]}
+                for row in rows
+            ]
+
+
+def backfill(engine, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """Rebuild ``submission_features`` from quiz_submissions / quiz_responses."""
+    submission_features.create(engine, checkfirst=True)
+    with engine.begin() as conn:
+        conn.execute(delete(submission_features))
+
+    # Replay every history from the start instead of touching the live rolling stats
+    store = FeatureStore(engine, RollingStatsStore(InMemoryRedis()))
+    written = 0
+    for chunk in iter_submissions(engine, chunk_size):
+        store.listener(chunk)
+        written += len(chunk)
+    return written
+
+
+def main():
+    from db import get_engine
+
+    parser = argparse.ArgumentParser(description="Backfill the submission feature store")
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    written = backfill(get_engine(args.database_url), args.chunk_size)
+    print(f"Stored features for {written} submissions ({len(FEATURE_COLUMNS)} columns)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# inference.py
+"""Rank lookups from a registry artifact, without the training stack.
+
+Imports only NumPy and joblib up front; scikit-learn is pulled in when the
+artifact is unpickled, and only the estimator modules the artifact needs.
+Neither ml-components.py (pandas, search tooling) nor any plotting library
+is imported, so a one-off lookup starts in a fraction of a second:
+
+    python inference.py features.json --registry models --version 20240101120000
+    python inference.py --users 17 42 --database-url sqlite:///rank_predictor.db
+
+``features.json`` holds a list of feature rows, either lists in the
+artifact's column order or objects keyed by its ``feature_columns`` (a
+missing key, such as an unattempted topic, is NaN as in training).
+``--users`` instead reads each user's latest row from the feature store
+(feature_store.py), for models trained on ``FeatureStore.load_frame``.
+"""
+import argparse
+import json
+import sys
+import warnings
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from model_registry import DEFAULT_REGISTRY_DIR, ModelArtifact, ModelRegistry
+
+FeatureRow = Union[Sequence[float], Dict[str, float]]
+
+
+class InferenceModel:
+    """A loaded scaler + estimator pair that only predicts."""
+
+    def __init__(self, artifact: ModelArtifact):
+        self.version = artifact.version
+        self.model = artifact.model
+        self.scaler = artifact.scaler
+        self.feature_columns = artifact.feature_columns
+
+    @classmethod
+    def from_registry(cls, root: str = DEFAULT_REGISTRY_DIR, version: Optional[str] = None) -> 'InferenceModel':
+        return cls(ModelRegistry(root).load(version))
+
+    def _matrix(self, rows: List[FeatureRow]) -> np.ndarray:
+        if rows and isinstance(rows[0], dict):
+            if self.feature_columns is None:
+                raise ValueError(f"model {self.version} has no feature names; pass rows as lists")
+            # Features missing from a row (e.g. an unattempted topic) are NaN, as in training
+            return np.array([[row.get(column, np.nan) for column in self.feature_columns] for row in rows],
+                            dtype=float)
+        return np.asarray(rows, dtype=float).reshape(len(rows), -1)
+
+    def predict(self, rows: List[FeatureRow]) -> np.ndarray:
+        """Predicted ranks for raw, unscaled feature rows, truncated like the API's."""
+        X = self._matrix(rows)
+        with warnings.catch_warnings():
+            # Scalers fitted on a DataFrame warn about plain arrays; rows are already in column order
+            warnings.filterwarnings('ignore', message='X does not have valid feature names')
+            X = self.scaler.transform(X)
+        return self.model.predict(X).astype(int)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Predict ranks from a saved model artifact")
+    parser.add_argument("features", nargs="?", help="JSON file with a list of feature rows, or - for stdin")
+    parser.add_argument("--users", type=int, nargs="+", help="predict from these users' stored features instead")
+    parser.add_argument("--database-url", default=None, help="feature store database for --users")
+    parser.add_argument("--registry", default=DEFAULT_REGISTRY_DIR)
+    parser.add_argument("--version", default=None, help="model version (default: the registry's LATEST)")
+    args = parser.parse_args(argv)
+    if (args.features is None) == (args.users is None):
+        parser.error("pass either a features file or --users")
+
+    if args.users:
+        from db import get_engine
+        from feature_store import FeatureStore
+
+        store = FeatureStore(get_engine(args.database_url))
+        rows = [store.latest(user_id) for user_id in args.users]
+        missing = [user_id for user_id, row in zip(args.users, rows) if row is None]
+        if missing:
+            parser.error(f"no stored features for users {missing}")
+    elif args.features == "-":
+        rows = json.load(sys.stdin)
+    else:
+        with open(args.features) as f:
+            rows = json.load(f)
+
+    model = InferenceModel.from_registry(args.registry, args.version)
+    print(json.dumps({'model_version': model.version, 'ranks': model.predict(rows).tolist()}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# inference_pool.py
+"""Executor for CPU-bound predictions called from async endpoints.
+
+RANK_EXECUTOR selects where model calls run:
+
+    thread   (default) a thread pool in the serving process; pair it with
+             several pre-forked server workers (see serve.py)
+    process  a fork-started process pool; children inherit the model the
+             parent already loaded, so tree arrays are shared copy-on-write
+             instead of being pickled per call
+
+Functions submitted in process mode must be importable module-level
+functions that read the (inherited) model from module state, e.g.
+``backend.predict_rank_rows``.
+"""
+import contextvars
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+EXECUTOR_KINDS = ('thread', 'process')
+
+
+class InferencePool(Executor):
+    """Swappable thread/process executor usable with ``loop.run_in_executor``.
+
+    ``restart`` replaces the underlying pool and lets the old one drain:
+    calls already submitted finish on the old workers, new calls go to the
+    new ones. In process mode that is how workers pick up a reloaded model.
+    """
+
+    def __init__(self, kind: str = 'thread', workers: Optional[int] = None):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"RANK_EXECUTOR must be one of {EXECUTOR_KINDS}, got {kind!r}")
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self._lock = threading.Lock()
+        # Created on first use: a pool made before a server fork would share
+        # its queues and pipes with every sibling worker
+        self._executor = None
+
+    def _create(self) -> Executor:
+        if self.kind == 'process':
+            return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('fork'))
+        return ThreadPoolExecutor(self.workers, thread_name_prefix='inference')
+
+    def _current(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._create()
+            return self._executor
+
+    def start(self):
+        """Fork process workers now, before the server starts more threads."""
+        if self.kind == 'process':
+            # With fork, the first submit launches every worker process
+            self._current().submit(os.getpid).result()
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        if self.kind == 'thread':
+            # Carry the caller's context (per-request stage timings) into the thread
+            return self._current().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        return self._current().submit(fn, *args, **kwargs)
+
+    def restart(self):
+        with self._lock:
+            old, self._executor = self._executor, self._create()
+        if old is not None:
+            old.shutdown(wait=False)
+        self.start()
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        with self._lock:
+            old, self._executor = self._executor, None
+        if old is not None:
+            old.shutdown(wait=wait, cancel_futures=cancel_futures)
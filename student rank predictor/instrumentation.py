@@ -0,0 +1,242 @@
+# instrumentation.py
+"""Per-stage timers and counters, Prometheus ``/metrics``, header-triggered
+profiling and slow-request logs.
+
+Everything is off unless METRICS_ENABLED=1. Disabled, ``stage()`` hands back
+one shared no-op context manager and ``inc``/``annotate`` return at once,
+and ``install`` adds no middleware, so instrumented code pays only an
+attribute check.
+
+    METRICS_ENABLED=1          collect and serve /metrics
+    SLOW_REQUEST_MS=250        log requests slower than this, with their stages
+    PROFILE_DIR=profiles       allow profiling; X-Profile: 1 on a request
+    PROFILE_SAMPLE_RATE=1.0    ... profiles this share of flagged requests
+
+Profiles are written with pyinstrument (HTML) when it is installed and
+cProfile (.prof, for ``python -m pstats`` / snakeviz) otherwise; the
+response carries the file name in ``X-Profile-Path``.
+
+Metrics are per process: stages that run in a RANK_EXECUTOR=process pool
+are not recorded, and each pre-forked server worker serves its own
+/metrics.
+"""
+import bisect
+import contextvars
+import cProfile
+import logging
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+PROFILE_HEADER = "x-profile"
+
+_NULL_STAGE = nullcontext()
+# Per-request stage timings and annotations for the slow-request log
+_request = contextvars.ContextVar("request_context", default=None)
+
+
+class _Histogram:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class _Stage:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics: 'Metrics', name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.metrics.observe('stage_seconds', self.name, elapsed)
+        context = _request.get()
+        if context is not None:
+            stages = context.setdefault('stages', {})
+            stages[self.name] = stages.get(self.name, 0.0) + elapsed
+        return False
+
+
+class Metrics:
+    """Histograms and counters keyed by (family, label), rendered in Prometheus text format."""
+
+    FAMILIES = {
+        'stage_seconds': ('histogram', 'stage', 'Time spent in each prediction pipeline stage'),
+        'request_seconds': ('histogram', 'path', 'Request latency by route'),
+        'events_total': ('counter', 'event', 'Counted pipeline events')
+    }
+
+    def __init__(self, enabled: bool = False, namespace: str = "rank"):
+        self.enabled = enabled
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._histograms = defaultdict(_Histogram)
+        self._counters = defaultdict(float)
+
+    def stage(self, name: str):
+        """Context manager timing one pipeline stage."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def observe(self, family: str, label: str, seconds: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._histograms[family, label].observe(seconds)
+
+    def inc(self, event: str, value: float = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters['events_total', event] += value
+
+    def annotate(self, **fields):
+        """Attach fields (e.g. feature-vector size) to the current request's slow log."""
+        if not self.enabled:
+            return
+        context = _request.get()
+        if context is not None:
+            context.update(fields)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            histograms = {key: (list(h.counts), h.total, h.count) for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+
+        for family, (kind, label, help_text) in self.FAMILIES.items():
+            name = f"{self.namespace}_{family}"
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == 'counter':
+                for (fam, value_label), value in sorted(counters.items()):
+                    if fam == family:
+                        lines.append(f'{name}{{{label}="{value_label}"}} {value:g}')
+                continue
+            for (fam, value_label), (counts, total, count) in sorted(histograms.items()):
+                if fam != family:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(BUCKETS + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                    lines.append(f'{name}_bucket{{{label}="{value_label}",le="{le}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{label}="{value_label}"}} {total:.6f}')
+                lines.append(f'{name}_count{{{label}="{value_label}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+class Profiler:
+    """One profiled request at a time, written under ``directory``."""
+
+    def __init__(self, directory: str, sample_rate: float = 1.0):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self._busy = threading.Lock()
+        try:
+            from pyinstrument import Profiler as PyinstrumentProfiler
+        except ImportError:
+            PyinstrumentProfiler = None
+        self._pyinstrument = PyinstrumentProfiler
+
+    def start(self, headers) -> Optional[object]:
+        if headers.get(PROFILE_HEADER) != "1" or random.random() >= self.sample_rate:
+            return None
+        # cProfile cannot nest, so overlapping flagged requests go unprofiled
+        if not self._busy.acquire(blocking=False):
+            return None
+        if self._pyinstrument is not None:
+            profiler = self._pyinstrument(async_mode='enabled')
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return profiler
+
+    def stop(self, profiler, path: str) -> str:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            stem = f"{int(time.time() * 1000)}-{os.getpid()}-{path.strip('/').replace('/', '_') or 'root'}"
+            if isinstance(profiler, cProfile.Profile):
+                profiler.disable()
+                filename = os.path.join(self.directory, f"{stem}.prof")
+                profiler.dump_stats(filename)
+            else:
+                profiler.stop()
+                filename = os.path.join(self.directory, f"{stem}.html")
+                with open(filename, 'w') as f:
+                    f.write(profiler.output_html())
+            return filename
+        finally:
+            self._busy.release()
+
+
+def log_if_slow(context: Dict, path: str, elapsed: float, threshold_ms: float):
+    if elapsed * 1000 < threshold_ms:
+        return
+    stages = ", ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in context.pop('stages', {}).items())
+    extra = ", ".join(f"{key}={value}" for key, value in context.items())
+    logger.warning("Slow request %s took %.1fms [%s] %s", path, elapsed * 1000, stages, extra)
+
+
+def metrics_from_env() -> Metrics:
+    return Metrics(enabled=os.environ.get("METRICS_ENABLED") == "1")
+
+
+def install(app, metrics: Metrics):
+    """Add the timing/profiling middleware and GET /metrics to a FastAPI app."""
+    if not metrics.enabled:
+        return
+
+    from fastapi import Request
+    from fastapi.responses import PlainTextResponse
+
+    slow_ms = float(os.environ.get("SLOW_REQUEST_MS", 250))
+    profile_dir = os.environ.get("PROFILE_DIR")
+    profiler = Profiler(profile_dir, float(os.environ.get("PROFILE_SAMPLE_RATE", 1.0))) if profile_dir else None
+
+    @app.middleware("http")
+    async def instrument_request(request: Request, call_next):
+        context = {}
+        token = _request.set(context)
+        active = profiler.start(request.headers) if profiler else None
+        start = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request.reset(token)
+            if active is not None:
+                profile_path = profiler.stop(active, request.url.path)
+        # Label by route template so path parameters do not explode cardinality
+        route = getattr(request.scope.get('route'), 'path', 'unmatched')
+        metrics.observe('request_seconds', route, elapsed)
+        log_if_slow(context, request.url.path, elapsed, slow_ms)
+        if active is not None:
+            response.headers['X-Profile-Path'] = os.path.basename(profile_path)
+        return response
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics_endpoint():
+        return metrics.render()
@@ -0,0 +1,210 @@
+# leaderboard.py
+"""Live rank and percentile among everyone who took the same quiz.
+
+Each quiz keeps a Fenwick tree of submission counts over discretised
+scores (``step`` marks per bin between ``min_score`` and ``max_score``), so
+recording a submission and answering a rank/percentile query are both
+O(log bins) whatever the number of test-takers. A user who resubmits
+replaces their earlier score.
+
+Boards live in process memory and are snapshotted to a directory (one
+``.npy`` of (user_id, bin) pairs per quiz plus a JSON manifest) from which
+a restarted server rebuilds them. With several pre-forked server workers
+each worker only sees the submissions it received, so serve live mock
+tests from a single worker.
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+MANIFEST_FILE = "leaderboard.json"
+
+
+class FenwickTree:
+    """Prefix sums of per-bin counts with O(log n) point updates."""
+
+    def __init__(self, size: int):
+        self.size = size
+        # A plain list: single-element updates on it beat NumPy scalar indexing
+        self.tree = [0] * (size + 1)
+
+    @classmethod
+    def from_counts(cls, counts: np.ndarray) -> 'FenwickTree':
+        """Build in O(n) from per-bin counts."""
+        tree = cls(len(counts))
+        values = tree.tree
+        values[1:] = np.asarray(counts, dtype=np.int64).tolist()
+        for i in range(1, tree.size + 1):
+            parent = i + (i & -i)
+            if parent <= tree.size:
+                values[parent] += values[i]
+        return tree
+
+    def add(self, index: int, delta: int):
+        tree = self.tree
+        i = index + 1
+        while i <= self.size:
+            tree[i] += delta
+            i += i & -i
+
+    def prefix(self, index: int) -> int:
+        """Total count in bins 0..index inclusive."""
+        tree = self.tree
+        total = 0
+        i = index + 1
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+
+class QuizLeaderboard:
+    """Score distribution of one quiz, one entry per user."""
+
+    def __init__(self, min_score: float, max_score: float, step: float):
+        self.min_score = min_score
+        self.step = step
+        self.bins = int(round((max_score - min_score) / step)) + 1
+        self.tree = FenwickTree(self.bins)
+        self.user_bins: Dict[int, int] = {}
+
+    def _bin(self, score: float) -> int:
+        # Out-of-range scores share the first/last bin
+        return min(max(int((score - self.min_score) // self.step), 0), self.bins - 1)
+
+    def submit(self, user_id: int, score: float):
+        new = self._bin(score)
+        old = self.user_bins.get(user_id)
+        if old == new:
+            return
+        if old is not None:
+            self.tree.add(old, -1)
+        self.tree.add(new, 1)
+        self.user_bins[user_id] = new
+
+    @property
+    def participants(self) -> int:
+        return len(self.user_bins)
+
+    def _standing_at(self, index: int) -> Dict:
+        at_or_below = self.tree.prefix(index)
+        total = self.participants
+        return {
+            'rank': total - at_or_below + 1,
+            'percentile': 100.0 * at_or_below / total if total else None,
+            'participants': total
+        }
+
+    def standing(self, score: float) -> Dict:
+        """Rank (1 + number scoring higher) and percentile (share scoring the same or lower) of a score."""
+        return self._standing_at(self._bin(score))
+
+    def user_standing(self, user_id: int) -> Optional[Dict]:
+        index = self.user_bins.get(user_id)
+        if index is None:
+            return None
+        # Straight from the stored bin: re-binning its lower edge can land a bin low for fractional steps
+        standing = self._standing_at(index)
+        standing['score_bin'] = self.min_score + index * self.step
+        return standing
+
+    def to_array(self) -> np.ndarray:
+        return np.array(list(self.user_bins.items()), dtype=np.int64).reshape(-1, 2)
+
+    @classmethod
+    def from_array(cls, pairs: np.ndarray, min_score: float, max_score: float, step: float) -> 'QuizLeaderboard':
+        board = cls(min_score, max_score, step)
+        board.user_bins = dict(zip(pairs[:, 0].tolist(), pairs[:, 1].tolist()))
+        board.tree = FenwickTree.from_counts(np.bincount(pairs[:, 1], minlength=board.bins))
+        return board
+
+
+class LiveLeaderboard:
+    """Per-quiz boards behind one lock, with snapshots to ``directory``."""
+
+    def __init__(self, min_score: float = -180, max_score: float = 720, step: float = 1,
+                 directory: Optional[str] = None):
+        self.min_score = min_score
+        self.max_score = max_score
+        self.step = step
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._boards: Dict[int, QuizLeaderboard] = {}
+
+    def submit(self, quiz_id: int, user_id: int, score: float) -> Dict:
+        """Record a submission and return the user's standing after it."""
+        with self._lock:
+            board = self._boards.get(quiz_id)
+            if board is None:
+                board = self._boards[quiz_id] = QuizLeaderboard(self.min_score, self.max_score, self.step)
+            board.submit(user_id, score)
+            return board.user_standing(user_id)
+
+    def standing(self, quiz_id: int, score: float) -> Dict:
+        """Where ``score`` would place among the quiz's submissions; KeyError for an unknown quiz."""
+        with self._lock:
+            board = self._boards.get(quiz_id)
+            if board is None:
+                raise KeyError(f"no submissions recorded for quiz {quiz_id}")
+            return board.standing(score)
+
+    def user_standing(self, quiz_id: int, user_id: int) -> Dict:
+        with self._lock:
+            board = self._boards.get(quiz_id)
+            standing = board.user_standing(user_id) if board is not None else None
+        if standing is None:
+            raise KeyError(f"user {user_id} has no submission for quiz {quiz_id}")
+        return standing
+
+    def snapshot(self) -> Optional[str]:
+        """Write every board to ``directory``; the manifest is replaced last."""
+        if self.directory is None:
+            return None
+        with self._lock:
+            arrays = {quiz_id: board.to_array() for quiz_id, board in self._boards.items()}
+
+        os.makedirs(self.directory, exist_ok=True)
+        for quiz_id, pairs in arrays.items():
+            path = os.path.join(self.directory, f"quiz_{quiz_id}.npy")
+            # np.save appends .npy to names without it
+            np.save(path + ".tmp.npy", pairs)
+            os.replace(path + ".tmp.npy", path)
+
+        manifest = {
+            'min_score': self.min_score,
+            'max_score': self.max_score,
+            'step': self.step,
+            'quiz_ids': sorted(arrays),
+            'saved_at': time.time()
+        }
+        path = os.path.join(self.directory, MANIFEST_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(path + ".tmp", path)
+        return path
+
+    @classmethod
+    def load(cls, directory: str, min_score: float = -180, max_score: float = 720,
+             step: float = 1) -> 'LiveLeaderboard':
+        """Rebuild from the last snapshot in ``directory``, or start empty.
+
+        A snapshot keeps the binning it was taken with; the arguments only
+        apply when there is none yet.
+        """
+        try:
+            with open(os.path.join(directory, MANIFEST_FILE)) as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return cls(min_score, max_score, step, directory)
+
+        leaderboard = cls(manifest['min_score'], manifest['max_score'], manifest['step'], directory)
+        for quiz_id in manifest['quiz_ids']:
+            pairs = np.load(os.path.join(directory, f"quiz_{quiz_id}.npy"))
+            leaderboard._boards[quiz_id] = QuizLeaderboard.from_array(
+                pairs, leaderboard.min_score, leaderboard.max_score, leaderboard.step
+            )
+        return leaderboard
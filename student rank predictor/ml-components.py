@@ -1,18 +1,155 @@
 # ml_models.py
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import GridSearchCV
 from sklearn.metrics import mean_absolute_error, r2_score
+import copy
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Tuple
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+from feature_schema import TEMPORAL_FEATURES, TOPIC_STATS
+from scoring import compact_records
+from uncertainty import DEFAULT_SCORE_SIGMA, RankUncertainty
+from what_if import ImprovementImpactEngine
+
+# Old training rows kept for incremental updates, and the forest size cap
+RESERVOIR_SIZE = 20_000
+MAX_FOREST_TREES = 500
+
+
+def _group_mean_std(values: np.ndarray, groups: np.ndarray, n_groups: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Per-group count, mean and population std in one bincount pass.
+
+    Each group is summed sequentially in input order, so a group gives the
+    same bits whether it is reduced alone or alongside other students.
+    """
+    count = np.bincount(groups, minlength=n_groups).astype(float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(groups, weights=values, minlength=n_groups) / count
+        dev = values - mean[groups]
+        std = np.sqrt(np.bincount(groups, weights=dev * dev, minlength=n_groups) / count)
+    return count, mean, std
+
+
+def _group_slope(values: np.ndarray, groups: np.ndarray, positions: np.ndarray,
+                 count: np.ndarray, mean: np.ndarray) -> np.ndarray:
+    """Closed-form least-squares slope of values against 0..n-1 per group."""
+    n_groups = len(count)
+    x_dev = positions - (count[groups] - 1) / 2
+    sxy = np.bincount(groups, weights=x_dev * (values - mean[groups]), minlength=n_groups)
+    sxx = count * (count * count - 1) / 12
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(sxx > 0, sxy / np.where(sxx > 0, sxx, 1), 0.0)
+
 
 class FeatureEngineering:
     def __init__(self):
         self.scaler = StandardScaler()
-        
+        # Column order the scaler/model were fitted on; None until training
+        self.feature_columns = None
+
+    def extract_topic_features_batch(self, responses_batch: List[Union[List[Dict], Dict]]) -> pd.DataFrame:
+        """Topic accuracy/avg_time/time_std for many students at once.
+
+        Each student's responses are a list of per-response dicts, or the
+        compact parallel-array format of ``scoring.compact_responses``,
+        which is read as arrays without building per-response objects.
+
+        Returns one row per student with columns grouped per topic, topics in
+        sorted order. Topics a student did not attempt are NaN: filling them
+        with 0 would read as "attempted and got everything wrong". See
+        ``extract_features_batch`` for how NaN is handled downstream.
+        """
+        if responses_batch and all(isinstance(r, dict) for r in responses_batch):
+            lengths, topic, correct, times = self._compact_columns(responses_batch)
+        else:
+            lengths, topic, correct, times = self._record_columns([
+                compact_records(r) if isinstance(r, dict) else r for r in responses_batch
+            ])
+        student = np.repeat(np.arange(len(responses_batch)), lengths)
+        topic_codes, topics = pd.factorize(topic, sort=True)
+        n_topics = len(topics)
+        n_groups = len(responses_batch) * n_topics
+        groups = student * n_topics + topic_codes
+
+        count, avg_time, time_std = _group_mean_std(times, groups, n_groups)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            accuracy = np.bincount(groups, weights=correct, minlength=n_groups) / count
+
+        stats = np.stack([accuracy, avg_time, time_std], axis=1)
+        stats = stats.reshape(len(responses_batch), n_topics * len(TOPIC_STATS))
+        columns = [f"{topic}_{stat}" for topic in topics for stat in TOPIC_STATS]
+        return pd.DataFrame(stats, columns=columns)
+
+    @staticmethod
+    def _record_columns(responses_batch: List[List[Dict]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Response lengths, topics, correctness and times from per-response dicts."""
+        lengths = np.fromiter((len(r) for r in responses_batch), dtype=np.int64,
+                              count=len(responses_batch))
+        flat = pd.DataFrame.from_records(
+            [response for responses in responses_batch for response in responses],
+            columns=['topic', 'selected_option_id', 'correct_option_id', 'time_taken']
+        )
+        correct = (flat['selected_option_id'].to_numpy()
+                   == flat['correct_option_id'].to_numpy()).astype(float)
+        return lengths, flat['topic'].to_numpy(dtype=object), correct, flat['time_taken'].to_numpy(dtype=float)
+
+    @staticmethod
+    def _compact_columns(compact_batch: List[Dict]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """The same columns from compact responses, one array concatenation each."""
+        lengths = np.fromiter((len(c['topic_code']) for c in compact_batch), dtype=np.int64,
+                              count=len(compact_batch))
+
+        def column(field, dtype):
+            return np.concatenate([np.asarray(c[field], dtype=dtype) for c in compact_batch])
+
+        topic = np.concatenate([
+            np.asarray(c['topics'], dtype=object)[np.asarray(c['topic_code'], dtype=np.intp)]
+            for c in compact_batch
+        ])
+        correct = (column('selected_option_id', np.int64) == column('correct_option_id', np.int64)).astype(float)
+        return lengths, topic, correct, column('time_taken', float)
+
+    def extract_temporal_features_batch(self, histories: List[List[Dict]]) -> pd.DataFrame:
+        """Score/time level, spread and trend features for many students at once."""
+        lengths = np.fromiter((len(h) for h in histories), dtype=np.int64,
+                              count=len(histories))
+        flat = pd.DataFrame.from_records(
+            [quiz for history in histories for quiz in history],
+            columns=['total_score', 'total_time']
+        )
+        n_groups = len(histories)
+        groups = np.repeat(np.arange(n_groups), lengths)
+        offsets = np.cumsum(lengths) - lengths
+        positions = (np.arange(len(flat)) - offsets[groups]).astype(float)
+
+        scores = flat['total_score'].to_numpy(dtype=float)
+        times = flat['total_time'].to_numpy(dtype=float)
+
+        count, avg_score, score_std = _group_mean_std(scores, groups, n_groups)
+        _, avg_time, _ = _group_mean_std(times, groups, n_groups)
+        # Quizzes with no recorded time are left out of the efficiency mean
+        timed = times != 0
+        _, time_efficiency, _ = _group_mean_std(scores[timed] / times[timed], groups[timed], n_groups)
+
+        return pd.DataFrame({
+            'avg_score': avg_score,
+            'score_trend': _group_slope(scores, groups, positions, count, avg_score),
+            'score_std': score_std,
+            'avg_time': avg_time,
+            'time_trend': _group_slope(times, groups, positions, count, avg_time),
+            'time_efficiency': time_efficiency
+        }, columns=list(TEMPORAL_FEATURES))
+
     def extract_topic_features(self, responses: List[Dict]) -> Dict[str, float]:
-        """Extract performance metrics for each topic."""
+        """Extract performance metrics for each topic.
+
+        Per-student reference for ``extract_topic_features_batch``; the batch
+        path sums in a different order, so the two agree to rounding (about
+        1e-12 relative), not bit for bit.
+        """
         topic_stats = {}
         for response in responses:
             topic = response['topic']
@@ -34,9 +171,15 @@ class FeatureEngineering:
         return features
 
     def extract_temporal_features(self, history: List[Dict]) -> Dict[str, float]:
-        """Extract features from historical performance."""
+        """Extract features from historical performance.
+
+        Per-student reference for ``extract_temporal_features_batch``, which
+        uses a closed-form slope instead of ``np.polyfit``.
+        """
         scores = [quiz['total_score'] for quiz in history]
         times = [quiz['total_time'] for quiz in history]
+        # Quizzes with no recorded time are left out of the efficiency mean
+        ratios = [s/t for s, t in zip(scores, times) if t]
         
         return {
             'avg_score': np.mean(scores),
@@ -44,111 +187,361 @@ class FeatureEngineering:
             'score_std': np.std(scores),
             'avg_time': np.mean(times),
             'time_trend': np.polyfit(range(len(times)), times, 1)[0],
-            'time_efficiency': np.mean([s/t for s, t in zip(scores, times)])
+            'time_efficiency': np.mean(ratios) if ratios else np.nan
         }
 
-    def prepare_features(self, current_quiz: Dict, history: List[Dict]) -> np.array:
-        """Combine all features and prepare for model input."""
-        features = {}
-        
-        # Current quiz features
-        topic_features = self.extract_topic_features(current_quiz['responses'])
-        features.update(topic_features)
-        
-        # Historical features
-        temporal_features = self.extract_temporal_features(history)
-        features.update(temporal_features)
-        
+    def extract_features_batch(self, submissions: List[Dict], histories: Optional[List[List[Dict]]] = None,
+                               temporal: Optional[List[Dict[str, float]]] = None) -> pd.DataFrame:
+        """Unscaled feature frame for N students, one row per submission.
+
+        Temporal features are computed from ``histories`` unless already
+        available, e.g. from ``RollingStats.temporal_features()``, in which
+        case they are passed as ``temporal`` and histories can be omitted.
+
+        Columns follow ``feature_columns`` once the predictor has been trained,
+        otherwise sorted topic columns followed by the temporal and derived
+        features.
+
+        NaN marks a value that was not observed: an unattempted topic, a
+        ``feature_columns`` topic missing from every submission, or
+        ``time_efficiency`` with no timed quiz. It is never imputed here.
+        The scaler passes NaN through, ``RankPredictor.models`` all accept
+        it, and the what-if engine skips topics without an accuracy.
+        """
+        if temporal is not None:
+            temporal_features = pd.DataFrame(temporal, columns=list(TEMPORAL_FEATURES))
+        elif histories is not None:
+            temporal_features = self.extract_temporal_features_batch(histories)
+        else:
+            raise ValueError("either histories or temporal features are required")
+        if len(submissions) != len(temporal_features):
+            raise ValueError("submissions and histories must have the same length")
+
+        features = pd.concat([
+            self.extract_topic_features_batch([quiz['responses'] for quiz in submissions]),
+            temporal_features
+        ], axis=1)
+
         # Additional derived features
         features['consistency'] = 1 - features['score_std'] / features['avg_score']
         features['improvement_rate'] = features['score_trend'] / features['avg_score']
-        
-        return self.scaler.transform(pd.DataFrame([features]))
+
+        if self.feature_columns is not None:
+            features = features.reindex(columns=self.feature_columns)
+        return features
+
+    def prepare_features_batch(self, submissions: List[Dict], histories: Optional[List[List[Dict]]] = None,
+                               temporal: Optional[List[Dict[str, float]]] = None) -> np.array:
+        """Scaled feature matrix for N students in one columnar pass."""
+        return self.scaler.transform(self.extract_features_batch(submissions, histories, temporal))
+
+    def prepare_features(self, current_quiz: Dict, history: Optional[List[Dict]] = None,
+                         temporal: Optional[Dict[str, float]] = None) -> np.array:
+        """Combine all features and prepare for model input."""
+        return self.prepare_features_batch(
+            [current_quiz],
+            [history] if history is not None else None,
+            [temporal] if temporal is not None else None
+        )
+
+class ReservoirSample:
+    """Uniform sample of at most ``capacity`` rows from every batch seen so far.
+
+    Algorithm R, one vectorised draw per batch: row t of the stream replaces
+    a random slot with probability capacity / (t + 1).
+    """
+
+    def __init__(self, capacity: int = RESERVOIR_SIZE, seed: int = 0):
+        self.capacity = capacity
+        self.seen = 0
+        self.X = None
+        self.y = None
+        self._rng = np.random.default_rng(seed)
+
+    def add(self, X: np.ndarray, y: np.ndarray):
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if self.X is None:
+            self.X = np.empty((0, X.shape[1]))
+            self.y = np.empty(0)
+
+        room = max(self.capacity - len(self.X), 0)
+        if room:
+            self.X = np.vstack([self.X, X[:room]])
+            self.y = np.concatenate([self.y, y[:room]])
+
+        rest = np.arange(min(room, len(X)), len(X))
+        if len(rest):
+            stream_index = self.seen + rest
+            slots = np.floor(self._rng.random(len(rest)) * (stream_index + 1)).astype(np.int64)
+            keep = slots < self.capacity
+            # Duplicate slots resolve to the later row, as a sequential pass would
+            self.X[slots[keep]] = X[rest[keep]]
+            self.y[slots[keep]] = y[rest[keep]]
+        self.seen += len(X)
+
+    def to_dict(self) -> Dict:
+        return {'capacity': self.capacity, 'seen': self.seen, 'X': self.X, 'y': self.y}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ReservoirSample':
+        sample = cls(data['capacity'])
+        sample.seen = data['seen']
+        sample.X = np.array(data['X'], dtype=float)
+        sample.y = np.array(data['y'], dtype=float)
+        return sample
 
 class RankPredictor:
+    PARAM_GRIDS = {
+        'rf': {
+            'n_estimators': [100, 200],
+            'max_depth': [10, 20, None],
+            'min_samples_split': [2, 5]
+        },
+        'gb': {
+            'max_iter': [100, 200],
+            'learning_rate': [0.01, 0.1],
+            'max_depth': [3, 5]
+        }
+    }
+    
     def __init__(self):
         self.feature_engineering = FeatureEngineering()
+        # Both families accept the NaN that marks unobserved features;
+        # GradientBoostingRegressor does not, hence the histogram variant
         self.models = {
             'rf': RandomForestRegressor(n_estimators=100, random_state=42),
-            'gb': GradientBoostingRegressor(n_estimators=100, random_state=42)
+            'gb': HistGradientBoostingRegressor(max_iter=100, early_stopping=False, random_state=42)
         }
         self.best_model = None
         self.feature_importance = None
+        self.feature_columns = None
+        self.training_report = None
+        self.update_report = None
+        self.reservoir = None
+        self.impact_engine = None
+        # Spread of the score behind the Monte Carlo rank intervals, in marks
+        self.score_sigma = DEFAULT_SCORE_SIGMA
+        self.uncertainty = None
         
-    def train(self, X_train: np.array, y_train: np.array):
-        """Train multiple models and select the best one."""
+    def load_artifact(self, artifact):
+        """Restore a trained model saved with ``ModelRegistry.save_predictor``."""
+        self.best_model = artifact.model
+        self.feature_engineering.scaler = artifact.scaler
+        self.feature_columns = artifact.feature_columns
+        self.feature_engineering.feature_columns = artifact.feature_columns
+        self.impact_engine = None
+        self.uncertainty = None
+        reservoir = artifact.extras.get('reservoir')
+        self.reservoir = ReservoirSample.from_dict(reservoir) if reservoir is not None else None
+        if self.feature_columns and hasattr(self.best_model, 'feature_importances_'):
+            self.feature_importance = dict(zip(
+                self.feature_columns,
+                self.best_model.feature_importances_
+            ))
+        
+    def train(self, X_train: np.array, y_train: np.array, search: str = 'grid',
+              n_jobs: int = -1, cv: int = 5):
+        """Train multiple models and select the best one.
+
+        Both model families are searched concurrently and each search fans
+        its candidates out over ``n_jobs`` cores. ``search='halving'`` uses
+        successive halving to drop weak candidates on small subsamples
+        before they are fitted on all of the data.
+        """
+        # Search tooling is only needed here; keep it off the prediction import path
+        from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+        from sklearn.model_selection import GridSearchCV, HalvingGridSearchCV, KFold
+
         best_score = float('inf')
+        start = time.perf_counter()
         
-        for name, model in self.models.items():
-            # Define parameter grid for each model
-            param_grid = {
-                'rf': {
-                    'n_estimators': [100, 200],
-                    'max_depth': [10, 20, None],
-                    'min_samples_split': [2, 5]
-                },
-                'gb': {
-                    'n_estimators': [100, 200],
-                    'learning_rate': [0.01, 0.1],
-                    'max_depth': [3, 5]
-                }
-            }
-            
-            # Perform grid search
-            grid_search = GridSearchCV(
-                model,
-                param_grid[name],
-                cv=5,
-                scoring='neg_mean_absolute_error'
+        # A column with no observed value (e.g. a registry topic nobody in
+        # this set attempted) has nothing to fit and breaks histogram
+        # binning; it is left out of feature_columns and ignored at serving
+        X_train = X_train.loc[:, X_train.notna().any().to_numpy()]
+        
+        # Models are fitted on scaled features, matching prepare_features.
+        # The scaler is fitted once here and shared by every candidate.
+        self.feature_columns = list(X_train.columns)
+        self.feature_engineering.feature_columns = self.feature_columns
+        X_scaled = self.feature_engineering.scaler.fit_transform(X_train)
+        
+        # Compute the fold splits once and reuse them for every candidate;
+        # halving draws its own subsamples so it needs the splitter itself
+        folds = KFold(n_splits=cv)
+        if search == 'grid':
+            folds = list(folds.split(X_scaled))
+        
+        def run_search(name):
+            search_cls = HalvingGridSearchCV if search == 'halving' else GridSearchCV
+            grid_search = search_cls(
+                self.models[name],
+                self.PARAM_GRIDS[name],
+                cv=folds,
+                scoring='neg_mean_absolute_error',
+                n_jobs=n_jobs
             )
-            grid_search.fit(X_train, y_train)
-            
+            search_start = time.perf_counter()
+            grid_search.fit(X_scaled, y_train)
+            return name, grid_search, time.perf_counter() - search_start
+        
+        with ThreadPoolExecutor(max_workers=len(self.models)) as pool:
+            searches = list(pool.map(run_search, self.models))
+        
+        report = {'search': search, 'families': {}, 'candidates': []}
+        for name, grid_search, elapsed in searches:
             # Update best model if current one is better
             if -grid_search.best_score_ < best_score:
                 best_score = -grid_search.best_score_
                 self.best_model = grid_search.best_estimator_
+            
+            results = grid_search.cv_results_
+            n_splits = grid_search.n_splits_
+            report['families'][name] = {
+                'best_params': grid_search.best_params_,
+                'best_mae': float(-grid_search.best_score_),
+                'wall_clock_s': elapsed
+            }
+            for i, params in enumerate(results['params']):
+                report['candidates'].append({
+                    'model': name,
+                    'params': params,
+                    'mae': float(-results['mean_test_score'][i]),
+                    'wall_clock_s': float(results['mean_fit_time'][i] + results['mean_score_time'][i]) * n_splits,
+                    'n_samples': int(results['n_resources'][i]) if 'n_resources' in results else len(X_scaled)
+                })
+        report['best_mae'] = float(best_score)
+        report['total_wall_clock_s'] = time.perf_counter() - start
+        self.training_report = report
+        self.impact_engine = None
+        self.uncertainty = None
         
-        # Calculate feature importance
+        # Seed the sample of old data that incremental updates retrain on
+        self.reservoir = ReservoirSample()
+        self.reservoir.add(X_train.to_numpy(), y_train)
+        self._update_feature_importance()
+    
+    def _update_feature_importance(self):
         if hasattr(self.best_model, 'feature_importances_'):
             self.feature_importance = dict(zip(
-                X_train.columns,
+                self.feature_columns,
                 self.best_model.feature_importances_
             ))
     
-    def predict(self, current_quiz: Dict, history: List[Dict]) -> Dict:
+    def update(self, X_new: pd.DataFrame, y_new: np.array, new_estimators: int = 50,
+               holdout: float = 0.2, tolerance: float = 0.0, seed: int = 0) -> Dict:
+        """Warm-start the trained model on a new batch instead of retraining from scratch.
+
+        A forest grows ``new_estimators`` trees (``n_estimators``) and
+        gradient boosting ``new_estimators`` stages (``max_iter``), fitted on the batch plus the reservoir of
+        older rows; the scaler is kept as is so existing trees stay valid.
+        The candidate replaces the current model only if its MAE on a
+        ``holdout`` share of the batch is within ``tolerance`` (relative)
+        of the current model's. Forests keep their newest
+        ``MAX_FOREST_TREES`` trees.
+        """
+        if self.best_model is None or self.feature_columns is None:
+            raise ValueError("train the predictor before updating it")
+        start = time.perf_counter()
+        
+        X_batch = X_new.reindex(columns=self.feature_columns).to_numpy(dtype=float)
+        y_batch = np.asarray(y_new, dtype=float)
+        
+        # The holdout comes from the new batch only: the current model has
+        # already been fitted on the reservoir rows
+        order = np.random.default_rng(seed).permutation(len(X_batch))
+        n_holdout = int(len(order) * holdout)
+        holdout_rows, fit_rows = order[:n_holdout], order[n_holdout:]
+        X_fit, y_fit = X_batch[fit_rows], y_batch[fit_rows]
+        if self.reservoir is not None and self.reservoir.X is not None:
+            X_fit = np.vstack([X_fit, self.reservoir.X])
+            y_fit = np.concatenate([y_fit, self.reservoir.y])
+        
+        scaler = self.feature_engineering.scaler
+        X_fit = scaler.transform(pd.DataFrame(X_fit, columns=self.feature_columns))
+        X_holdout = scaler.transform(pd.DataFrame(X_batch[holdout_rows], columns=self.feature_columns))
+        y_holdout = y_batch[holdout_rows]
+        
+        # Grow a copy so the serving model is untouched unless the candidate wins
+        size_param = 'n_estimators' if 'n_estimators' in self.best_model.get_params() else 'max_iter'
+        candidate = copy.deepcopy(self.best_model)
+        candidate.set_params(warm_start=True, **{size_param: self.best_model.get_params()[size_param] + new_estimators})
+        fit_start = time.perf_counter()
+        candidate.fit(X_fit, y_fit)
+        fit_seconds = time.perf_counter() - fit_start
+        if hasattr(candidate, 'estimators_') and isinstance(candidate.estimators_, list) \
+                and len(candidate.estimators_) > MAX_FOREST_TREES:
+            candidate.estimators_ = candidate.estimators_[-MAX_FOREST_TREES:]
+            candidate.n_estimators = MAX_FOREST_TREES
+        
+        baseline_mae = candidate_mae = None
+        if n_holdout:
+            baseline_mae = float(mean_absolute_error(y_holdout, self.best_model.predict(X_holdout)))
+            candidate_mae = float(mean_absolute_error(y_holdout, candidate.predict(X_holdout)))
+        promoted = candidate_mae is None or candidate_mae <= baseline_mae * (1 + tolerance)
+        if promoted:
+            self.best_model = candidate
+            self.impact_engine = None
+            self.uncertainty = None
+            self._update_feature_importance()
+        
+        if self.reservoir is None:
+            self.reservoir = ReservoirSample()
+        self.reservoir.add(X_batch, y_batch)
+        
+        self.update_report = {
+            'promoted': promoted,
+            'baseline_mae': baseline_mae,
+            'candidate_mae': candidate_mae,
+            'estimators': self.best_model.get_params()[size_param],
+            'fit_rows': len(X_fit),
+            'holdout_rows': n_holdout,
+            'fit_wall_clock_s': fit_seconds,
+            'total_wall_clock_s': time.perf_counter() - start
+        }
+        return self.update_report
+    
+    def predict(self, current_quiz: Dict, history: Optional[List[Dict]] = None,
+                temporal: Optional[Dict[str, float]] = None) -> Dict:
         """Make prediction with confidence estimation."""
-        features = self.feature_engineering.prepare_features(current_quiz, history)
+        features = self.feature_engineering.prepare_features(current_quiz, history, temporal)
         
         # Make prediction
         predicted_rank = self.best_model.predict(features)[0]
         
-        # Estimate confidence based on feature similarity
-        confidence = self._estimate_confidence(features)
+        # Forest spread plus Monte Carlo noise on the score feature
+        if self.uncertainty is None:
+            self.uncertainty = RankUncertainty.from_feature_columns(
+                self.best_model, self.feature_engineering.scaler, self.feature_columns, self.score_sigma
+            )
+        interval = self.uncertainty.intervals(features)
+        confidence = self._estimate_confidence(interval)
         
         return {
             'predicted_rank': int(predicted_rank),
             'confidence_score': confidence,
+            'rank_interval': (int(interval['p5'][0]), int(interval['p95'][0])),
             'feature_importance': self.feature_importance,
             'improvement_areas': self._get_improvement_areas(features)
         }
     
-    def _estimate_confidence(self, features: np.array) -> float:
-        """Estimate prediction confidence based on feature similarity to training data."""
-        # This would use more sophisticated methods in production
-        return np.clip(0.9 - np.std(features) * 0.1, 0.5, 0.95)
+    def _estimate_confidence(self, interval: Dict[str, np.ndarray]) -> Optional[float]:
+        """Share of rank samples near the median; None when the model gives no spread."""
+        confidence = interval['confidence'][0]
+        return None if np.isnan(confidence) else float(confidence)
     
     def _get_improvement_areas(self, features: np.array) -> List[Dict]:
-        """Identify areas where improvement would most impact rank."""
-        if not self.feature_importance:
+        """Topics ranked by how much raising their accuracy would improve this student's rank."""
+        if not self.feature_columns:
             return []
+        if self.impact_engine is None:
+            self.impact_engine = ImprovementImpactEngine.from_feature_columns(
+                self.best_model, self.feature_engineering.scaler, self.feature_columns
+            )
             
-        improvements = []
-        for feature, importance in self.feature_importance.items():
-            if 'accuracy' in feature and importance > 0.05:
-                improvements.append({
-                    'topic': feature.split('_')[0],
-                    'importance': importance,
-                    'current_value': features[0][list(self.feature_importance.keys()).index(feature)]
-                })
-        
-        return sorted(improvements, key=lambda x: x['importance'], reverse=True)
+        importance = self.feature_importance or {}
+        return [
+            {**area, 'importance': importance.get(f"{area['topic']}_accuracy")}
+            for area in self.impact_engine.recommendations(features[0])
+        ]
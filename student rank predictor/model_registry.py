@@ -0,0 +1,143 @@
+# model_registry.py
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import joblib
+
+DEFAULT_REGISTRY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+ARTIFACT_FILE = "model.joblib"
+LATEST_FILE = "LATEST"
+
+
+class ModelArtifact:
+    """A fitted scaler + estimator pair and the feature order they expect.
+
+    ``extras`` carries plain data saved alongside, e.g. the training
+    reservoir that incremental updates continue from.
+    """
+
+    def __init__(self, version: str, model, scaler, feature_columns: Optional[List[str]],
+                 created_at: float, extras: Optional[Dict] = None):
+        self.version = version
+        self.model = model
+        self.scaler = scaler
+        self.feature_columns = feature_columns
+        self.created_at = created_at
+        self.extras = extras or {}
+
+
+class ModelRegistry:
+    """Versioned model artifacts on disk.
+
+    Each version lives in ``<root>/<version>/model.joblib``; ``<root>/LATEST``
+    names the version that serving processes should use. Artifacts are
+    written uncompressed so they can be loaded with ``mmap_mode='r'``: plain
+    NumPy arrays in the artifact are mapped from the page cache and shared by
+    every worker on the host. scikit-learn copies tree node arrays into its
+    own buffers on unpickle, so forest nodes are only shared when the
+    artifact is loaded once before worker processes fork.
+    """
+
+    def __init__(self, root: str = DEFAULT_REGISTRY_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._current: Optional[ModelArtifact] = None
+
+    def _artifact_path(self, version: str) -> str:
+        return os.path.join(self.root, version, ARTIFACT_FILE)
+
+    def versions(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.isfile(self._artifact_path(name))
+        )
+
+    def latest_version(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.root, LATEST_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def save(self, model, scaler, feature_columns: Optional[List[str]] = None,
+             version: Optional[str] = None, promote: bool = True, extras: Optional[Dict] = None) -> str:
+        """Persist a fitted model/scaler and optionally make it the latest version."""
+        version = version or time.strftime("%Y%m%d%H%M%S")
+        os.makedirs(os.path.join(self.root, version), exist_ok=True)
+
+        payload = {
+            "version": version,
+            "model": model,
+            "scaler": scaler,
+            "feature_columns": list(feature_columns) if feature_columns is not None else None,
+            "created_at": time.time(),
+            "extras": extras or {}
+        }
+        # Write then rename so readers never see a half-written artifact
+        path = self._artifact_path(version)
+        joblib.dump(payload, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+        if promote:
+            self.promote(version)
+        return version
+
+    def save_predictor(self, predictor, version: Optional[str] = None, promote: bool = True) -> str:
+        """Persist a trained ``ml-components.RankPredictor``."""
+        if predictor.best_model is None:
+            raise ValueError("predictor has not been trained")
+        return self.save(
+            predictor.best_model,
+            predictor.feature_engineering.scaler,
+            predictor.feature_columns,
+            version=version,
+            promote=promote,
+            extras={'reservoir': predictor.reservoir.to_dict()} if predictor.reservoir is not None else None
+        )
+
+    def promote(self, version: str):
+        if not os.path.isfile(self._artifact_path(version)):
+            raise FileNotFoundError(f"no artifact for model version {version!r}")
+        latest = os.path.join(self.root, LATEST_FILE)
+        with open(latest + ".tmp", "w") as f:
+            f.write(version)
+        os.replace(latest + ".tmp", latest)
+
+    def load(self, version: Optional[str] = None, mmap_mode: Optional[str] = "r") -> ModelArtifact:
+        version = version or self.latest_version()
+        if version is None:
+            raise FileNotFoundError(f"no model versions in {self.root}")
+
+        payload = joblib.load(self._artifact_path(version), mmap_mode=mmap_mode)
+        return ModelArtifact(
+            payload["version"],
+            payload["model"],
+            payload["scaler"],
+            payload["feature_columns"],
+            payload["created_at"],
+            payload.get("extras")
+        )
+
+    @property
+    def current(self) -> Optional[ModelArtifact]:
+        return self._current
+
+    def refresh(self) -> bool:
+        """Load the latest version if it differs from the current one.
+
+        Returns True when a new artifact was swapped in. Safe to call from
+        request handlers; concurrent callers load the artifact only once.
+        """
+        latest = self.latest_version()
+        if latest is None or (self._current is not None and self._current.version == latest):
+            return False
+
+        with self._lock:
+            if self._current is not None and self._current.version == latest:
+                return False
+            self._current = self.load(latest)
+        return True
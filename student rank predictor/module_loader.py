@@ -0,0 +1,34 @@
+# module_loader.py
+"""Import the package modules whose file names are not valid module names.
+
+``ml-components.py`` and ``database-models.py`` are loaded by path under
+an importable alias, once per process.
+"""
+import importlib.util
+import os
+import sys
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_module(name: str, filename: str):
+    """Load ``filename`` from this directory as ``sys.modules[name]``."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(PACKAGE_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
+
+
+def load_ml_components():
+    return load_module("ml_components", "ml-components.py")
+
+
+def load_database_models():
+    return load_module("database_models", "database-models.py")
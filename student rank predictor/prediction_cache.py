@@ -0,0 +1,186 @@
+# prediction_cache.py
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+DEFAULT_TTL = int(os.environ.get("PREDICTION_CACHE_TTL", 300))
+LOCAL_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_LOCAL_SIZE", 1024))
+# Kept short: other workers' invalidations only reach this tier on expiry
+LOCAL_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_LOCAL_TTL", 5))
+
+
+class InMemoryRedis:
+    """The subset of the redis-py client used by PredictionCache, held in-process.
+
+    Selected with ``REDIS_URL=memory://`` so the cache works (and can be
+    tested) without a Redis server.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+        self._expires = {}
+
+    def _alive(self, key) -> bool:
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def get(self, key):
+        with self._lock:
+            return self._data[key] if self._alive(key) else None
+
+    def set(self, key, value, ex: Optional[int] = None):
+        with self._lock:
+            self._data[key] = value.encode() if isinstance(value, str) else value
+            if ex is None:
+                self._expires.pop(key, None)
+            else:
+                self._expires[key] = time.monotonic() + ex
+        return True
+
+    def delete(self, *keys) -> int:
+        with self._lock:
+            removed = 0
+            # Keys may come back from smembers as bytes, as with real Redis
+            for key in (k.decode() if isinstance(k, bytes) else k for k in keys):
+                removed += self._alive(key)
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+            return removed
+
+    def sadd(self, key, *members) -> int:
+        with self._lock:
+            if not self._alive(key):
+                self._data[key] = set()
+            members_set = self._data[key]
+            before = len(members_set)
+            members_set.update(m.encode() if isinstance(m, str) else m for m in members)
+            return len(members_set) - before
+
+    def smembers(self, key) -> set:
+        with self._lock:
+            return set(self._data[key]) if self._alive(key) else set()
+
+    def expire(self, key, seconds: int) -> bool:
+        with self._lock:
+            if not self._alive(key):
+                return False
+            self._expires[key] = time.monotonic() + seconds
+            return True
+
+
+def get_redis_client(url: Optional[str] = None):
+    url = url or os.environ.get("REDIS_URL", "memory://")
+    if url.startswith("memory://"):
+        return InMemoryRedis()
+
+    import redis
+    return redis.Redis.from_url(url)
+
+
+class LRUCache:
+    """Small per-process tier in front of Redis, with per-entry expiry."""
+
+    def __init__(self, maxsize: int = LOCAL_CACHE_SIZE, ttl: float = LOCAL_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, _, value = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, user_id=None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, user_id, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard_user(self, user_id):
+        with self._lock:
+            for key in [k for k, (_, uid, _) in self._entries.items() if uid == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class PredictionCache:
+    """Two-tier (local LRU, then Redis) cache for analysis and prediction results.
+
+    Keys are built from the endpoint plus whatever the result depends on,
+    e.g. ``('rank', user_id, quiz_id, model_version)``; a new quiz or a new
+    model version therefore misses naturally. ``invalidate_user`` drops
+    every entry recorded for a user when a submission lands.
+    """
+
+    def __init__(self, client=None, ttl: int = DEFAULT_TTL, local: Optional[LRUCache] = None,
+                 namespace: str = "rp"):
+        self.client = client if client is not None else get_redis_client()
+        self.ttl = ttl
+        self.local = local if local is not None else LRUCache()
+        self.namespace = namespace
+
+    def key(self, endpoint: str, *parts) -> str:
+        return ":".join([self.namespace, endpoint, *map(str, parts)])
+
+    def _user_index(self, user_id) -> str:
+        return f"{self.namespace}:user:{user_id}"
+
+    def get(self, key: str, user_id=None) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        raw = self.client.get(key)
+        if raw is None:
+            return None
+        value = json.loads(raw)
+        self.local.set(key, value, user_id)
+        return value
+
+    def set(self, key: str, value: Any, user_id=None):
+        self.client.set(key, json.dumps(value), ex=self.ttl)
+        if user_id is not None:
+            index = self._user_index(user_id)
+            self.client.sadd(index, key)
+            self.client.expire(index, self.ttl)
+        self.local.set(key, value, user_id)
+
+    def invalidate_user(self, user_id):
+        index = self._user_index(user_id)
+        keys = self.client.smembers(index)
+        if keys:
+            self.client.delete(*keys)
+        self.client.delete(index)
+        self.local.discard_user(user_id)
+
+    def listener(self, submissions):
+        """``BulkLoader`` listener: cached results of every user with a new submission are stale."""
+        for user_id in {submission['user_id'] for submission in submissions}:
+            self.invalidate_user(user_id)
+
+    def invalidate_all(self):
+        """Drop the local tier, e.g. after a model swap.
+
+        Remote rank entries are keyed by model version, so they stop being
+        read once the version changes and expire on their own.
+        """
+        self.local.clear()
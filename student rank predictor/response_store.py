@@ -0,0 +1,235 @@
+# response_store.py
+"""Compact on-disk storage for historical response maps.
+
+A ``response_map`` ({question_id: selected_option}) per student per quiz is
+stored as one int8 matrix per quiz, rows = students, columns = questions:
+
+    <root>/quiz_<quiz_id>/questions.npy   int64, sorted question ids
+    <root>/quiz_<quiz_id>/users.npy       int64, sorted user ids
+    <root>/quiz_<quiz_id>/responses.npy   int8 [users x questions], -1 = unanswered
+
+A shard's three files are written together in a scratch directory that
+is then renamed into place. Convert existing JSON/JSONL dumps of
+{user_id, quiz_id, response_map}, in any order, with bounded memory:
+
+    python response_store.py history.jsonl --root response_maps
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+UNANSWERED = -1
+# Spill files kept open while partitioning records by quiz
+MAX_OPEN_PARTITIONS = 128
+
+
+def _quiz_dir(root: str, quiz_id: int) -> str:
+    return os.path.join(root, f"quiz_{quiz_id}")
+
+
+def _fill_row(responses: np.ndarray, row: int, question_ids: np.ndarray, user_id: int, response_map: Dict):
+    if not response_map:
+        return
+    questions = np.fromiter((int(q) for q in response_map), dtype=np.int64, count=len(response_map))
+    options = np.fromiter(response_map.values(), dtype=np.int64, count=len(response_map))
+    if options.min() < np.iinfo(np.int8).min or options.max() > np.iinfo(np.int8).max:
+        raise ValueError(f"option ids for user {user_id} do not fit in int8")
+    responses[row, np.searchsorted(question_ids, questions)] = options
+
+
+@contextmanager
+def _shard_writer(root: str, quiz_id: int):
+    """A scratch directory that replaces the quiz's shard as a whole on success.
+
+    The three arrays are written into the scratch directory and it is
+    renamed into place, so readers never see arrays from two different
+    conversions. A failed write leaves the previous shard untouched.
+    """
+    directory = _quiz_dir(root, quiz_id)
+    os.makedirs(root, exist_ok=True)
+    scratch = tempfile.mkdtemp(prefix=f".quiz_{quiz_id}.", dir=root)
+    # mkdtemp makes the directory private; shards are read by the server user
+    os.chmod(scratch, 0o755)
+    try:
+        yield scratch
+    except BaseException:
+        shutil.rmtree(scratch, ignore_errors=True)
+        raise
+
+    # A directory cannot be renamed over a non-empty one: move the old
+    # shard aside first (open memory maps of it stay valid)
+    previous = None
+    if os.path.isdir(directory):
+        previous = scratch + ".old"
+        os.rename(directory, previous)
+    os.rename(scratch, directory)
+    if previous is not None:
+        shutil.rmtree(previous, ignore_errors=True)
+
+
+def _write_shard(root: str, quiz_id: int, user_ids: np.ndarray, question_ids: np.ndarray,
+                 response_maps: Iterable[Tuple[int, Dict]]) -> str:
+    with _shard_writer(root, quiz_id) as scratch:
+        np.save(os.path.join(scratch, "questions.npy"), question_ids)
+        np.save(os.path.join(scratch, "users.npy"), user_ids)
+        # Filled through a memory map, so the matrix is never held in memory whole
+        responses = np.lib.format.open_memmap(os.path.join(scratch, "responses.npy"), mode='w+',
+                                              dtype=np.int8, shape=(len(user_ids), len(question_ids)))
+        responses[:] = UNANSWERED
+        for user_id, response_map in response_maps:
+            row = int(np.searchsorted(user_ids, user_id))
+            # A later record for the same user replaces the earlier one
+            responses[row] = UNANSWERED
+            _fill_row(responses, row, question_ids, user_id, response_map)
+        responses.flush()
+        del responses
+    return _quiz_dir(root, quiz_id)
+
+
+def write_quiz(root: str, quiz_id: int, response_maps: Dict[int, Dict]) -> str:
+    """Write every student's response map for one quiz as a compact shard."""
+    user_ids = np.array(sorted(response_maps), dtype=np.int64)
+    question_ids = np.array(sorted({
+        int(question_id) for response_map in response_maps.values() for question_id in response_map
+    }), dtype=np.int64)
+    return _write_shard(root, quiz_id, user_ids, question_ids,
+                        ((int(user_id), response_map) for user_id, response_map in response_maps.items()))
+
+
+def _read_partition(path: str) -> Iterator[Tuple[int, Dict]]:
+    with open(path) as f:
+        for line in f:
+            record = json.loads(line)
+            yield int(record['user_id']), record['response_map']
+
+
+def write_quiz_file(root: str, quiz_id: int, path: str) -> str:
+    """Write a quiz's shard from a JSONL file of its records, in two passes.
+
+    The first pass collects user and question ids, the second fills the
+    matrix; only the ids are held in memory. A user with several records
+    keeps the last one.
+    """
+    users, questions = set(), set()
+    for user_id, response_map in _read_partition(path):
+        users.add(user_id)
+        questions.update(int(question_id) for question_id in response_map)
+    user_ids = np.array(sorted(users), dtype=np.int64)
+    question_ids = np.array(sorted(questions), dtype=np.int64)
+    del users, questions
+    return _write_shard(root, quiz_id, user_ids, question_ids, _read_partition(path))
+
+
+class QuizResponses:
+    """Memory-mapped responses for one quiz; row lookups return views, not copies."""
+
+    def __init__(self, directory: str):
+        self.question_ids = np.load(os.path.join(directory, "questions.npy"), mmap_mode='r')
+        self.user_ids = np.load(os.path.join(directory, "users.npy"), mmap_mode='r')
+        self.responses = np.load(os.path.join(directory, "responses.npy"), mmap_mode='r')
+
+    def _row_index(self, user_id: int) -> Optional[int]:
+        index = int(np.searchsorted(self.user_ids, user_id))
+        if index < len(self.user_ids) and self.user_ids[index] == user_id:
+            return index
+        return None
+
+    def row(self, user_id: int) -> Optional[np.ndarray]:
+        """int8 options for ``user_id``, aligned with ``question_ids``."""
+        index = self._row_index(user_id)
+        return self.responses[index] if index is not None else None
+
+    def response_map(self, user_id: int) -> Optional[Dict[str, int]]:
+        """The row in the original ``HistoricalQuiz.response_map`` form."""
+        row = self.row(user_id)
+        if row is None:
+            return None
+        answered = row != UNANSWERED
+        return {
+            str(question_id): int(option)
+            for question_id, option in zip(self.question_ids[answered], row[answered])
+        }
+
+
+class ResponseStore:
+    def __init__(self, root: str):
+        self.root = root
+        self._quizzes = {}
+
+    def quiz(self, quiz_id: int) -> QuizResponses:
+        quiz = self._quizzes.get(quiz_id)
+        if quiz is None:
+            directory = _quiz_dir(self.root, quiz_id)
+            if not os.path.isdir(directory):
+                raise KeyError(f"no responses stored for quiz {quiz_id}")
+            quiz = self._quizzes[quiz_id] = QuizResponses(directory)
+        return quiz
+
+    def history(self, user_id: int, quiz_ids: Iterable[int]) -> List[Dict[str, int]]:
+        return [self.quiz(quiz_id).response_map(user_id) for quiz_id in quiz_ids]
+
+
+class _Partitions:
+    """Per-quiz JSONL spill files, with at most ``max_open`` handles open at once."""
+
+    def __init__(self, directory: str, max_open: int = MAX_OPEN_PARTITIONS):
+        self.directory = directory
+        self.max_open = max_open
+        self.paths = {}
+        self._open = OrderedDict()
+
+    def write(self, quiz_id: int, record: Dict):
+        handle = self._open.pop(quiz_id, None)
+        if handle is None:
+            if len(self._open) >= self.max_open:
+                self._open.popitem(last=False)[1].close()
+            path = self.paths.setdefault(quiz_id, os.path.join(self.directory, f"quiz_{quiz_id}.jsonl"))
+            handle = open(path, "a")
+        self._open[quiz_id] = handle
+        handle.write(json.dumps({'user_id': record['user_id'], 'response_map': record['response_map']}) + "\n")
+
+    def close(self):
+        while self._open:
+            self._open.popitem()[1].close()
+
+
+def convert_records(records: Iterable[Dict], root: str) -> List[str]:
+    """Write one shard per quiz from {user_id, quiz_id, response_map} records.
+
+    Records may come in any order. They are first partitioned by quiz into
+    spill files next to ``root``, then each quiz is converted from its
+    file, so memory holds one quiz's id arrays rather than every record.
+    """
+    os.makedirs(root, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix=".partitions.", dir=root) as spill:
+        partitions = _Partitions(spill)
+        try:
+            for record in records:
+                partitions.write(int(record['quiz_id']), record)
+        finally:
+            partitions.close()
+        return [write_quiz_file(root, quiz_id, path) for quiz_id, path in sorted(partitions.paths.items())]
+
+
+def main():
+    from bulk_ingest import iter_records
+
+    parser = argparse.ArgumentParser(description="Convert JSON response maps to .npy shards")
+    parser.add_argument("paths", nargs="+", help=".json or .jsonl files of response map records")
+    parser.add_argument("--root", default="response_maps")
+    args = parser.parse_args()
+
+    records = (record for path in args.paths for record in iter_records(path))
+    for directory in convert_records(records, args.root):
+        print(f"Wrote {directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# rolling_stats.py
+import json
+import math
+from collections import deque
+from typing import Dict, List, Optional
+
+from prediction_cache import get_redis_client
+
+RECENT_WINDOW = 5
+
+
+def slope(values: List[float]) -> float:
+    """Least-squares slope of values against 0..n-1."""
+    n = len(values)
+    if n < 2:
+        return 0.0
+    x_mean = (n - 1) / 2
+    y_mean = sum(values) / n
+    sxy = sum((x - x_mean) * (y - y_mean) for x, y in enumerate(values))
+    return sxy / (n * (n * n - 1) / 12)
+
+
+class RollingStats:
+    """Running aggregates of one user's quiz history, updated in O(1).
+
+    Holds enough to produce ``extract_temporal_features`` (mean, std and
+    least-squares trend of scores and times, score/time efficiency) over
+    the full history, plus the last ``RECENT_WINDOW`` quizzes that the
+    API's trend analysis uses. Quizzes with no recorded time are left out
+    of the efficiency mean, as in ``extract_temporal_features``.
+
+    Updates are idempotent per ``quiz_id``: the ids already folded in are
+    kept, and a repeat (e.g. a client retry) is ignored rather than
+    counted twice.
+    """
+
+    FIELDS = ('count', 'score_mean', 'score_m2', 'sum_score', 'sum_x_score',
+              'sum_time', 'sum_x_time', 'sum_ratio', 'ratio_count')
+
+    def __init__(self):
+        self.count = 0
+        # Welford mean / sum of squared deviations for a stable std
+        self.score_mean = 0.0
+        self.score_m2 = 0.0
+        self.sum_score = 0.0
+        self.sum_x_score = 0.0
+        self.sum_time = 0.0
+        self.sum_x_time = 0.0
+        self.sum_ratio = 0.0
+        self.ratio_count = 0
+        self.recent = deque(maxlen=RECENT_WINDOW)
+        self.quiz_ids = set()
+
+    def update(self, score: float, total_time: float, quiz_id: Optional[int] = None) -> bool:
+        """Fold in one quiz; False (and no change) if ``quiz_id`` was already recorded."""
+        if quiz_id is not None:
+            if quiz_id in self.quiz_ids:
+                return False
+            self.quiz_ids.add(quiz_id)
+        x = self.count
+        self.count += 1
+
+        delta = score - self.score_mean
+        self.score_mean += delta / self.count
+        self.score_m2 += delta * (score - self.score_mean)
+
+        self.sum_score += score
+        self.sum_x_score += x * score
+        self.sum_time += total_time
+        self.sum_x_time += x * total_time
+        if total_time:
+            self.sum_ratio += score / total_time
+            self.ratio_count += 1
+        self.recent.append((quiz_id, score))
+        return True
+
+    def _trend(self, sum_y: float, sum_xy: float) -> float:
+        n = self.count
+        if n < 2:
+            return 0.0
+        sum_x = n * (n - 1) / 2
+        sum_xx = (n - 1) * n * (2 * n - 1) / 6
+        return (n * sum_xy - sum_x * sum_y) / (n * sum_xx - sum_x * sum_x)
+
+    def temporal_features(self) -> Dict[str, float]:
+        """Same keys as ``FeatureEngineering.extract_temporal_features``."""
+        if not self.count:
+            raise ValueError("no quizzes recorded for this user")
+        return {
+            'avg_score': self.score_mean,
+            'score_trend': self._trend(self.sum_score, self.sum_x_score),
+            'score_std': math.sqrt(self.score_m2 / self.count),
+            'avg_time': self.sum_time / self.count,
+            'time_trend': self._trend(self.sum_time, self.sum_x_time),
+            'time_efficiency': self.sum_ratio / self.ratio_count if self.ratio_count else math.nan
+        }
+
+    @property
+    def recent_scores(self) -> List[float]:
+        return [score for _, score in self.recent]
+
+    def recent_trend(self) -> float:
+        return slope(self.recent_scores)
+
+    def to_dict(self) -> Dict:
+        data = {field: getattr(self, field) for field in self.FIELDS}
+        data['recent'] = list(self.recent)
+        data['quiz_ids'] = sorted(self.quiz_ids)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'RollingStats':
+        stats = cls()
+        for field in cls.FIELDS:
+            setattr(stats, field, data[field])
+        stats.recent.extend(tuple(item) for item in data['recent'])
+        stats.quiz_ids.update(data['quiz_ids'])
+        return stats
+
+
+class RollingStatsStore:
+    """Per-user RollingStats kept server-side in Redis (or the in-memory stand-in).
+
+    Updates are read-modify-write per user; submissions for one user are
+    expected to arrive one at a time.
+    """
+
+    def __init__(self, client=None, namespace: str = "rp:stats"):
+        self.client = client if client is not None else get_redis_client()
+        self.namespace = namespace
+
+    def _key(self, user_id) -> str:
+        return f"{self.namespace}:{user_id}"
+
+    def get(self, user_id) -> Optional[RollingStats]:
+        raw = self.client.get(self._key(user_id))
+        return RollingStats.from_dict(json.loads(raw)) if raw is not None else None
+
+    def update(self, user_id, score: float, total_time: float,
+               quiz_id: Optional[int] = None) -> RollingStats:
+        stats = self.get(user_id) or RollingStats()
+        if stats.update(score, total_time, quiz_id):
+            self.client.set(self._key(user_id), json.dumps(stats.to_dict()))
+        return stats
+
+    def listener(self, submissions: List[Dict]):
+        """``BulkLoader`` listener: fold each ingested submission into its user's stats."""
+        for submission in submissions:
+            self.update(submission['user_id'], submission['total_score'],
+                        submission['total_time'], submission.get('quiz_id'))
@@ -0,0 +1,40 @@
+# scoring.py
+"""The compact quiz wire format.
+
+The compact format sends a quiz's responses as parallel arrays plus a
+topic table, instead of one JSON object per response:
+
+    {"topics": ["Physics", "Chemistry"],
+     "question_id": [1, 2], "selected_option_id": [2, 3], "correct_option_id": [2, 4],
+     "topic_code": [0, 1], "time_taken": [60, 45]}
+
+Topic names are interned once per quiz and every response carries an index
+into ``topics``. ``FeatureEngineering.extract_topic_features_batch`` reads
+these arrays directly into its bincount kernel, so a compact request never
+builds per-response objects.
+"""
+from typing import Dict, List
+
+ARRAY_FIELDS = ('question_id', 'selected_option_id', 'correct_option_id', 'topic_code', 'time_taken')
+
+
+def compact_responses(responses: List[Dict]) -> Dict:
+    """Encode per-object responses (the JSON schema) in the compact format."""
+    topics = {}
+    codes = [topics.setdefault(response['topic'], len(topics)) for response in responses]
+    compact = {
+        field: [response[field] for response in responses]
+        for field in ARRAY_FIELDS if field != 'topic_code'
+    }
+    compact['topic_code'] = codes
+    compact['topics'] = list(topics)
+    return compact
+
+
+def compact_records(compact: Dict) -> List[Dict]:
+    """Decode the compact format back into per-response dicts."""
+    topics = compact['topics']
+    return [
+        {'topic': topics[code], **{field: compact[field][i] for field in ARRAY_FIELDS if field != 'topic_code'}}
+        for i, code in enumerate(compact['topic_code'])
+    ]
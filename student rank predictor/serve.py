@@ -0,0 +1,112 @@
+# serve.py
+"""Production serving: pre-forked uvicorn workers under gunicorn.
+
+The app (and with it the registry model) is imported once in the master
+before workers fork, so every worker shares the tree arrays copy-on-write
+instead of unpickling its own copy.
+
+    REDIS_URL=redis://localhost:6379/0 python serve.py --workers 4 --bind 0.0.0.0:8000
+    kill -HUP <master pid>    # graceful reload: the master loads the
+                              # registry's LATEST model, forks fresh workers
+                              # and lets the old ones finish their requests
+
+WEB_CONCURRENCY sets the default worker count. Keep RANK_EXECUTOR=thread
+here; the process pool is for single-process deployments.
+
+Rolling stats, the prediction cache and its invalidation live in Redis.
+With the default REDIS_URL=memory:// each worker would keep its own copy,
+and a submission recorded by one worker would be missing (404) or stale on
+another, so that setting defaults to, and is limited to, one worker.
+``--allow-per-worker-state`` lifts the limit for loads where every request
+carries its own history, such as benchmarks/load_test.py.
+"""
+import argparse
+import gc
+import os
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # gunicorn is POSIX-only; fall back to a single uvicorn process
+    BaseApplication = None
+
+
+def refresh_model():
+    """Load the registry's LATEST model into the (master's) predictor, if it changed."""
+    import backend
+
+    if backend.model_registry.refresh():
+        backend.rank_predictor.load_artifact(backend.model_registry.current)
+        backend.prediction_cache.invalidate_all()
+
+
+def on_reload(arbiter):
+    refresh_model()
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far out of the collector's generations so
+    # workers do not dirty (and copy) shared pages by scanning it
+    gc.freeze()
+
+
+if BaseApplication is not None:
+    class PreforkApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from backend import app
+
+            return app
+
+
+def main():
+    per_worker_state = os.environ.get("REDIS_URL", "memory://").startswith("memory://")
+    default_workers = 1 if per_worker_state else os.cpu_count() or 1
+    
+    parser = argparse.ArgumentParser(description="Serve the rank predictor API with pre-forked workers")
+    parser.add_argument("--bind", default="0.0.0.0:8000")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", default_workers)))
+    parser.add_argument("--allow-per-worker-state", action="store_true",
+                        help="run several workers with REDIS_URL=memory:// (stats and cache not shared)")
+    parser.add_argument("--graceful-timeout", type=int, default=30)
+    parser.add_argument("--keepalive", type=int, default=5, help="idle keep-alive seconds (uvicorn's default)")
+    parser.add_argument("--max-requests", type=int, default=0,
+                        help="recycle a worker after this many requests (0 = never)")
+    args = parser.parse_args()
+
+    if os.environ.get("RANK_EXECUTOR", "thread") != "thread" and args.workers > 1:
+        parser.error("use RANK_EXECUTOR=thread with multiple server workers")
+    if per_worker_state and args.workers > 1 and not args.allow_per_worker_state:
+        parser.error("REDIS_URL=memory:// keeps rolling stats and cached results per worker; "
+                     "set REDIS_URL to a shared Redis or use --workers 1")
+
+    if BaseApplication is None:
+        import uvicorn
+
+        host, port = args.bind.rsplit(":", 1)
+        uvicorn.run("backend:app", host=host, port=int(port))
+        return
+
+    options = {
+        'bind': args.bind,
+        'workers': args.workers,
+        'worker_class': 'uvicorn.workers.UvicornWorker',
+        'preload_app': True,
+        'graceful_timeout': args.graceful_timeout,
+        'keepalive': args.keepalive,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10,
+        'on_reload': on_reload,
+        'pre_fork': pre_fork
+    }
+    PreforkApplication(options).run()
+
+
+if __name__ == "__main__":
+    main()
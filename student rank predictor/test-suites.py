@@ -1,7 +1,34 @@
 # backend/tests/test_ml_models.py
 import pytest
+import json
+import os
+import pandas as pd
+import subprocess
+import sys
+import threading
 import numpy as np
-from app.ml.models import FeatureEngineering, RankPredictor
+from fastapi.testclient import TestClient
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import StandardScaler
+from sqlalchemy import select
+from app.ml.models import FeatureEngineering, RankPredictor, ReservoirSample
+import backend
+from bulk_ingest import BulkLoader
+from bulk_score import _state as bulk_score_state, load_checkpoint, run as bulk_score, save_checkpoint
+from db import get_engine, models
+from feature_store import FEATURE_COLUMNS, FeatureStore
+from inference import InferenceModel
+from inference_pool import InferencePool
+from instrumentation import Metrics
+from leaderboard import LiveLeaderboard, QuizLeaderboard
+from model_registry import ModelRegistry
+from prediction_cache import InMemoryRedis, PredictionCache
+from rolling_stats import RollingStats, RollingStatsStore
+from response_store import ResponseStore, convert_records
+from scoring import compact_records, compact_responses
+from uncertainty import RankUncertainty
+from what_if import ImprovementImpactEngine
 
 @pytest.fixture
 def sample_quiz_data():
@@ -34,6 +61,11 @@ def sample_history():
         {'total_score': 90, 'total_time': 90}
     ]
 
+def submission_record(user_id, score, correct):
+    response = {'question_id': 1, 'selected_option_id': 1, 'correct_option_id': 1 if correct else 2,
+                'topic': 'Physics', 'subtopic': 'Optics', 'difficulty': 'easy', 'time_taken': 30}
+    return {'user_id': user_id, 'total_score': score, 'total_time': 100, 'responses': [response]}
+
 class TestFeatureEngineering:
     def test_extract_topic_features(self, sample_quiz_data):
         fe = FeatureEngineering()
@@ -53,6 +85,692 @@ class TestFeatureEngineering:
         assert features['avg_score'] == pytest.approx(85.0)
         assert features['score_trend'] > 0  # Positive trend
 
+    def test_extract_features_batch_matches_single(self, sample_quiz_data, sample_history):
+        fe = FeatureEngineering()
+        other_quiz = {
+            'responses': [
+                {
+                    'question_id': 1,
+                    'selected_option_id': 1,
+                    'correct_option_id': 1,
+                    'topic': 'Biology',
+                    'time_taken': 30
+                }
+            ]
+        }
+        batch = fe.extract_features_batch(
+            [sample_quiz_data, other_quiz],
+            [sample_history, sample_history[:2]]
+        )
+        single = fe.extract_features_batch([sample_quiz_data], [sample_history])
+
+        assert list(batch.columns[:3]) == ['Biology_accuracy', 'Biology_avg_time', 'Biology_time_std']
+        assert np.array_equal(
+            batch.iloc[0][single.columns].to_numpy(),
+            single.iloc[0].to_numpy()
+        )
+        assert np.isnan(batch.loc[1, 'Physics_accuracy'])
+
+    def test_batch_kernels_match_per_student_reference(self):
+        # The batch kernels are checked against the np.mean/np.std/np.polyfit
+        # implementation, not against themselves
+        rng = np.random.default_rng(0)
+        fe = FeatureEngineering()
+        topics = ['Biology', 'Chemistry', 'Physics']
+        responses_batch = [
+            [
+                {'topic': topics[rng.integers(3)], 'selected_option_id': int(rng.integers(1, 5)),
+                 'correct_option_id': int(rng.integers(1, 5)), 'time_taken': float(rng.uniform(5, 120))}
+                for _ in range(rng.integers(1, 30))
+            ]
+            for _ in range(40)
+        ]
+        histories = [
+            [{'total_score': float(rng.uniform(-50, 720)), 'total_time': float(rng.uniform(600, 3600))}
+             for _ in range(rng.integers(2, 12))]
+            for _ in range(40)
+        ]
+
+        topic_batch = fe.extract_topic_features_batch(responses_batch)
+        temporal_batch = fe.extract_temporal_features_batch(histories)
+        for i in range(40):
+            expected = fe.extract_topic_features(responses_batch[i])
+            actual = topic_batch.iloc[i].dropna().to_dict()
+            assert actual.keys() == expected.keys()
+            assert actual == pytest.approx(expected, rel=1e-9)
+
+            expected = fe.extract_temporal_features(histories[i])
+            assert temporal_batch.iloc[i].to_dict() == pytest.approx(expected, rel=1e-9, abs=1e-9)
+
+    def test_unattempted_topics_stay_nan_for_every_consumer(self, sample_quiz_data, sample_history):
+        fe = FeatureEngineering()
+        biology_quiz = {'responses': [dict(sample_quiz_data['responses'][0], topic='Biology')]}
+        X = fe.extract_features_batch([sample_quiz_data, biology_quiz] * 10, [sample_history] * 20)
+        fe.feature_columns = list(X.columns)
+        X_scaled = fe.scaler.fit_transform(X)
+        model = RandomForestRegressor(n_estimators=5, random_state=0).fit(X_scaled, np.arange(20.0))
+
+        features = fe.prepare_features(sample_quiz_data, sample_history)
+        biology = fe.feature_columns.index('Biology_accuracy')
+        assert np.isnan(features[0, biology])
+        assert not np.isnan(np.delete(features[0], [biology, biology + 1, biology + 2])).any()
+
+        interval = RankUncertainty.from_feature_columns(model, fe.scaler, fe.feature_columns).intervals(features)
+        assert np.isfinite(interval['p50']).all()
+        engine = ImprovementImpactEngine.from_feature_columns(model, fe.scaler, fe.feature_columns)
+        assert {area['topic'] for area in engine.recommendations(features[0])} <= {'Chemistry', 'Physics'}
+
+class TestRollingStats:
+    def test_matches_extract_temporal_features(self, sample_history):
+        stats = RollingStats()
+        for quiz in sample_history:
+            stats.update(quiz['total_score'], quiz['total_time'])
+
+        expected = FeatureEngineering().extract_temporal_features(sample_history)
+        assert stats.temporal_features() == pytest.approx(expected)
+
+    def test_zero_time_quizzes_are_left_out_of_efficiency(self, sample_history):
+        history = sample_history + [{'total_score': 70, 'total_time': 0}]
+        stats = RollingStats()
+        for quiz in history:
+            stats.update(quiz['total_score'], quiz['total_time'])
+
+        fe = FeatureEngineering()
+        expected = fe.extract_temporal_features(history)
+        assert expected['time_efficiency'] == pytest.approx(np.mean([80 / 100, 85 / 95, 90 / 90]))
+        assert stats.temporal_features() == pytest.approx(expected)
+        assert fe.extract_temporal_features_batch([history]).iloc[0].to_dict() == pytest.approx(expected)
+
+    def test_store_keeps_recent_window(self):
+        store = RollingStatsStore(client=InMemoryRedis())
+        for quiz_id, score in enumerate([60, 65, 70, 75, 80, 85]):
+            store.update(7, score, 100, quiz_id)
+
+        stats = store.get(7)
+        assert stats.count == 6
+        assert stats.recent_scores == [65, 70, 75, 80, 85]
+        assert stats.recent_trend() == pytest.approx(5.0)
+
+    def test_retried_quiz_is_counted_once(self, sample_history):
+        store = RollingStatsStore(client=InMemoryRedis())
+        for quiz_id, quiz in enumerate(sample_history):
+            store.update(7, quiz['total_score'], quiz['total_time'], quiz_id)
+        before = store.get(7).temporal_features()
+
+        retried = store.update(7, sample_history[0]['total_score'], sample_history[0]['total_time'], 0)
+
+        assert retried.count == 3
+        assert store.get(7).temporal_features() == before
+        assert store.get(7).recent == retried.recent
+
+class TestResponseStore:
+    def test_round_trip_response_maps(self, tmp_path):
+        records = [
+            {'user_id': 2, 'quiz_id': 5, 'response_map': {'1': 3, '2': 1}},
+            {'user_id': 1, 'quiz_id': 5, 'response_map': {'3': 4}},
+        ]
+        convert_records(records, str(tmp_path))
+        quiz = ResponseStore(str(tmp_path)).quiz(5)
+
+        assert quiz.responses.dtype == np.int8
+        assert quiz.row(2).tolist() == [3, 1, -1]
+        assert quiz.response_map(1) == {'3': 4}
+        assert quiz.response_map(99) is None
+
+    def test_convert_unsorted_records_and_replace_shards_whole(self, tmp_path):
+        records = [
+            {'user_id': 3, 'quiz_id': 6, 'response_map': {'7': 2}},
+            {'user_id': 2, 'quiz_id': 5, 'response_map': {'1': 3}},
+            {'user_id': 1, 'quiz_id': 6, 'response_map': {'8': 1}},
+            {'user_id': 2, 'quiz_id': 5, 'response_map': {'2': 4}},
+        ]
+        convert_records(records, str(tmp_path))
+        store = ResponseStore(str(tmp_path))
+
+        assert store.quiz(5).response_map(2) == {'2': 4}
+        assert store.history(1, [6, 5]) == [{'8': 1}, None]
+
+        with pytest.raises(ValueError):
+            convert_records([{'user_id': 9, 'quiz_id': 6, 'response_map': {'7': 1000}}], str(tmp_path))
+        # The failed conversion left the old shard in place and no scratch files behind
+        assert ResponseStore(str(tmp_path)).quiz(6).user_ids.tolist() == [1, 3]
+        assert sorted(os.listdir(tmp_path)) == ['quiz_5', 'quiz_6']
+
+class TestModelRegistry:
+    def test_save_load_and_refresh(self, tmp_path):
+        X = np.random.rand(50, 3)
+        y = np.random.rand(50)
+        scaler = StandardScaler().fit(X)
+        model = RandomForestRegressor(n_estimators=5, random_state=0).fit(scaler.transform(X), y)
+        registry = ModelRegistry(str(tmp_path))
+
+        assert registry.refresh() is False
+        registry.save(model, scaler, ['a', 'b', 'c'], version='v1')
+        assert registry.refresh() is True
+        assert registry.current.version == 'v1'
+        assert registry.current.feature_columns == ['a', 'b', 'c']
+        assert np.allclose(registry.current.model.predict(scaler.transform(X)),
+                           model.predict(scaler.transform(X)))
+
+        registry.save(model, scaler, ['a', 'b', 'c'], version='v2', promote=False)
+        assert registry.refresh() is False
+        registry.promote('v2')
+        assert registry.refresh() is True
+        assert registry.versions() == ['v1', 'v2']
+
+class TestPredictionCache:
+    def test_two_tier_get_and_user_invalidation(self):
+        cache = PredictionCache(client=InMemoryRedis())
+        rank_key = cache.key('rank', 1, 10, 'v1')
+        college_key = cache.key('college', 500, 'general', None)
+
+        cache.set(rank_key, {'predicted_rank': 420}, user_id=1)
+        cache.set(college_key, {'eligible_colleges': ['JIPMER']})
+        cache.local.clear()
+        assert cache.get(rank_key, 1) == {'predicted_rank': 420}
+
+        cache.invalidate_user(1)
+        assert cache.get(rank_key, 1) is None
+        assert cache.get(college_key) == {'eligible_colleges': ['JIPMER']}
+
+    def test_bulk_ingest_listener_invalidates_loaded_users(self, tmp_path):
+        engine = get_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+        models.Base.metadata.create_all(engine)
+        cache = PredictionCache(client=InMemoryRedis())
+        cache.set(cache.key('rank', 1, 10, 'v1'), {'predicted_rank': 420}, user_id=1)
+        cache.set(cache.key('rank', 2, 10, 'v1'), {'predicted_rank': 900}, user_id=2)
+
+        BulkLoader(engine, listeners=[cache.listener]).load([submission_record(1, 80, True)])
+
+        assert cache.get(cache.key('rank', 1, 10, 'v1'), 1) is None
+        assert cache.get(cache.key('rank', 2, 10, 'v1'), 2) == {'predicted_rank': 900}
+
+class TestRankUncertainty:
+    def test_intervals_bracket_forest_prediction(self):
+        X = np.random.rand(200, 3)
+        y = 1000 * X[:, 0] + np.random.rand(200)
+        model = RandomForestRegressor(n_estimators=20, random_state=0).fit(X, y)
+        interval = RankUncertainty(model, score_column=0, score_sigma=0.05, n_draws=8).intervals(X[:50])
+
+        assert np.all(interval['p5'] <= interval['p50'])
+        assert np.all(interval['p50'] <= interval['p95'])
+        assert np.all((interval['confidence'] >= 0) & (interval['confidence'] <= 1))
+
+    def test_score_noise_goes_on_the_named_score_column(self):
+        X = np.random.rand(100, 3) * [1, 400, 1]
+        scaler = StandardScaler().fit(X)
+        model = RandomForestRegressor(n_estimators=5, random_state=0).fit(scaler.transform(X), X[:, 1])
+
+        uncertainty = RankUncertainty.from_feature_columns(
+            model, scaler, ['Botany_accuracy', 'avg_score', 'time_trend'], score_sigma=10
+        )
+        assert uncertainty.score_column == 1
+        assert uncertainty.score_sigma == pytest.approx(10 / scaler.scale_[1])
+        assert uncertainty.n_draws > 1
+
+        without_score = RankUncertainty.from_feature_columns(model, scaler, ['a', 'b', 'c'], score_sigma=10)
+        assert without_score.score_column is None and without_score.n_draws == 1
+
+class TestImprovementImpactEngine:
+    def test_recommends_topic_that_moves_rank(self):
+        X = np.random.rand(300, 3)
+        y = 10000 - 5000 * X[:, 1] + np.random.rand(300)
+        scaler = StandardScaler().fit(X)
+        model = RandomForestRegressor(n_estimators=20, random_state=0).fit(scaler.transform(X), y)
+        engine = ImprovementImpactEngine.from_feature_columns(
+            model, scaler, ['avg_score', 'Botany_accuracy', 'Physics_accuracy']
+        )
+        row = scaler.transform([[0.5, 0.3, 0.3]])
+
+        baseline, gains = engine.impact_batch(row)
+        assert baseline[0] == pytest.approx(model.predict(row)[0])
+        assert gains.shape == (1, 2, 3)
+
+        recommendations = engine.recommendations(row[0])
+        assert recommendations[0]['topic'] == 'Botany'
+        assert recommendations[0]['expected_rank_gain'] > 0
+        assert engine.recommendations(row[0]) is recommendations
+
+class TestInferencePool:
+    def test_process_pool_restart_drains_old_workers(self):
+        pool = InferencePool('process', workers=1)
+        pool.start()
+        pending = pool.submit(abs, -3)
+        pool.restart()
+
+        assert pending.result() == 3
+        assert pool.submit(abs, -4).result() == 4
+        pool.shutdown()
+
+    def test_rejects_unknown_executor(self):
+        with pytest.raises(ValueError):
+            InferencePool('gpu')
+
+class TestServe:
+    def test_refuses_several_workers_without_shared_state(self):
+        env = {key: value for key, value in os.environ.items() if key not in ('REDIS_URL', 'WEB_CONCURRENCY')}
+        result = subprocess.run(
+            [sys.executable, 'serve.py', '--workers', '2'],
+            cwd=os.path.dirname(os.path.abspath(backend.__file__)), env=env,
+            capture_output=True, text=True, timeout=60
+        )
+
+        assert result.returncode == 2
+        assert 'REDIS_URL=memory://' in result.stderr
+
+class TestMetrics:
+    def test_disabled_metrics_record_nothing(self):
+        metrics = Metrics(enabled=False)
+        with metrics.stage("model_predict"):
+            pass
+        metrics.inc("cache_hit")
+
+        assert "model_predict" not in metrics.render()
+
+    def test_stage_histogram_and_counters_render(self):
+        metrics = Metrics(enabled=True)
+        with metrics.stage("model_predict"):
+            pass
+        metrics.inc("predicted_rows", 3)
+        text = metrics.render()
+
+        assert 'rank_stage_seconds_count{stage="model_predict"} 1' in text
+        assert 'rank_stage_seconds_bucket{stage="model_predict",le="+Inf"} 1' in text
+        assert 'rank_events_total{event="predicted_rows"} 3' in text
+
+class TestInferenceModel:
+    # Heavy libraries a rank lookup must not import before an artifact is loaded
+    DEFERRED_MODULES = ('sklearn', 'pandas', 'matplotlib', 'seaborn')
+    IMPORT_BUDGET_SECONDS = 1.0
+
+    def test_predicts_from_registry_with_named_features(self, tmp_path):
+        X = np.random.rand(50, 3)
+        scaler = StandardScaler().fit(X)
+        model = RandomForestRegressor(n_estimators=5, random_state=0).fit(scaler.transform(X), np.random.rand(50) * 1000)
+        ModelRegistry(str(tmp_path)).save(model, scaler, ['a', 'b', 'c'], version='v1')
+
+        inference = InferenceModel.from_registry(str(tmp_path))
+        rows = [dict(zip(['c', 'a', 'b'], row[[2, 0, 1]])) for row in X[:5]]
+
+        assert inference.version == 'v1'
+        assert inference.predict(rows).tolist() == model.predict(scaler.transform(X[:5])).astype(int).tolist()
+
+    def test_missing_features_are_nan_like_training(self, tmp_path):
+        X = np.random.rand(50, 3)
+        X[::2, 1] = np.nan
+        scaler = StandardScaler().fit(X)
+        model = RandomForestRegressor(n_estimators=5, random_state=0).fit(scaler.transform(X), np.random.rand(50) * 1000)
+        ModelRegistry(str(tmp_path)).save(model, scaler, ['a', 'b', 'c'], version='v1')
+
+        inference = InferenceModel.from_registry(str(tmp_path))
+        row = {'a': 0.5, 'c': 0.5}
+
+        assert np.isnan(inference._matrix([row])[0, 1])
+        assert inference.predict([row]).tolist() == model.predict(scaler.transform([[0.5, np.nan, 0.5]])).astype(int).tolist()
+
+    def test_cold_import_stays_within_budget(self):
+        code = (
+            "import sys, time\n"
+            "start = time.perf_counter()\n"
+            "import inference\n"
+            "print(time.perf_counter() - start)\n"
+            f"print([m for m in {self.DEFERRED_MODULES!r} if m in sys.modules])\n"
+        )
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        elapsed, loaded = result.stdout.splitlines()
+
+        assert loaded == '[]'
+        assert float(elapsed) < self.IMPORT_BUDGET_SECONDS
+
+class TestFeatureStore:
+    def test_ingest_listener_writes_rows_for_training_and_lookup(self, tmp_path):
+        engine = get_engine(f"sqlite:///{tmp_path / 'features.db'}")
+        models.Base.metadata.create_all(engine)
+        store = FeatureStore(engine, RollingStatsStore(InMemoryRedis()), FeatureEngineering())
+        BulkLoader(engine, chunk_size=2, listeners=[store.listener]).load([
+            submission_record(1, 80, True), submission_record(2, 50, False), submission_record(1, 90, False)
+        ])
+
+        frame = store.load_frame()
+        assert list(frame.columns) == FEATURE_COLUMNS
+        assert frame['Physics_accuracy'].tolist() == [1.0, 0.0, 0.0]
+        assert frame['Botany_accuracy'].isna().all()
+
+        latest = store.latest(1)
+        assert latest == store.get(1, int(frame.index[-1]))
+        # Temporal features cover the user's history up to this submission
+        assert latest['avg_score'] == 85
+        assert store.get(2, int(frame.index[0])) is None
+
+    def test_registry_topics_are_stored_and_unknown_topics_counted(self, tmp_path):
+        engine = get_engine(f"sqlite:///{tmp_path / 'features.db'}")
+        models.Base.metadata.create_all(engine)
+        fe = FeatureEngineering()
+        store = FeatureStore(engine, RollingStatsStore(InMemoryRedis()), fe)
+        record = submission_record(1, 80, True)
+        record['responses'] += [
+            dict(record['responses'][0], question_id=2, topic='Biology'),
+            dict(record['responses'][0], question_id=3, topic='Mathematics'),
+            dict(record['responses'][0], question_id=4, topic='Mathematics')
+        ]
+        BulkLoader(engine, listeners=[store.listener]).load([record])
+
+        assert store.latest(1)['Biology_accuracy'] == 1.0
+        assert store.unknown_topics == {'Mathematics': 2}
+        assert fe.feature_columns == FEATURE_COLUMNS
+
+    def test_default_models_train_and_predict_on_store_frames(self, tmp_path):
+        engine = get_engine(f"sqlite:///{tmp_path / 'features.db'}")
+        models.Base.metadata.create_all(engine)
+        store = FeatureStore(engine, RollingStatsStore(InMemoryRedis()), FeatureEngineering())
+        BulkLoader(engine, listeners=[store.listener]).load([
+            submission_record(user_id % 7, 100 + 5 * user_id, user_id % 3 == 0) for user_id in range(40)
+        ])
+        frame = store.load_frame()
+        y = 50000 - 50 * frame['avg_score'].to_numpy()
+        # Unattempted topics are NaN in every row
+        assert frame['Chemistry_accuracy'].isna().all()
+
+        predictor = RankPredictor()
+        predictor.PARAM_GRIDS = {'rf': {'n_estimators': [10]}, 'gb': {'max_iter': [20]}}
+        predictor.train(frame, y, n_jobs=1, cv=2)
+
+        assert 'Chemistry_accuracy' not in predictor.feature_columns
+        families = predictor.training_report['families']
+        assert set(families) == {'rf', 'gb'}
+        assert all(np.isfinite(family['best_mae']) for family in families.values())
+
+        # A boosted best model serves and warm-starts on the same rows
+        X_scaled = predictor.feature_engineering.scaler.transform(frame[predictor.feature_columns])
+        predictor.best_model = clone(predictor.models['gb']).set_params(max_iter=20).fit(X_scaled, y)
+        assert np.isfinite(predictor.best_model.predict(X_scaled)).all()
+        report = predictor.update(frame, y, new_estimators=5, tolerance=1.0)
+        assert report['promoted'] and report['estimators'] == 25
+
+class TestLiveLeaderboard:
+    def test_rank_percentile_and_resubmission_match_brute_force(self):
+        leaderboard = LiveLeaderboard(min_score=0, max_score=720, step=1)
+        scores = {user_id: float(score) for user_id, score in enumerate(np.random.randint(0, 721, 500))}
+        for user_id, score in scores.items():
+            leaderboard.submit(1, user_id, score)
+        scores[0] = 700.0
+        leaderboard.submit(1, 0, 700.0)
+
+        values = np.array(list(scores.values()))
+        for user_id in (0, 1, 250):
+            standing = leaderboard.user_standing(1, user_id)
+            assert standing['participants'] == 500
+            assert standing['rank'] == 1 + int((values > scores[user_id]).sum())
+            assert standing['percentile'] == pytest.approx(100 * (values <= scores[user_id]).mean())
+        with pytest.raises(KeyError):
+            leaderboard.standing(2, 100)
+
+    def test_fractional_step_ranks_users_by_their_own_bin(self):
+        board = QuizLeaderboard(min_score=-180, max_score=720, step=0.1)
+        scores = np.round(np.random.default_rng(0).uniform(-180, 720, 3000), 1)
+        for user_id, score in enumerate(scores.tolist()):
+            board.submit(user_id, score)
+
+        bins = np.array([board.user_bins[user_id] for user_id in range(len(scores))])
+        for user_id in range(len(scores)):
+            assert board.user_standing(user_id)['rank'] == 1 + int((bins > bins[user_id]).sum())
+
+    def test_snapshot_round_trip(self, tmp_path):
+        leaderboard = LiveLeaderboard(directory=str(tmp_path))
+        for user_id, score in enumerate([300, 450, 450, 600]):
+            leaderboard.submit(7, user_id, score)
+        leaderboard.snapshot()
+
+        restored = LiveLeaderboard.load(str(tmp_path))
+        assert restored.user_standing(7, 1) == leaderboard.user_standing(7, 1)
+        assert restored.standing(7, 500)['rank'] == 2
+
+class TestCompactScoring:
+    def test_compact_round_trip_and_topic_table_order(self, sample_quiz_data):
+        responses = sample_quiz_data['responses'] + [dict(sample_quiz_data['responses'][1], selected_option_id=4)]
+        compact = compact_responses(responses)
+
+        assert compact['topics'] == ['Physics', 'Chemistry']
+        assert compact['topic_code'] == [0, 1, 1]
+        assert compact_records(compact) == responses
+
+    def test_compact_topic_features_match_per_object(self, sample_quiz_data):
+        fe = FeatureEngineering()
+        other = [dict(sample_quiz_data['responses'][0], topic='Biology', time_taken=75)]
+        batch = [sample_quiz_data['responses'], other, []]
+
+        expected = fe.extract_topic_features_batch(batch)
+        compact = fe.extract_topic_features_batch([compact_responses(r) for r in batch])
+        mixed = fe.extract_topic_features_batch([batch[0], compact_responses(other), []])
+
+        pd.testing.assert_frame_equal(compact, expected)
+        pd.testing.assert_frame_equal(mixed, expected)
+
+class TestIncrementalUpdate:
+    def _fitted_predictor(self, n_rows=300):
+        X = pd.DataFrame(np.random.rand(n_rows, 3), columns=['a', 'b', 'c'])
+        y = 1000 * X['a'].to_numpy() + np.random.rand(n_rows)
+        predictor = RankPredictor()
+        predictor.feature_columns = list(X.columns)
+        predictor.feature_engineering.feature_columns = predictor.feature_columns
+        X_scaled = predictor.feature_engineering.scaler.fit_transform(X)
+        predictor.best_model = RandomForestRegressor(n_estimators=10, random_state=0).fit(X_scaled, y)
+        predictor.reservoir = ReservoirSample(capacity=200)
+        predictor.reservoir.add(X.to_numpy(), y)
+        return predictor, X, y
+
+    def test_warm_start_adds_trees_and_gates_on_holdout(self):
+        predictor, X, y = self._fitted_predictor()
+        original = predictor.best_model
+
+        report = predictor.update(X.iloc[:100], y[:100], new_estimators=5, tolerance=1.0)
+        assert report['promoted'] and report['estimators'] == 15
+        assert report['fit_rows'] == 80 + 200
+        assert len(original.estimators_) == 10
+
+        promoted = predictor.best_model
+        report = predictor.update(X.iloc[:100], y[:100], new_estimators=5, tolerance=-1.0)
+        assert not report['promoted'] and predictor.best_model is promoted
+        assert predictor.reservoir.seen == 500 and len(predictor.reservoir.X) == 200
+
+    def test_reservoir_survives_registry_round_trip(self, tmp_path):
+        predictor, _, _ = self._fitted_predictor()
+        registry = ModelRegistry(str(tmp_path))
+        registry.save_predictor(predictor, version='v1')
+
+        restored = RankPredictor()
+        restored.load_artifact(registry.load('v1'))
+        assert restored.reservoir.seen == 300
+        assert np.array_equal(restored.reservoir.X, predictor.reservoir.X)
+
+class TestBulkScore:
+    def test_scores_every_user_and_resumes_without_duplicates(self, tmp_path):
+        database_url = f"sqlite:///{tmp_path / 'scores.db'}"
+        engine = get_engine(database_url)
+        models.Base.metadata.create_all(engine)
+        records = [submission_record(user_id % 5, 100 + user_id, user_id % 2 == 0) for user_id in range(12)]
+        BulkLoader(engine).load(records)
+
+        X = pd.DataFrame(np.random.rand(50, len(FEATURE_COLUMNS)), columns=FEATURE_COLUMNS)
+        scaler = StandardScaler().fit(X)
+        model = RandomForestRegressor(n_estimators=5, random_state=0).fit(scaler.transform(X), np.random.rand(50) * 1000)
+        registry = ModelRegistry(str(tmp_path / 'models'))
+        registry.save(model, scaler, FEATURE_COLUMNS, version='v1')
+        checkpoint = str(tmp_path / 'checkpoint.json')
+        output = tmp_path / 'ranks.jsonl'
+
+        stats = bulk_score(database_url, registry.load('v1'), checkpoint, workers=2, chunk_size=2, max_in_flight=2,
+                           output=str(output))
+        assert stats['users'] == 5
+        assert load_checkpoint(checkpoint) is None
+        # Score noise on the same column, with the same settings, as /predict/rank
+        serving = backend.RankPredictor()
+        serving.load_artifact(registry.load('v1'))
+        assert bulk_score_state['uncertainty'].score_column == FEATURE_COLUMNS.index('avg_score')
+        assert bulk_score_state['uncertainty'].score_sigma == serving.uncertainty.score_sigma
+        assert bulk_score_state['uncertainty'].n_draws == serving.uncertainty.n_draws
+        first_chunk = b''.join(output.read_bytes().splitlines(keepends=True)[:2])
+
+        # Crash after user 1's chunk was checkpointed: the rerun rewrites the rest in place
+        with open(checkpoint) as f:
+            state = json.load(f)
+        save_checkpoint(checkpoint, {**state, 'after_user_id': 1, 'users': 2, 'finished': False,
+                                     'output_bytes': len(first_chunk)})
+        assert bulk_score(database_url, registry.load('v1'), checkpoint, workers=1, chunk_size=2,
+                          output=str(output))['users'] == 3
+
+        with engine.connect() as conn:
+            user_ids = conn.execute(select(models.RankPrediction.user_id)).scalars().all()
+        assert sorted(user_ids) == [0, 1, 2, 3, 4]
+        assert [json.loads(line)['user_id'] for line in output.read_text().splitlines()] == [0, 1, 2, 3, 4]
+
+class TestBackendServing:
+    def _trained_registry(self, root):
+        rng = np.random.default_rng(0)
+        quizzes, histories = [], []
+        for _ in range(60):
+            quizzes.append({'responses': [
+                {'topic': topic, 'selected_option_id': int(rng.integers(1, 5)), 'correct_option_id': 1,
+                 'time_taken': int(rng.integers(10, 120))}
+                for topic in ('Physics', 'Chemistry', 'Biology') for _ in range(3)
+            ]})
+            histories.append([
+                {'total_score': float(score), 'total_time': float(time)}
+                for score, time in zip(rng.integers(100, 700, 3), rng.integers(300, 900, 3))
+            ])
+        X = FeatureEngineering().extract_features_batch(quizzes, histories)
+        y = 50000 - 50 * X['avg_score'].to_numpy() - 10000 * X['Physics_accuracy'].to_numpy()
+
+        predictor = RankPredictor()
+        predictor.PARAM_GRIDS = {'rf': {'n_estimators': [10]}, 'gb': {'max_iter': [20]}}
+        predictor.train(X, y, n_jobs=1, cv=2)
+        registry = ModelRegistry(str(root))
+        registry.save_predictor(predictor, version='trained')
+        return registry, predictor
+
+    def test_predict_rank_serves_a_save_predictor_artifact(self, tmp_path, monkeypatch):
+        registry, predictor = self._trained_registry(tmp_path)
+        monkeypatch.setattr(backend, 'model_registry', registry)
+        monkeypatch.setattr(backend, 'rank_predictor', backend.RankPredictor())
+        user_id = 9001
+        quizzes = [
+            {'user_id': user_id, 'quiz_id': quiz_id, 'total_score': score, 'responses': [
+                {'question_id': i, 'selected_option_id': 1, 'correct_option_id': 1 + (i + quiz_id) % 2,
+                 'topic': topic, 'difficulty': 'easy', 'time_taken': 40 + 10 * i}
+                for i, topic in enumerate(['Biology', 'Physics', 'Chemistry', 'Physics'])
+            ]}
+            for quiz_id, score in [(1, 300.0), (2, 420.0), (3, 510.0)]
+        ]
+
+        with TestClient(backend.app) as client:
+            assert client.post('/model/reload').json() == {'version': 'trained'}
+            for quiz in quizzes:
+                client.post('/submissions', json=quiz)
+            served = client.post('/predict/rank', json={'quiz': quizzes[-1]})
+            compact = client.post('/predict/rank/compact', json={'quiz': {
+                **quizzes[-1], 'quiz_id': 4, 'responses': compact_responses(quizzes[-1]['responses'])
+            }})
+
+        history = [{'total_score': quiz['total_score'],
+                    'total_time': sum(r['time_taken'] for r in quiz['responses'])} for quiz in quizzes]
+        expected = predictor.predict(quizzes[-1], history)
+        assert served.status_code == 200, served.text
+        assert served.json()['predicted_rank'] == expected['predicted_rank']
+        assert compact.json()['predicted_rank'] == expected['predicted_rank']
+        # Both paths put the score noise on avg_score
+        assert predictor.uncertainty.score_column == predictor.feature_columns.index('avg_score')
+        assert backend.rank_predictor.uncertainty.score_column == predictor.uncertainty.score_column
+
+    def test_features_are_prepared_off_the_event_loop(self, tmp_path, monkeypatch):
+        registry, _ = self._trained_registry(tmp_path)
+        predictor = backend.RankPredictor()
+        predictor.load_artifact(registry.load('trained'))
+        threads = []
+        prepare = predictor.prepare_features_batch
+        def recording_prepare(*args):
+            threads.append(threading.current_thread().name)
+            return prepare(*args)
+        monkeypatch.setattr(predictor, 'prepare_features_batch', recording_prepare)
+        monkeypatch.setattr(backend, 'rank_predictor', predictor)
+        quiz = {'user_id': 9003, 'quiz_id': 1, 'total_score': 400.0, 'responses': [
+            {'question_id': 1, 'selected_option_id': 1, 'correct_option_id': 1,
+             'topic': 'Physics', 'difficulty': 'easy', 'time_taken': 30}
+        ]}
+        history = {'user_id': 9003, 'last_5_quizzes': [{'quiz_id': 0, 'score': 350.0, 'response_map': {}}]}
+
+        with TestClient(backend.app) as client:
+            single = client.post('/predict/rank', json={'quiz': quiz, 'history': history})
+            batch = client.post('/predict/rank/batch', json=[{'quiz': {**quiz, 'quiz_id': 2}, 'history': history}])
+            missing = client.post('/predict/rank', json={'quiz': {**quiz, 'user_id': 9004}})
+
+        assert single.status_code == 200 and batch.status_code == 200
+        assert batch.json()['predictions'][0]['predicted_rank'] == single.json()['predicted_rank']
+        # Users without recorded history still fail fast, before any executor work
+        assert missing.status_code == 404
+        assert len(threads) == 2 and all(name.startswith('inference') for name in threads)
+
+    def test_resubmitted_quiz_is_recorded_once(self):
+        quiz = {'user_id': 9005, 'quiz_id': 1, 'total_score': 400.0, 'responses': [
+            {'question_id': 1, 'selected_option_id': 1, 'correct_option_id': 1,
+             'topic': 'Physics', 'difficulty': 'easy', 'time_taken': 30}
+        ]}
+
+        with TestClient(backend.app) as client:
+            first = client.post('/submissions', json=quiz).json()
+            retry = client.post('/submissions', json=quiz).json()
+
+        assert first['quizzes_recorded'] == retry['quizzes_recorded'] == 1
+        assert retry['live_standing'] == first['live_standing']
+        assert backend.rolling_stats_store.get(9005).recent_scores == [400.0]
+
+    def test_cached_results_are_keyed_on_the_client_history(self, tmp_path, monkeypatch):
+        registry, _ = self._trained_registry(tmp_path)
+        predictor = backend.RankPredictor()
+        predictor.load_artifact(registry.load('trained'))
+        monkeypatch.setattr(backend, 'rank_predictor', predictor)
+        quiz = {'user_id': 9006, 'quiz_id': 1, 'total_score': 400.0, 'responses': [
+            {'question_id': 1, 'selected_option_id': 1, 'correct_option_id': 1,
+             'topic': 'Physics', 'difficulty': 'easy', 'time_taken': 30}
+        ]}
+        def history(*scores):
+            return {'user_id': 9006, 'last_5_quizzes': [
+                {'quiz_id': i, 'score': score, 'response_map': {}} for i, score in enumerate(scores)
+            ]}
+
+        with TestClient(backend.app) as client:
+            def post(path, body):
+                return client.post(path, json=body).json()
+            rising = post('/analyze/performance', {'quiz': quiz, 'history': history(100.0, 300.0)})
+            falling = post('/analyze/performance', {'quiz': quiz, 'history': history(300.0, 100.0)})
+            low = post('/predict/rank', {'quiz': quiz, 'history': history(100.0)})
+            high = post('/predict/rank', {'quiz': quiz, 'history': history(650.0)})
+            low_again = post('/predict/rank', {'quiz': quiz, 'history': history(100.0)})
+
+        assert rising['improvement_trends']['trend'] == 'improving'
+        assert falling['improvement_trends']['trend'] == 'declining'
+        assert high['predicted_rank'] < low['predicted_rank']
+        assert low_again == low
+
+    def test_analyze_performance_reads_the_stored_trend(self, monkeypatch):
+        def no_polyfit(*args, **kwargs):
+            raise AssertionError("trend should come from the rolling stats")
+        monkeypatch.setattr(np, 'polyfit', no_polyfit)
+        user_id = 9002
+        quiz = {'user_id': user_id, 'quiz_id': 1, 'total_score': 0.0, 'responses': [
+            {'question_id': 1, 'selected_option_id': 1, 'correct_option_id': 1,
+             'topic': 'Physics', 'difficulty': 'easy', 'time_taken': 30}
+        ]}
+
+        with TestClient(backend.app) as client:
+            for quiz_id, score in enumerate([300.0, 340.0, 320.0, 400.0]):
+                client.post('/submissions', json={**quiz, 'quiz_id': quiz_id, 'total_score': score})
+            trends = client.post('/analyze/performance', json={'quiz': {**quiz, 'quiz_id': 99}}).json()['improvement_trends']
+
+        assert trends['recent_scores'] == [300.0, 340.0, 320.0, 400.0]
+        assert trends['trend'] == 'improving'
+        assert trends['rate'] == pytest.approx(backend.rolling_stats_store.get(user_id).recent_trend())
+
 class TestRankPredictor:
     def test_prediction_structure(self, sample_quiz_data, sample_history):
         predictor = RankPredictor()
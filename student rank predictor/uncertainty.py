@@ -0,0 +1,104 @@
+# uncertainty.py
+import os
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+CHUNK_ROWS = 2048
+# Feature the score noise is applied to, and its default spread in marks
+SCORE_FEATURE = 'avg_score'
+DEFAULT_SCORE_SIGMA = 10.0
+# Serving settings, shared by the API and bulk_score.py so both report the same confidence
+RANK_SCORE_SIGMA = float(os.environ.get("RANK_SCORE_SIGMA", DEFAULT_SCORE_SIGMA))
+RANK_MC_DRAWS = int(os.environ.get("RANK_MC_DRAWS", 16))
+
+
+def tree_predictions(model, X: np.ndarray) -> Optional[np.ndarray]:
+    """Per-member predictions of a bagged forest, shape (n_trees, n_rows).
+
+    Returns None for models without independent members (e.g. boosting,
+    whose stages are not predictions on their own).
+    """
+    estimators = getattr(model, 'estimators_', None)
+    if estimators is None or getattr(estimators, 'ndim', 1) != 1:
+        return None
+    # Validate/convert once instead of once per tree
+    X32 = np.ascontiguousarray(X, dtype=np.float32)
+    return np.stack([tree.predict(X32, check_input=False) for tree in estimators])
+
+
+class RankUncertainty:
+    """Rank intervals from forest spread plus Monte Carlo score noise.
+
+    Each row is replicated ``n_draws`` times with Gaussian noise added to
+    the score feature (``score_sigma`` in the model's input units), and
+    every tree predicts every replica. The pooled predictions give rank
+    percentiles and a confidence: the share of samples within
+    ``tolerance`` (relative) of the median rank. Rows are processed in
+    chunks to bound memory.
+
+    Boosted models have no per-member spread, so without score noise
+    they yield a point estimate and a NaN confidence.
+    """
+
+    def __init__(self, model, score_column: Optional[int] = None, score_sigma: float = 0.0,
+                 n_draws: int = 16, percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+                 tolerance: float = 0.1, seed: int = 0):
+        self.model = model
+        self.score_column = score_column
+        self.score_sigma = score_sigma
+        self.n_draws = n_draws if score_column is not None and score_sigma > 0 else 1
+        self.percentiles = tuple(percentiles)
+        self.tolerance = tolerance
+        self.rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_feature_columns(cls, model, scaler, feature_columns: Optional[List[str]],
+                             score_sigma: float = DEFAULT_SCORE_SIGMA, **kwargs) -> 'RankUncertainty':
+        """Noise on the ``SCORE_FEATURE`` column, ``score_sigma`` in marks.
+
+        The sigma is divided by the scaler's scale for that column, since
+        the model sees scaled inputs. Models without the column get the
+        forest spread only.
+        """
+        if not feature_columns or SCORE_FEATURE not in feature_columns:
+            return cls(model, **kwargs)
+        column = list(feature_columns).index(SCORE_FEATURE)
+        return cls(model, score_column=column, score_sigma=score_sigma / scaler.scale_[column], **kwargs)
+
+    def _samples(self, X: np.ndarray) -> np.ndarray:
+        """Rank samples for a chunk of rows, shape (n_samples, n_rows)."""
+        n_rows = len(X)
+        if self.n_draws > 1:
+            X = np.repeat(X[np.newaxis], self.n_draws, axis=0)
+            X[:, :, self.score_column] += self.rng.normal(0, self.score_sigma, (self.n_draws, n_rows))
+            X = X.reshape(self.n_draws * n_rows, -1)
+
+        per_tree = tree_predictions(self.model, X)
+        if per_tree is None:
+            per_tree = self.model.predict(X)[np.newaxis]
+        # (trees, draws * rows) -> (trees * draws, rows)
+        return per_tree.reshape(-1, n_rows)
+
+    def intervals(self, X: np.ndarray) -> Dict[str, np.ndarray]:
+        X = np.asarray(X, dtype=float)
+        result = {f"p{q:g}": np.empty(len(X)) for q in self.percentiles}
+        result['confidence'] = np.empty(len(X))
+
+        for start in range(0, len(X), CHUNK_ROWS):
+            chunk = slice(start, start + CHUNK_ROWS)
+            samples = self._samples(X[chunk].copy())
+            # One partition pass for the reported percentiles and the median
+            *values, median = np.percentile(samples, self.percentiles + (50,), axis=0)
+            for q, value in zip(self.percentiles, values):
+                result[f"p{q:g}"][chunk] = value
+
+            if len(samples) == 1:
+                # A single deterministic sample carries no spread to measure
+                result['confidence'][chunk] = np.nan
+                continue
+            within = np.abs(samples - median) <= self.tolerance * np.maximum(np.abs(median), 1)
+            result['confidence'][chunk] = within.mean(axis=0)
+
+        return result
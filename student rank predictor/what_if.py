@@ -0,0 +1,109 @@
+# what_if.py
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from prediction_cache import LRUCache
+
+DEFAULT_STEPS = (0.05, 0.10, 0.20)
+CHUNK_STUDENTS = 256
+CACHE_SIZE = 4096
+CACHE_TTL = 3600
+
+
+class ImprovementImpactEngine:
+    """Expected rank gain from raising each topic's accuracy by fixed steps.
+
+    For every student the raw feature row is copied once per (topic, step),
+    the topic's accuracy column is raised by the step (capped at
+    ``max_accuracy``), and all copies go through the model in a single
+    ``predict`` call. Per-student recommendations are cached on the
+    scaled feature row, so a repeated prediction for the same quiz state
+    costs a dict lookup.
+    """
+
+    def __init__(self, model, scaler, topic_columns: Dict[str, int],
+                 steps: Sequence[float] = DEFAULT_STEPS, max_accuracy: float = 1.0,
+                 cache_size: int = CACHE_SIZE):
+        self.model = model
+        self.topics = list(topic_columns)
+        self.columns = np.array([topic_columns[topic] for topic in self.topics], dtype=np.intp)
+        self.steps = np.asarray(steps, dtype=float)
+        self.max_accuracy = max_accuracy
+        self.cache = LRUCache(maxsize=cache_size, ttl=CACHE_TTL)
+        # StandardScaler parameters of the accuracy columns
+        self.mean = np.asarray(scaler.mean_, dtype=float)[self.columns]
+        self.scale = np.asarray(scaler.scale_, dtype=float)[self.columns]
+
+    @classmethod
+    def from_feature_columns(cls, model, scaler, feature_columns: Sequence[str],
+                             suffix: str = '_accuracy', **kwargs) -> 'ImprovementImpactEngine':
+        topic_columns = {
+            name[:-len(suffix)]: i for i, name in enumerate(feature_columns) if name.endswith(suffix)
+        }
+        return cls(model, scaler, topic_columns, **kwargs)
+
+    def _accuracy(self, X: np.ndarray) -> np.ndarray:
+        """Unscaled accuracy per topic, shape (n, topics)."""
+        return X[:, self.columns] * self.scale + self.mean
+
+    def impact_batch(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Baseline ranks (n,) and rank gains (n, topics, steps) for scaled rows ``X``.
+
+        A positive gain means the predicted rank improves (gets smaller).
+        """
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        n_topics, n_steps = len(self.columns), len(self.steps)
+        baseline = np.empty(len(X))
+        gains = np.empty((len(X), n_topics, n_steps))
+        if not n_topics:
+            baseline[:] = self.model.predict(X)
+            return baseline, gains
+
+        topic_index = np.arange(n_topics)[:, np.newaxis]
+        step_index = np.arange(n_steps)[np.newaxis, :]
+        for start in range(0, len(X), CHUNK_STUDENTS):
+            chunk = X[start:start + CHUNK_STUDENTS]
+            n, n_features = chunk.shape
+
+            # Only the perturbed column changes, so work in scaled space
+            # instead of re-transforming every copy
+            target = np.minimum(self._accuracy(chunk)[:, :, np.newaxis] + self.steps, self.max_accuracy)
+            perturbed = np.broadcast_to(chunk[:, np.newaxis, np.newaxis, :], (n, n_topics, n_steps, n_features)).copy()
+            perturbed[:, topic_index, step_index, self.columns[:, np.newaxis]] = (
+                (target - self.mean[:, np.newaxis]) / self.scale[:, np.newaxis]
+            )
+
+            ranks = self.model.predict(np.vstack([chunk, perturbed.reshape(-1, n_features)]))
+            baseline[start:start + n] = ranks[:n]
+            gains[start:start + n] = ranks[:n, np.newaxis, np.newaxis] - ranks[n:].reshape(n, n_topics, n_steps)
+
+        return baseline, gains
+
+    def recommendations(self, x: np.ndarray, top_k: Optional[int] = None) -> List[Dict]:
+        """Ranked "study this next" topics for one scaled feature row, best gain first."""
+        x = np.asarray(x, dtype=float).reshape(1, -1)
+        key = x.tobytes()
+        cached = self.cache.get(key)
+        if cached is None:
+            cached = self._rank_topics(x)
+            self.cache.set(key, cached)
+        return cached[:top_k] if top_k is not None else cached
+
+    def _rank_topics(self, x: np.ndarray) -> List[Dict]:
+        _, gains = self.impact_batch(x)
+        current = self._accuracy(x)[0]
+
+        recommendations = []
+        for i, topic in enumerate(self.topics):
+            # Unattempted topics have no accuracy to raise
+            if np.isnan(current[i]) or current[i] >= self.max_accuracy:
+                continue
+            recommendations.append({
+                'topic': topic,
+                'current_accuracy': float(current[i]),
+                'rank_gain_by_step': {float(step): float(gain) for step, gain in zip(self.steps, gains[0, i])},
+                'expected_rank_gain': float(gains[0, i, -1])
+            })
+
+        return sorted(recommendations, key=lambda r: r['expected_rank_gain'], reverse=True)
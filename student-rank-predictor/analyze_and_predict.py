@@ -1,14 +1,11 @@
-import os
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error
-import matplotlib.pyplot as plt
-import seaborn as sns
 
-# Mock API functions (replace these with actual API calls)
-def get_current_quiz_data(user_id):
+from rank_table import RankTableCache
+from testline_client import get_testline_client
+
+# Mock API data, used when TESTLINE_API_URL is not configured
+def mock_current_quiz_data(user_id):
     # Simulated current quiz data
     return pd.DataFrame({
         'question_id': range(1, 11),
@@ -18,7 +15,7 @@ def get_current_quiz_data(user_id):
         'time_taken': np.random.randint(30, 180, 10)
     })
 
-def get_historical_quiz_data(user_id):
+def mock_historical_quiz_data(user_id):
     # Simulated historical quiz data
     return pd.DataFrame({
         'quiz_id': [1, 2, 3, 4, 5],
@@ -28,16 +25,51 @@ def get_historical_quiz_data(user_id):
         ]
     })
 
-def get_previous_year_neet_results():
-    # Simulated previous year NEET results
+def mock_previous_year_neet_results():
+    # Simulated previous year NEET results (a fixed, published table)
     return pd.DataFrame({
         'rank': range(1, 1001),
-        'score': sorted(np.random.randint(300, 720, 1000), reverse=True)
+        'score': sorted(np.random.RandomState(0).randint(300, 720, 1000), reverse=True)
     })
 
-def analyze_performance(user_id):
-    current_quiz = get_current_quiz_data(user_id)
-    historical_quizzes = get_historical_quiz_data(user_id)
+# API functions: Testline over pooled async HTTP, or the mocks above
+def get_current_quiz_data(user_id):
+    client = get_testline_client()
+    if client is None:
+        return mock_current_quiz_data(user_id)
+    return client.run(client.current_quiz(user_id))
+
+def get_historical_quiz_data(user_id):
+    client = get_testline_client()
+    if client is None:
+        return mock_historical_quiz_data(user_id)
+    return client.run(client.historical_quizzes(user_id))
+
+def get_previous_year_neet_results():
+    client = get_testline_client()
+    if client is None:
+        return mock_previous_year_neet_results()
+    return client.run(client.previous_year_results())
+
+def fetch_user_data(user_id):
+    # Fetch each per-user dataset once, concurrently, for a whole page render
+    client = get_testline_client()
+    if client is None:
+        return {
+            'current_quiz': mock_current_quiz_data(user_id),
+            'historical_quizzes': mock_historical_quiz_data(user_id)
+        }
+    return client.run(client.user_data(user_id))
+
+# Score -> rank index, reused across requests; the results are re-checked
+# every RANK_TABLE_TTL seconds and the table rebuilt only if they changed
+rank_tables = RankTableCache(get_previous_year_neet_results)
+
+def analyze_performance(user_id, current_quiz=None, historical_quizzes=None):
+    if current_quiz is None:
+        current_quiz = get_current_quiz_data(user_id)
+    if historical_quizzes is None:
+        historical_quizzes = get_historical_quiz_data(user_id)
     
     # Analyze current quiz performance
     topic_performance = current_quiz.groupby('topic')['correct'].mean()
@@ -54,24 +86,18 @@ def analyze_performance(user_id):
         'improvement_trend': improvement_trend
     }
 
-def predict_rank(user_id):
-    historical_quizzes = get_historical_quiz_data(user_id)
-    previous_year_results = get_previous_year_neet_results()
-    
-    # Create a simple linear regression model
-    scores = previous_year_results['score'].values
-    ranks = previous_year_results['rank'].values
-    
-    # Fit a polynomial regression model
-    degree = 2
-    coeffs = np.polyfit(scores, ranks, degree)
-    poly = np.poly1d(coeffs)
+def predict_rank(user_id, historical_quizzes=None):
+    if historical_quizzes is None:
+        historical_quizzes = get_historical_quiz_data(user_id)
     
     # Predict rank based on the average of historical scores
     predicted_score = historical_quizzes['score'].mean()
-    predicted_rank = poly(predicted_score)
     
-    return int(predicted_rank)
+    return rank_tables.get().lookup(predicted_score)
+
+def predict_ranks(scores):
+    # Vectorized score -> rank lookup for many students at once
+    return rank_tables.get().lookup_many(scores)
 
 def predict_college(rank):
     # Simplified college prediction based on rank ranges
@@ -84,38 +110,31 @@ def predict_college(rank):
     else:
         return "State Medical College"
 
-def generate_visualizations(user_id):
-    current_quiz = get_current_quiz_data(user_id)
-    historical_quizzes = get_historical_quiz_data(user_id)
+def generate_visualizations(user_id, current_quiz=None, historical_quizzes=None):
+    if current_quiz is None:
+        current_quiz = get_current_quiz_data(user_id)
+    if historical_quizzes is None:
+        historical_quizzes = get_historical_quiz_data(user_id)
     
-    # Create the static folder if it doesn't exist
-    static_folder = os.path.join(os.path.dirname(__file__), 'static')
-    os.makedirs(static_folder, exist_ok=True)
+    # Plotting libraries load on first render, not at startup
+    from charts import get_renderer
     
-    # Topic performance visualization
-    plt.figure(figsize=(10, 6))
-    sns.barplot(x=current_quiz['topic'], y=current_quiz['correct'])
-    plt.title("Performance by Topic")
-    plt.savefig(os.path.join(static_folder, 'topic_performance.png'))
-    plt.close()
-    
-    # Historical score trend visualization
-    plt.figure(figsize=(10, 6))
-    sns.lineplot(x=range(1, 6), y=historical_quizzes['score'])
-    plt.title("Historical Score Trend")
-    plt.xlabel("Quiz Number")
-    plt.ylabel("Score")
-    plt.savefig(os.path.join(static_folder, 'historical_trend.png'))
-    plt.close()
+    # Rendered in the background; returns static-relative image filenames
+    return get_renderer().submit(user_id, current_quiz, historical_quizzes)
 
 if __name__ == "__main__":
     user_id = 12345  # Example user ID
-    performance = analyze_performance(user_id)
-    predicted_rank = predict_rank(user_id)
+    user_data = fetch_user_data(user_id)
+    performance = analyze_performance(user_id, **user_data)
+    predicted_rank = predict_rank(user_id, user_data['historical_quizzes'])
     predicted_college = predict_college(predicted_rank)
-    generate_visualizations(user_id)
+    charts = generate_visualizations(user_id, **user_data)
+    
+    from charts import get_renderer
+    get_renderer().wait_all()
     
     print("Performance Analysis:", performance)
     print("Predicted Rank:", predicted_rank)
     print("Predicted College:", predicted_college)
+    print("Charts:", charts)
 
@@ -1,21 +1,58 @@
-from flask import Flask, render_template
-from analyze_and_predict import analyze_performance, predict_rank, predict_college, generate_visualizations
+import os
+
+from flask import Flask, abort, jsonify, render_template, send_from_directory
+from analyze_and_predict import (
+    analyze_performance, predict_rank, predict_college, generate_visualizations,
+    fetch_user_data
+)
+from charts import chart_data, chart_user_id, get_renderer
+from instrumentation import install, metrics
 
 app = Flask(__name__)
+install(app)
 
 @app.route('/')
 def index():
     user_id = 12345  # Example user ID
-    performance = analyze_performance(user_id)
-    predicted_rank = predict_rank(user_id)
-    predicted_college = predict_college(predicted_rank)
-    generate_visualizations(user_id)
+    with metrics.stage('fetch'):
+        user_data = fetch_user_data(user_id)
+    with metrics.stage('analysis'):
+        performance = analyze_performance(user_id, **user_data)
+    with metrics.stage('prediction'):
+        predicted_rank = predict_rank(user_id, user_data['historical_quizzes'])
+        predicted_college = predict_college(predicted_rank)
+    with metrics.stage('plotting'):
+        charts = generate_visualizations(user_id, **user_data)
     
     return render_template('index.html', 
                            performance=performance, 
                            predicted_rank=predicted_rank, 
-                           predicted_college=predicted_college)
+                           predicted_college=predicted_college,
+                           charts=charts)
+
+@app.route('/charts/<path:filename>')
+def chart_image(filename):
+    renderer = get_renderer()
+    if not renderer.exists(filename):
+        # Scheduled by another worker, or cleaned up since the page was
+        # served: render it here from the user's current data
+        user_id = chart_user_id(filename)
+        if user_id is None:
+            abort(404)
+        renderer.submit(user_id, **fetch_user_data(user_id))
+    # The page can be served before its charts finish rendering
+    renderer.wait(filename, timeout=30)
+    return send_from_directory(renderer.static_folder, filename, max_age=31536000)
+
+@app.route('/charts/<int:user_id>.json')
+def chart_json(user_id):
+    user_data = fetch_user_data(user_id)
+    return jsonify(chart_data(user_data['current_quiz'], user_data['historical_quizzes']))
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Development server only. In production run pre-forked workers, e.g.
+    #   gunicorn --preload --workers 4 --threads 4 app:app
+    # (the chart renderer and Testline client start their threads lazily,
+    # so preloading in the master is fork-safe)
+    app.run(debug=os.environ.get('FLASK_DEBUG') == '1', threaded=True)
 
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+STATIC_FOLDER = os.path.join(os.path.dirname(__file__), 'static')
+CHART_SUBDIR = 'charts'
+FIGSIZE = (10, 6)
+# Renders not referenced for this long are deleted; a request for one
+# later simply renders it again
+CHART_MAX_AGE = float(os.environ.get('CHART_MAX_AGE', 24 * 3600))
+CLEANUP_INTERVAL = float(os.environ.get('CHART_CLEANUP_INTERVAL', 600))
+
+_local = threading.local()
+
+
+def _figure():
+    # One figure per worker thread, cleared and reused for every chart
+    fig = getattr(_local, 'figure', None)
+    if fig is None:
+        # Object-oriented Agg rendering: no pyplot global state, safe off the
+        # request thread. Imported here so only rendering pays for matplotlib.
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        fig = Figure(figsize=FIGSIZE)
+        FigureCanvasAgg(fig)
+        _local.figure = fig
+    fig.clf()
+    return fig
+
+
+def topic_chart_data(current_quiz):
+    accuracy = current_quiz.groupby('topic', sort=False)['correct'].mean()
+    return {
+        'topics': accuracy.index.tolist(),
+        'accuracy': [float(value) for value in accuracy]
+    }
+
+
+def trend_chart_data(historical_quizzes):
+    scores = [float(score) for score in historical_quizzes['score']]
+    return {
+        'quiz_number': list(range(1, len(scores) + 1)),
+        'score': scores
+    }
+
+
+def chart_data(current_quiz, historical_quizzes):
+    """Lightweight JSON the frontend can draw instead of the server."""
+    return {
+        'topic_performance': topic_chart_data(current_quiz),
+        'historical_trend': trend_chart_data(historical_quizzes)
+    }
+
+
+def _render_topic_performance(data, path):
+    import seaborn as sns
+
+    fig = _figure()
+    ax = fig.add_subplot()
+    sns.barplot(x=data['topics'], y=data['accuracy'], ax=ax)
+    ax.set_title("Performance by Topic")
+    _save(fig, path)
+
+
+def _render_historical_trend(data, path):
+    import seaborn as sns
+
+    fig = _figure()
+    ax = fig.add_subplot()
+    sns.lineplot(x=data['quiz_number'], y=data['score'], ax=ax)
+    ax.set_title("Historical Score Trend")
+    ax.set_xlabel("Quiz Number")
+    ax.set_ylabel("Score")
+    _save(fig, path)
+
+
+def _save(fig, path):
+    # Write then rename so a half-written PNG is never served; the name is
+    # unique across worker processes that render the same chart
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    fig.savefig(tmp_path, format='png')
+    os.replace(tmp_path, path)
+
+
+RENDERERS = {
+    'topic_performance': _render_topic_performance,
+    'historical_trend': _render_historical_trend
+}
+
+_FILENAME = re.compile(
+    rf"^{CHART_SUBDIR}/(\d+)/(?:{'|'.join(RENDERERS)})-[0-9a-f]{{16}}\.png$"
+)
+
+
+def chart_user_id(filename):
+    """User id encoded in a chart filename, or None if it is not one."""
+    match = _FILENAME.match(filename)
+    return int(match.group(1)) if match else None
+
+
+class ChartRenderer:
+    """Renders per-user, content-hashed chart images in a background pool.
+
+    ``submit`` returns static-relative filenames immediately; an image is
+    only rendered when no file for the same inputs exists yet. Each worker
+    process tracks only its own renders, so a file can be missing when
+    another process is asked for it; callers then ``submit`` again.
+
+    Reusing a file refreshes its mtime, and files untouched for
+    ``max_age`` seconds are removed in the background.
+    """
+
+    def __init__(self, static_folder=STATIC_FOLDER, max_workers=2,
+                 max_age=CHART_MAX_AGE, cleanup_interval=CLEANUP_INTERVAL):
+        self.static_folder = static_folder
+        self.max_age = max_age
+        self.cleanup_interval = cleanup_interval
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix='charts')
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._next_cleanup = time.monotonic() + cleanup_interval
+
+    def submit(self, user_id, current_quiz, historical_quizzes, data=None):
+        data = data or chart_data(current_quiz, historical_quizzes)
+        filenames = {}
+        for kind, render in RENDERERS.items():
+            digest = hashlib.sha1(
+                json.dumps(data[kind], sort_keys=True).encode()
+            ).hexdigest()[:16]
+            filename = f"{CHART_SUBDIR}/{user_id}/{kind}-{digest}.png"
+            filenames[kind] = filename
+            self._schedule(filename, render, data[kind])
+        self._maybe_cleanup()
+        return filenames
+
+    def _schedule(self, filename, render, data):
+        path = os.path.join(self.static_folder, filename)
+        with self._lock:
+            if filename in self._pending:
+                return
+            try:
+                os.utime(path)
+                return
+            except FileNotFoundError:
+                pass
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            future = self._pool.submit(render, data, path)
+            self._pending[filename] = future
+        future.add_done_callback(lambda _: self._done(filename))
+
+    def _done(self, filename):
+        with self._lock:
+            self._pending.pop(filename, None)
+
+    def exists(self, filename):
+        """True if ``filename`` is on disk or being rendered by this process."""
+        with self._lock:
+            if filename in self._pending:
+                return True
+        return os.path.exists(os.path.join(self.static_folder, filename))
+
+    def wait(self, filename, timeout=None):
+        """Block until ``filename`` has been rendered (no-op if it already is)."""
+        with self._lock:
+            future = self._pending.get(filename)
+        if future is not None:
+            future.result(timeout)
+
+    def _maybe_cleanup(self):
+        with self._lock:
+            now = time.monotonic()
+            if now < self._next_cleanup:
+                return
+            self._next_cleanup = now + self.cleanup_interval
+        self._pool.submit(self.cleanup)
+
+    def cleanup(self, max_age=None):
+        """Delete renders whose mtime is older than ``max_age`` seconds."""
+        max_age = self.max_age if max_age is None else max_age
+        cutoff = time.time() - max_age
+        root = os.path.join(self.static_folder, CHART_SUBDIR)
+        removed = 0
+        for dirpath, _, names in os.walk(root):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                filename = os.path.relpath(path, self.static_folder).replace(os.sep, '/')
+                with self._lock:
+                    if filename in self._pending:
+                        continue
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    def wait_all(self, timeout=None):
+        with self._lock:
+            futures = list(self._pending.values())
+        for future in futures:
+            future.result(timeout)
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer():
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = ChartRenderer()
+        return _renderer
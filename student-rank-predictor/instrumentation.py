@@ -0,0 +1,126 @@
+"""Stage timers, /metrics and header-triggered cProfile for the Flask app.
+
+Off unless METRICS_ENABLED=1; disabled, ``stage()`` returns a shared no-op
+context manager and ``install`` registers nothing.
+
+    METRICS_ENABLED=1          collect and serve /metrics
+    SLOW_REQUEST_MS=500        log slower requests with their stage timings
+    PROFILE_DIR=profiles       allow profiling; X-Profile: 1 on a request
+"""
+import cProfile
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+from flask import Response, g, has_request_context, request
+
+logger = logging.getLogger(__name__)
+
+_NULL_STAGE = nullcontext()
+
+
+class _Stage:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.metrics.observe('stage', self.name, elapsed)
+        if has_request_context():
+            stages = g.setdefault('stages', {})
+            stages[self.name] = stages.get(self.name, 0.0) + elapsed
+        return False
+
+
+class Metrics:
+    """Per-label time totals and counts, rendered as Prometheus summaries."""
+
+    def __init__(self, enabled=False, namespace="app"):
+        self.enabled = enabled
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._totals = defaultdict(lambda: [0.0, 0])
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def observe(self, family, label, seconds):
+        with self._lock:
+            totals = self._totals[family, label]
+            totals[0] += seconds
+            totals[1] += 1
+
+    def render(self):
+        with self._lock:
+            totals = {key: tuple(value) for key, value in self._totals.items()}
+        lines = []
+        for family, label in (('stage', 'stage'), ('request', 'endpoint')):
+            name = f"{self.namespace}_{family}_seconds"
+            lines.append(f"# TYPE {name} summary")
+            for (fam, value), (total, count) in sorted(totals.items()):
+                if fam == family:
+                    lines.append(f'{name}_sum{{{label}="{value}"}} {total:.6f}')
+                    lines.append(f'{name}_count{{{label}="{value}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics(enabled=os.environ.get("METRICS_ENABLED") == "1")
+
+
+def install(app):
+    if not metrics.enabled:
+        return
+
+    slow_ms = float(os.environ.get("SLOW_REQUEST_MS", 500))
+    profile_dir = os.environ.get("PROFILE_DIR")
+    profiling = threading.Lock()
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+        # cProfile cannot nest, so overlapping flagged requests go unprofiled
+        if profile_dir and request.headers.get("X-Profile") == "1" and profiling.acquire(blocking=False):
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def record_request(response):
+        elapsed = time.perf_counter() - g.pop('request_start', time.perf_counter())
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            os.makedirs(profile_dir, exist_ok=True)
+            filename = f"{int(time.time() * 1000)}-{os.getpid()}-{request.endpoint}.prof"
+            profiler.dump_stats(os.path.join(profile_dir, filename))
+            profiling.release()
+            response.headers['X-Profile-Path'] = filename
+
+        metrics.observe('request', request.endpoint or 'unmatched', elapsed)
+        if elapsed * 1000 >= slow_ms:
+            stages = ", ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in g.get('stages', {}).items())
+            logger.warning("Slow request %s took %.1fms [%s]", request.path, elapsed * 1000, stages)
+        return response
+
+    @app.teardown_request
+    def release_profiler(exc):
+        # after_request is skipped when the view raises
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            profiling.release()
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
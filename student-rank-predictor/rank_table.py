@@ -0,0 +1,92 @@
+import hashlib
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+RANK_TABLE_TTL = float(os.environ.get('RANK_TABLE_TTL', 3600))
+
+
+class RankLookupTable:
+    """Monotone score -> rank index built from a previous year's results.
+
+    Scores are sorted once; ties keep the best rank and ranks are forced to
+    be non-increasing as scores rise. Lookups interpolate linearly between
+    neighbouring scores with a binary search and clamp outside the range.
+    """
+
+    def __init__(self, scores, ranks):
+        scores = np.asarray(scores, dtype=float)
+        ranks = np.asarray(ranks, dtype=float)
+        order = np.argsort(scores, kind='stable')
+        scores, ranks = scores[order], ranks[order]
+
+        self.scores, first = np.unique(scores, return_index=True)
+        self.ranks = np.minimum.accumulate(np.minimum.reduceat(ranks, first))
+
+    def lookup(self, score):
+        return int(np.interp(score, self.scores, self.ranks))
+
+    def lookup_many(self, scores):
+        return np.interp(np.asarray(scores, dtype=float), self.scores, self.ranks).astype(int)
+
+
+def results_fingerprint(results):
+    digest = hashlib.sha1()
+    digest.update(np.ascontiguousarray(results['score'].to_numpy(dtype=float)).tobytes())
+    digest.update(np.ascontiguousarray(results['rank'].to_numpy(dtype=float)).tobytes())
+    return digest.hexdigest()
+
+
+class RankTableCache:
+    """Process-wide RankLookupTable, rebuilt only when the results change.
+
+    The results are reloaded at most once every ``ttl`` seconds (or after
+    ``invalidate``); the table is only rebuilt when their fingerprint
+    differs. Other threads keep using the current table during a reload.
+    """
+
+    def __init__(self, load_results, ttl=RANK_TABLE_TTL, clock=time.monotonic):
+        self.load_results = load_results
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._table = None
+        self._fingerprint = None
+        self._expires = -math.inf
+
+    def get(self):
+        if self._claim_reload():
+            self.refresh()
+        return self._table
+
+    def invalidate(self):
+        """Reload the results on the next ``get`` (e.g. after publishing new ones)."""
+        with self._lock:
+            self._expires = -math.inf
+
+    def _claim_reload(self):
+        with self._lock:
+            if self._table is None:
+                return True
+            if self.clock() < self._expires:
+                return False
+            # Push the deadline out first so only this thread reloads
+            self._expires = self.clock() + self.ttl
+            return True
+
+    def refresh(self, results=None):
+        """Rebuild from ``results`` (or a fresh load); returns True if rebuilt."""
+        if results is None:
+            results = self.load_results()
+        fingerprint = results_fingerprint(results)
+
+        with self._lock:
+            self._expires = self.clock() + self.ttl
+            if fingerprint == self._fingerprint:
+                return False
+            self._table = RankLookupTable(results['score'], results['rank'])
+            self._fingerprint = fingerprint
+        return True
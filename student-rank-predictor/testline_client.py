@@ -0,0 +1,110 @@
+import asyncio
+import os
+import threading
+
+import httpx
+import pandas as pd
+
+TESTLINE_API_URL = os.environ.get('TESTLINE_API_URL')
+TIMEOUT = float(os.environ.get('TESTLINE_TIMEOUT', 5))
+RETRIES = int(os.environ.get('TESTLINE_RETRIES', 2))
+MAX_CONNECTIONS = int(os.environ.get('TESTLINE_MAX_CONNECTIONS', 100))
+
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class TestlineClient:
+    """Async client for the Testline quiz APIs with a pooled connection set.
+
+    All requests run on one background event loop so the HTTP connection
+    pool is shared by every Flask request thread. Identical requests that
+    are in flight at the same time are coalesced into a single call.
+    """
+
+    def __init__(self, base_url, timeout=TIMEOUT, retries=RETRIES,
+                 max_connections=MAX_CONNECTIONS, backoff=0.1):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.retries = retries
+        self.max_connections = max_connections
+        self.backoff = backoff
+        self._client = None
+        self._inflight = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name='testline-client', daemon=True
+        )
+        self._thread.start()
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the client's loop from synchronous code."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def close(self):
+        if self._client is not None:
+            self.run(self._client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def _http(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections)
+            )
+        return self._client
+
+    async def _get_json(self, path):
+        task = self._inflight.get(path)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(path))
+            self._inflight[path] = task
+            task.add_done_callback(lambda _: self._inflight.pop(path, None))
+        # Shield so one caller timing out does not cancel the shared request
+        return await asyncio.shield(task)
+
+    async def _fetch(self, path):
+        for attempt in range(self.retries + 1):
+            try:
+                response = await self._http().get(path)
+                response.raise_for_status()
+                return response.json()
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                retryable = (isinstance(e, httpx.TransportError)
+                             or e.response.status_code in RETRY_STATUSES)
+                if not retryable or attempt == self.retries:
+                    raise
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    async def current_quiz(self, user_id):
+        return pd.DataFrame(await self._get_json(f'/users/{user_id}/quizzes/current'))
+
+    async def historical_quizzes(self, user_id):
+        return pd.DataFrame(await self._get_json(f'/users/{user_id}/quizzes/history'))
+
+    async def previous_year_results(self):
+        return pd.DataFrame(await self._get_json('/neet/results/previous-year'))
+
+    async def user_data(self, user_id):
+        """Fetch everything a page render needs for one user, concurrently."""
+        current_quiz, historical_quizzes = await asyncio.gather(
+            self.current_quiz(user_id), self.historical_quizzes(user_id)
+        )
+        return {'current_quiz': current_quiz, 'historical_quizzes': historical_quizzes}
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_testline_client():
+    """Shared client when TESTLINE_API_URL is configured, otherwise None."""
+    global _client
+    if not TESTLINE_API_URL:
+        return None
+    with _client_lock:
+        if _client is None:
+            _client = TestlineClient(TESTLINE_API_URL)
+        return _client
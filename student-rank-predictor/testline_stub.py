@@ -0,0 +1,97 @@
+"""Local stand-in for the Testline APIs, serving the simulated quiz data.
+
+    python testline_stub.py --port 8001
+    TESTLINE_API_URL=http://127.0.0.1:8001 python app.py
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from analyze_and_predict import (
+    mock_current_quiz_data, mock_historical_quiz_data, mock_previous_year_neet_results
+)
+
+ROUTES = [
+    (re.compile(r'^/users/(\d+)/quizzes/current$'), mock_current_quiz_data),
+    (re.compile(r'^/users/(\d+)/quizzes/history$'), mock_historical_quiz_data),
+    (re.compile(r'^/neet/results/previous-year$'), mock_previous_year_neet_results),
+]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests[self.path] += 1
+            failures = server.failures.get(self.path)
+            status = failures.pop(0) if failures else None
+        if server.delay:
+            time.sleep(server.delay)
+        if status is not None:
+            self._send(status, json.dumps({'detail': 'injected failure'}))
+            return
+
+        for pattern, load in ROUTES:
+            match = pattern.match(self.path)
+            if match:
+                args = [int(group) for group in match.groups()]
+                self._send(200, load(*args).to_json(orient='records'))
+                return
+        self._send(404, json.dumps({'detail': 'not found'}))
+
+    def _send(self, status, body):
+        payload = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        try:
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (e.g. timed out on a delayed response)
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    """Stub with fault injection for tests.
+
+    ``failures`` maps a path to the statuses its next requests get before
+    it succeeds again, ``delay`` (seconds) is added to every response and
+    ``requests`` counts the requests received per path.
+    """
+    daemon_threads = True
+
+    def __init__(self, address, delay=0.0, failures=None):
+        super().__init__(address, StubHandler)
+        self.delay = delay
+        self.failures = {path: list(statuses) for path, statuses in (failures or {}).items()}
+        self.requests = Counter()
+        self.lock = threading.Lock()
+
+
+def start_stub_server(host='127.0.0.1', port=0, delay=0.0, failures=None):
+    """Serve in a background thread; returns the server and its base URL."""
+    server = StubServer((host, port), delay=delay, failures=failures)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local Testline API stub')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--delay', type=float, default=0.0, help='seconds added to every response')
+    args = parser.parse_args()
+
+    server = StubServer((args.host, args.port), delay=args.delay)
+    print(f"Testline stub listening on http://{args.host}:{args.port}")
+    server.serve_forever()
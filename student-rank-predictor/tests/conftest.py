@@ -0,0 +1,6 @@
+# tests/conftest.py
+"""Run from the ``student-rank-predictor`` directory: ``pytest tests``."""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
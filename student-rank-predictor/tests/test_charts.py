@@ -0,0 +1,91 @@
+# tests/test_charts.py
+import os
+import time
+
+import pandas as pd
+import pytest
+
+import charts
+from analyze_and_predict import fetch_user_data
+from charts import ChartRenderer, chart_user_id
+
+
+def quiz_data(scores):
+    current_quiz = pd.DataFrame({
+        'topic': ['Physics', 'Chemistry', 'Biology'],
+        'correct': [1, 0, 1]
+    })
+    return current_quiz, pd.DataFrame({'score': scores})
+
+
+@pytest.fixture
+def renderer(tmp_path):
+    return ChartRenderer(static_folder=str(tmp_path), cleanup_interval=3600)
+
+
+@pytest.fixture
+def client(renderer, monkeypatch):
+    monkeypatch.setattr(charts, '_renderer', renderer)
+    from app import app
+    return app.test_client()
+
+
+def test_newer_render_keeps_the_previous_one(renderer):
+    # A page served just before the data changed still points at the old file
+    old = renderer.submit(7, *quiz_data([70, 80]))
+    new = renderer.submit(7, *quiz_data([70, 80, 90]))
+    renderer.wait_all(timeout=30)
+
+    assert old['historical_trend'] != new['historical_trend']
+    for filename in [*old.values(), *new.values()]:
+        assert os.path.exists(os.path.join(renderer.static_folder, filename))
+
+
+def test_cleanup_removes_only_old_renders(renderer):
+    old = renderer.submit(7, *quiz_data([70, 80]))
+    fresh = renderer.submit(8, *quiz_data([60, 65]))
+    renderer.wait_all(timeout=30)
+    stale = time.time() - 2 * renderer.max_age
+    for filename in old.values():
+        os.utime(os.path.join(renderer.static_folder, filename), (stale, stale))
+
+    assert renderer.cleanup() == len(old)
+    assert not any(renderer.exists(filename) for filename in old.values())
+    assert all(renderer.exists(filename) for filename in fresh.values())
+
+
+def test_resubmitting_refreshes_the_age_of_a_render(renderer):
+    filenames = renderer.submit(7, *quiz_data([70, 80]))
+    renderer.wait_all(timeout=30)
+    stale = time.time() - 2 * renderer.max_age
+    for filename in filenames.values():
+        os.utime(os.path.join(renderer.static_folder, filename), (stale, stale))
+
+    assert renderer.submit(7, *quiz_data([70, 80])) == filenames
+    assert renderer.cleanup() == 0
+
+
+def test_chart_user_id():
+    assert chart_user_id('charts/12345/topic_performance-0123456789abcdef.png') == 12345
+    assert chart_user_id('charts/12345/other-0123456789abcdef.png') is None
+    assert chart_user_id('../app.py') is None
+
+
+def test_missing_chart_is_rendered_on_request(renderer, client):
+    # As if another worker served the page: nothing rendered or pending here
+    data = charts.chart_data(**fetch_user_data(12345))
+    other_worker = ChartRenderer(static_folder=renderer.static_folder)
+    filename = other_worker.submit(12345, None, None, data=data)['topic_performance']
+    other_worker.wait_all(timeout=30)
+    os.remove(os.path.join(renderer.static_folder, filename))
+
+    response = client.get(f'/charts/{filename}')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+    assert os.path.exists(os.path.join(renderer.static_folder, filename))
+
+
+def test_unknown_chart_is_not_found(client):
+    assert client.get('/charts/charts/12345/topic_performance-0000000000000000.png').status_code == 404
+    assert client.get('/charts/not-a-chart.png').status_code == 404
@@ -0,0 +1,88 @@
+# tests/test_rank_table.py
+import numpy as np
+import pandas as pd
+
+from rank_table import RankLookupTable, RankTableCache
+
+
+def results(scores, ranks):
+    return pd.DataFrame({'score': scores, 'rank': ranks})
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lookup_is_monotone_in_score():
+    rng = np.random.RandomState(0)
+    scores = sorted(rng.randint(300, 720, 1000), reverse=True)
+    table = RankLookupTable(scores, range(1, 1001))
+
+    ranks = table.lookup_many(np.linspace(250, 750, 501))
+    assert np.all(np.diff(ranks) <= 0)
+
+
+def test_tied_scores_keep_the_best_rank():
+    table = RankLookupTable([700, 650, 650, 650, 600], [1, 2, 3, 4, 5])
+
+    assert table.lookup(650) == 2
+    assert list(table.scores) == [600, 650, 700]
+
+
+def test_noisy_ranks_are_forced_non_increasing():
+    # Rank 9 at a higher score than rank 5 is treated as rank 5
+    table = RankLookupTable([600, 650, 700], [5, 9, 1])
+
+    assert table.lookup(650) == 5
+
+
+def test_lookup_clamps_outside_the_known_scores():
+    table = RankLookupTable([700, 600, 500], [1, 50, 100])
+
+    assert table.lookup(800) == 1
+    assert table.lookup(0) == 100
+    assert list(table.lookup_many([800, 550, 0])) == [1, 75, 100]
+
+
+def test_cache_reloads_after_ttl_and_rebuilds_only_on_change():
+    published = {'results': results([700, 600], [1, 100])}
+    loads = []
+
+    def load():
+        loads.append(1)
+        return published['results']
+
+    clock = FakeClock()
+    cache = RankTableCache(load, ttl=60, clock=clock)
+    first = cache.get()
+    assert first.lookup(700) == 1
+
+    clock.now = 30
+    assert cache.get() is first
+    assert len(loads) == 1
+
+    # Same results after the TTL: reloaded, but the table is kept
+    clock.now = 61
+    assert cache.get() is first
+    assert len(loads) == 2
+
+    published['results'] = results([700, 600], [10, 200])
+    clock.now = 122
+    second = cache.get()
+    assert second is not first
+    assert second.lookup(700) == 10
+
+
+def test_invalidate_forces_a_reload():
+    published = {'results': results([700, 600], [1, 100])}
+    cache = RankTableCache(lambda: published['results'], ttl=3600, clock=FakeClock())
+    assert cache.get().lookup(600) == 100
+
+    published['results'] = results([700, 600], [1, 80])
+    assert cache.get().lookup(600) == 100
+    cache.invalidate()
+    assert cache.get().lookup(600) == 80
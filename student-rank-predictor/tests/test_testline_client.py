@@ -0,0 +1,112 @@
+# tests/test_testline_client.py
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import testline_client
+from testline_stub import start_stub_server
+
+CURRENT_QUIZ = '/users/1/quizzes/current'
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**kwargs):
+        server, url = start_stub_server(**kwargs)
+        servers.append(server)
+        return server, url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def make_client():
+    clients = []
+
+    def make(url, **kwargs):
+        client = testline_client.TestlineClient(url, **kwargs)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+def test_user_data_fetches_each_dataset(stub, make_client):
+    server, url = stub()
+    client = make_client(url)
+
+    data = client.run(client.user_data(1))
+
+    assert len(data['current_quiz']) == 10
+    assert list(data['historical_quizzes']['score']) == [75, 80, 85, 78, 82]
+    assert server.requests == {CURRENT_QUIZ: 1, '/users/1/quizzes/history': 1}
+
+
+def test_concurrent_identical_requests_are_coalesced(stub, make_client):
+    server, url = stub(delay=0.2)
+    client = make_client(url)
+
+    async def many():
+        return await asyncio.gather(*(client.current_quiz(1) for _ in range(10)))
+
+    frames = client.run(many())
+
+    assert len(frames) == 10
+    assert server.requests[CURRENT_QUIZ] == 1
+
+    # Once finished, the next call goes to the server again
+    client.run(client.current_quiz(1))
+    assert server.requests[CURRENT_QUIZ] == 2
+
+
+def test_retryable_statuses_are_retried_with_backoff(stub, make_client):
+    server, url = stub(failures={CURRENT_QUIZ: [503, 502]})
+    client = make_client(url, retries=2, backoff=0.1)
+
+    start = time.monotonic()
+    frame = client.run(client.current_quiz(1))
+
+    assert len(frame) == 10
+    assert server.requests[CURRENT_QUIZ] == 3
+    # Waited backoff * (1 + 2) between the three attempts
+    assert time.monotonic() - start >= 0.3
+
+
+def test_gives_up_after_the_last_retry(stub, make_client):
+    server, url = stub(failures={CURRENT_QUIZ: [503, 503, 503]})
+    client = make_client(url, retries=2, backoff=0.01)
+
+    with pytest.raises(httpx.HTTPStatusError) as excinfo:
+        client.run(client.current_quiz(1))
+
+    assert excinfo.value.response.status_code == 503
+    assert server.requests[CURRENT_QUIZ] == 3
+
+
+def test_non_retryable_errors_fail_at_once(stub, make_client):
+    server, url = stub(failures={CURRENT_QUIZ: [500]})
+    client = make_client(url, retries=2, backoff=0.01)
+
+    with pytest.raises(httpx.HTTPStatusError) as excinfo:
+        client.run(client.current_quiz(1))
+
+    assert excinfo.value.response.status_code == 500
+    assert server.requests[CURRENT_QUIZ] == 1
+
+
+def test_slow_responses_time_out_and_are_retried(stub, make_client):
+    server, url = stub(delay=0.5)
+    client = make_client(url, timeout=0.1, retries=1, backoff=0.01)
+
+    with pytest.raises(httpx.TimeoutException):
+        client.run(client.current_quiz(1))
+    assert server.requests[CURRENT_QUIZ] == 2